@@ -1,17 +1,39 @@
 """
 PartToImage - Render CAD files to PNG images using OCC viewer
 Supports .py (CadQuery), .step, and .obj files
+A NumPy software rasterizer backend is available for headless machines
 """
 import os
+import hashlib
 import tempfile
 from OCC.Display.OCCViewer import Viewer3d
 from OCC.Core.Graphic3d import Graphic3d_NOM_SILVER
 from OCC.Core.STEPControl import STEPControl_Reader
 from OCC.Core.IFSelect import IFSelect_RetDone
-from OCC.Core.TopoDS import TopoDS_Shape
-from OCC.Extend.DataExchange import read_stl_file
+from OCC.Core.TopoDS import TopoDS_Shape, TopoDS_Face
+from OCC.Core.BRepTools import breptools
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.Poly import Poly_Triangulation, Poly_Triangle
+from OCC.Core.gp import gp_Pnt
 from PIL import Image
+import numpy as np
 import trimesh
+from script_runner import shape_to_brep
+from validation_cache import default_cache, execute_and_store
+from tessellation_cache import TessellationCache, CACHE_DIR, CACHE_MAX_BYTES
+from software_renderer import SoftwareRenderer
+from stage_timing import StageTimer, timed
+from worker_launch import get_context, mark_worker_ready, run_in_child
+from contextlib import nullcontext
+
+
+# Background keying: pixels whose darkest channel is above BG_THRESHOLD become
+# transparent; BG_FEATHER widens that into a soft ramp for anti-aliased edges
+BG_THRESHOLD = 200
+BG_FEATHER = 0
+
+# Seconds a .py file may run before its render is abandoned
+SCRIPT_TIMEOUT_SECONDS = 30
 
 
 def read_python_file(filepath):
@@ -23,53 +45,303 @@ def read_python_file(filepath):
 
 def load_step_file(filename: str) -> TopoDS_Shape:
     """Load a STEP file and return the shape"""
-    step_reader = STEPControl_Reader()
-    status = step_reader.ReadFile(filename)
-    if status != IFSelect_RetDone:
-        raise Exception("Error: Cannot read STEP file.")
-    step_reader.TransferRoots()
-    shape = step_reader.OneShape()
+    with timed("step_read"):
+        step_reader = STEPControl_Reader()
+        status = step_reader.ReadFile(filename)
+        if status != IFSelect_RetDone:
+            raise Exception("Error: Cannot read STEP file.")
+        step_reader.TransferRoots()
+        shape = step_reader.OneShape()
     return shape
 
 
+def mesh_to_shape(vertices, faces) -> TopoDS_Face:
+    """
+    Wrap a triangle mesh in a single triangulated face
+
+    vertices is an (N, 3) float array and faces an (M, 3) array of 0-based
+    vertex indices. The whole mesh becomes one Poly_Triangulation, so large
+    meshes do not need a B-rep face per triangle.
+    """
+    triangulation = Poly_Triangulation(len(vertices), len(faces), False)
+    for index, (x, y, z) in enumerate(vertices.tolist(), 1):
+        triangulation.SetNode(index, gp_Pnt(x, y, z))
+    # Poly_Triangulation node indices are 1-based
+    for index, (a, b, c) in enumerate((faces + 1).tolist(), 1):
+        triangulation.SetTriangle(index, Poly_Triangle(a, b, c))
+
+    face = TopoDS_Face()
+    BRep_Builder().MakeFace(face, triangulation)
+    return face
+
+
 def load_obj_file(filename: str) -> TopoDS_Shape:
     """Load an OBJ file and return a shape"""
-    mesh = trimesh.load(filename)
-    mesh.export('output.stl')
-    shape = read_stl_file('output.stl')
-    if shape is None:
-        raise Exception(f"Error: Cannot read OBJ file {filename}.")
-    return shape
+    with timed("obj_read"):
+        mesh = trimesh.load(filename, force="mesh")
+        if len(mesh.faces) == 0:
+            raise Exception(f"Error: Cannot read OBJ file {filename}.")
+        return mesh_to_shape(mesh.vertices, mesh.faces)
 
 
-def load_py_file(filename: str) -> TopoDS_Shape:
-    """Load a Python file, execute it, and return the shape"""
+def brep_to_occ_shape(brep: bytes) -> TopoDS_Shape:
+    """Read BREP bytes into a pythonocc TopoDS_Shape"""
+    return breptools.ReadFromString(brep.decode())
+
+
+def cadquery_to_occ_shape(shape) -> TopoDS_Shape:
+    """Convert a cadquery Shape into a pythonocc TopoDS_Shape"""
+    if isinstance(shape.wrapped, TopoDS_Shape):
+        return shape.wrapped
+
+    # cadquery's OCP bindings and pythonocc wrap OCCT separately, so their
+    # TopoDS_Shape objects are not interchangeable; hand over in-memory BREP
+    return brep_to_occ_shape(shape_to_brep(shape))
+
+
+def load_py_brep(filename: str) -> bytes:
+    """
+    Load a Python file and return the BREP of the shape it produces
+
+    Any shape the script produced is returned, whether or not it passes the
+    geometry checks; those only decide validation. The validation cache's
+    BREP is used when it has one. Otherwise the script runs in a child
+    forked from this process, killed after SCRIPT_TIMEOUT_SECONDS, and the
+    outcome is cached.
+    """
     code = read_python_file(filename)
-    code += "\nimport cadquery as cq\ncq.exporters.export(result, 'output.step')\n"
+    cache = default_cache()
+    with timed("exec"):
+        entry = cache.lookup(code, timeout=SCRIPT_TIMEOUT_SECONDS)
+        brep = cache.brep_bytes(entry) if entry is not None else None
+        if brep is None and (entry is None or entry["has_brep"]):
+            # A fork shares this process's imports, so no forkserver is needed
+            outcome, value = run_in_child(
+                execute_and_store, (code, filename), SCRIPT_TIMEOUT_SECONDS, context=get_context("fork")
+            )
+            if outcome == "timeout":
+                cache.store_timeout(code, SCRIPT_TIMEOUT_SECONDS)
+            if outcome != "done":
+                raise Exception(f"Error: {filename}: {value}")
+            entry, brep = value
+    if brep is None:
+        raise Exception(f"Error: {filename} produced no shape: {entry['error']}")
+    return brep
 
-    # Execute the code
-    exec(code)
 
-    return load_step_file('output.step')
+def load_py_file(filename: str) -> TopoDS_Shape:
+    """Load a Python file and return the shape it produces (see load_py_brep)"""
+    brep = load_py_brep(filename)
+    with timed("brep_handoff"):
+        return brep_to_occ_shape(brep)
 
 
-def remove_bg(image_path):
-    """Remove white background from image"""
-    image = Image.open(image_path)
-    image = image.convert("RGBA")
+def remove_bg_image(image, threshold=BG_THRESHOLD, feather=BG_FEATHER):
+    """
+    Return an RGBA copy of image with the white background made transparent
 
-    datas = image.getdata()
-    new_data = []
-    for item in datas:
-        if item[0] > 200 and item[1] > 200 and item[2] > 200:
-            new_data.append((255, 255, 255, 0))
-        else:
-            new_data.append(item)
+    A pixel is background when all channels are above threshold. With
+    feather > 0, pixels whose darkest channel lies within feather levels
+    below threshold get a partial alpha so edges stay anti-aliased.
+    """
+    rgba = np.array(image.convert("RGBA"))
+    darkest = rgba[..., :3].min(axis=2).astype(np.float32)
 
-    image.putdata(new_data)
+    # 1.0 at or below threshold - feather, 0.0 above threshold
+    coverage = np.clip((threshold + 1 - darkest) / (feather + 1), 0.0, 1.0)
+    rgba[..., 3] = (rgba[..., 3] * coverage).astype(np.uint8)
+
+    # Fully keyed pixels become transparent white, as before
+    rgba[coverage == 0.0] = (255, 255, 255, 0)
+
+    return Image.fromarray(rgba, "RGBA")
+
+
+def remove_bg(image_path, threshold=BG_THRESHOLD, feather=BG_FEATHER):
+    """Remove white background from an image file in place"""
+    image = remove_bg_image(Image.open(image_path), threshold, feather)
     image.save(image_path, "PNG")
 
 
+VIEW_TYPES = ("iso", "front", "rear", "left", "right", "top", "bottom")
+
+
+def load_shape(file_name):
+    """Load a .py, .step, or .obj file and return (shape, file_type)"""
+    if ".obj" in file_name:
+        return load_obj_file(file_name), "obj"
+    elif ".step" in file_name:
+        return load_step_file(file_name), "step"
+    elif ".py" in file_name:
+        return load_py_file(file_name), "py"
+    else:
+        raise ValueError("Unrecognized file type")
+
+
+_tessellation_cache = None
+
+
+def enable_tessellation_cache(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Serve STEP and script meshes from a disk cache for the rest of this process"""
+    global _tessellation_cache
+    _tessellation_cache = TessellationCache(cache_dir, max_bytes)
+    return _tessellation_cache
+
+
+def load_shape_for_render(file_name):
+    """
+    Load a shape for rendering and return (shape, file_type, cache_status)
+
+    STEP files and script results go through the tessellation cache when it
+    is enabled and come back already meshed; scripts are keyed by their
+    BREP, so a hit skips the BREP handoff and meshing but not execution.
+    cache_status is "hit", "miss" or None (not cached).
+    """
+    if _tessellation_cache is not None and ".step" in file_name:
+        shape, hit = _tessellation_cache.load(file_name, load_step_file)
+        return shape, "step", "hit" if hit else "miss"
+    if _tessellation_cache is not None and ".py" in file_name:
+        brep = load_py_brep(file_name)
+
+        def handoff():
+            with timed("brep_handoff"):
+                return brep_to_occ_shape(brep)
+
+        shape, hit = _tessellation_cache.load_hashed(hashlib.sha256(brep).hexdigest(), handoff)
+        return shape, "py", "hit" if hit else "miss"
+
+    shape, file_type = load_shape(file_name)
+    return shape, file_type, None
+
+
+class OffscreenRenderer:
+    """
+    Offscreen OCC viewer that is created once and reused for many renders
+
+    Creating a Viewer3d and its GL context costs far more than drawing a
+    single part, so batch jobs keep one renderer per process and clear the
+    scene between shapes instead of rebuilding the viewer.
+    """
+
+    def __init__(self):
+        self.viewer = Viewer3d()
+        self.viewer.Create()
+        self.viewer.SetModeShaded()
+
+        # Set white background
+        self.viewer.View.SetBackgroundColor(0, 1, 1, 1)
+
+    def set_view(self, view_type):
+        """Point the camera along one of VIEW_TYPES"""
+        if view_type == "iso":
+            self.viewer.View_Iso()
+        elif view_type == "front":
+            self.viewer.View_Front()
+        elif view_type == "rear":
+            self.viewer.View_Rear()
+        elif view_type == "left":
+            self.viewer.View_Left()
+        elif view_type == "right":
+            self.viewer.View_Right()
+        elif view_type == "top":
+            self.viewer.View_Top()
+        elif view_type == "bottom":
+            self.viewer.View_Bottom()
+        else:
+            raise Exception("please choose: top, bottom, front, rear, left, right, iso")
+
+    def render_images(
+        self,
+        shape,
+        views,
+        resolution_height=448,
+        resolution_width=448,
+        draw_face_boundaries=True,
+        premeshed=False,
+        remove_bg_flag=False,
+        bg_threshold=BG_THRESHOLD,
+        bg_feather=BG_FEATHER
+    ):
+        """
+        Display a shape once and return one in-memory image per view
+
+        The shape is meshed when it is displayed, so every view after the
+        first only costs a camera change, a refit and a dump. Pass
+        premeshed=True for shapes that already carry a triangulation (e.g.
+        from the tessellation cache) so the viewer does not mesh them again.
+        """
+        viewer = self.viewer
+
+        # Drop the previous job's shape so the context does not grow
+        viewer.EraseAll()
+        viewer.default_drawer.SetFaceBoundaryDraw(draw_face_boundaries)
+        viewer.default_drawer.SetAutoTriangulation(not premeshed)
+
+        # Set resolution before fitting so the framing matches the output size
+        viewer.SetSize(resolution_width, resolution_height)
+
+        # Display the shape with silver material; this is where it is meshed
+        with timed("mesh"):
+            viewer.DisplayShape(
+                shape,
+                update=False,
+                material=Graphic3d_NOM_SILVER,
+                transparency=0.0
+            )
+
+        images = []
+        for view_type in views:
+            self.set_view(view_type)
+
+            # Fit the entire shape in the view
+            with timed("fit"):
+                viewer.View.FitAll(0.5)
+
+            # Render into memory so the PNG is only encoded once
+            with timed("dump"):
+                image = self.dump_image(resolution_width, resolution_height)
+
+            # Remove background if requested
+            if remove_bg_flag:
+                with timed("remove_bg"):
+                    image = remove_bg_image(image, bg_threshold, bg_feather)
+
+            images.append(image)
+
+        return images
+
+    def dump_image(self, width, height):
+        """Render the current view into an in-memory RGB image"""
+        data = self.viewer.GetImageData(width, height)
+        # OpenGL read-back rows start at the bottom of the frame
+        return Image.frombuffer("RGB", (width, height), data, "raw", "RGB", 0, -1)
+
+
+RENDER_BACKENDS = ("occ", "numpy")
+
+_renderers = {}
+
+
+def get_renderer(backend="occ"):
+    """Return this process's renderer for a backend, creating it on first use"""
+    if backend not in _renderers:
+        if backend == "occ":
+            _renderers[backend] = OffscreenRenderer()
+        elif backend == "numpy":
+            _renderers[backend] = SoftwareRenderer()
+        else:
+            raise ValueError(f"Unknown render backend: {backend}")
+    return _renderers[backend]
+
+
+def init_render_worker(tessellation_cache_dir=None, backend="occ"):
+    """ProcessPoolExecutor initializer that warms up the renderer"""
+    if tessellation_cache_dir:
+        enable_tessellation_cache(tessellation_cache_dir)
+    get_renderer(backend)
+    mark_worker_ready()
+
+
 def convert_part_to_image(
     file_name,
     view_type,
@@ -79,7 +351,11 @@ def convert_part_to_image(
     resolution_width=448,
     rotation_angle=None,
     scale=None,
-    remove_bg_flag=False
+    remove_bg_flag=False,
+    bg_threshold=BG_THRESHOLD,
+    bg_feather=BG_FEATHER,
+    backend="occ",
+    timings=False
 ):
     """
     Convert a CAD file to an image
@@ -94,71 +370,151 @@ def convert_part_to_image(
         rotation_angle: Optional rotation (unused currently)
         scale: Optional scale (unused currently)
         remove_bg_flag: Whether to remove white background
+        bg_threshold: Channel level above which a pixel counts as background
+        bg_feather: Width of the soft alpha ramp below bg_threshold
+        backend: "occ" for the OpenGL viewer, "numpy" for the software rasterizer
+        timings: Whether to record per-stage wall/CPU time in the result
+
+    Returns:
+        dict with the file type, tessellation cache status and, when
+        timings is set, per-stage times
     """
-    # Determine file type and load shape
-    file_type = None
+    return convert_part_to_views(
+        file_name,
+        [view_type],
+        [save_path],
+        b_rep_name,
+        resolution_height=resolution_height,
+        resolution_width=resolution_width,
+        remove_bg_flag=remove_bg_flag,
+        bg_threshold=bg_threshold,
+        bg_feather=bg_feather,
+        backend=backend,
+        timings=timings
+    )
 
-    if ".obj" in file_name:
-        shape = load_obj_file(file_name)
-        file_type = "obj"
-    elif ".step" in file_name:
-        shape = load_step_file(file_name)
-        file_type = "step"
-    elif ".py" in file_name:
-        shape = load_py_file(file_name)
-        file_type = "py"
-    else:
-        raise ValueError("Unrecognized file type")
 
-    # Initialize the offscreen renderer
-    offscreen_renderer = Viewer3d()
-
-    # Set view type
-    if view_type == "iso":
-        offscreen_renderer.View_Iso()
-    elif view_type == "front":
-        offscreen_renderer.View_Front()
-    elif view_type == "rear":
-        offscreen_renderer.View_Rear()
-    elif view_type == "left":
-        offscreen_renderer.View_Left()
-    elif view_type == "right":
-        offscreen_renderer.View_Right()
-    elif view_type == "top":
-        offscreen_renderer.View_Top()
-    elif view_type == "bottom":
-        offscreen_renderer.View_Bottom()
-    else:
-        raise Exception("please choose: top, bottom, front, rear, left, right, iso")
+def convert_part_to_arrays(
+    file_name,
+    views,
+    resolution_height=448,
+    resolution_width=448,
+    remove_bg_flag=False,
+    bg_threshold=BG_THRESHOLD,
+    bg_feather=BG_FEATHER,
+    backend="occ",
+    timings=False
+):
+    """
+    Render a CAD file to in-memory image arrays with a single load
 
-    # Create offscreen renderer
-    if file_type == "obj":
-        offscreen_renderer.Create(draw_face_boundaries=False)
-    else:
-        offscreen_renderer.Create()
+    Args are as for convert_part_to_views, minus the output paths.
 
-    offscreen_renderer.SetModeShaded()
+    Returns:
+        (images, info) where images maps each view to an HxWx3 (RGB) or
+        HxWx4 (RGBA, background removed) uint8 array, and info is a dict
+        with the file type, tessellation cache status, cache entries
+        evicted while storing this file's mesh and optional timings
+    """
+    for view_type in views:
+        if view_type not in VIEW_TYPES:
+            raise Exception("please choose: top, bottom, front, rear, left, right, iso")
 
-    # Display the shape with silver material
-    offscreen_renderer.DisplayShape(
-        shape,
-        update=True,
-        material=Graphic3d_NOM_SILVER,
-        transparency=0.0
-    )
+    cache = _tessellation_cache
+    evictions_before = cache.evictions if cache is not None else 0
+    with StageTimer() if timings else nullcontext() as timer:
+        shape, file_type, cache_status = load_shape_for_render(file_name)
 
-    # Set white background
-    offscreen_renderer.View.SetBackgroundColor(0, 1, 1, 1)
+        # Reuse this process's renderer
+        images = get_renderer(backend).render_images(
+            shape,
+            views,
+            resolution_height=resolution_height,
+            resolution_width=resolution_width,
+            draw_face_boundaries=(file_type != "obj"),
+            premeshed=(cache_status is not None or file_type == "obj"),
+            remove_bg_flag=remove_bg_flag,
+            bg_threshold=bg_threshold,
+            bg_feather=bg_feather
+        )
 
-    # Fit the entire shape in the view
-    offscreen_renderer.View.FitAll(0.5)
+        arrays = {view_type: np.asarray(image) for view_type, image in zip(views, images)}
 
-    # Set resolution
-    offscreen_renderer.SetSize(resolution_width, resolution_height)
+    info = {
+        "file_type": file_type,
+        "tessellation_cache": cache_status,
+        "tessellation_evictions": cache.evictions - evictions_before if cache is not None else 0
+    }
+    if timings:
+        info["timings"] = timer.as_dict()
+    return arrays, info
 
-    # Render and save the image
-    offscreen_renderer.View.Dump(save_path)
 
-    # Remove background if requested
-    if remove_bg_flag:
-        remove_bg(save_path)
+def convert_part_to_views(
+    file_name,
+    views,
+    save_paths,
+    b_rep_name=None,
+    resolution_height=448,
+    resolution_width=448,
+    remove_bg_flag=False,
+    bg_threshold=BG_THRESHOLD,
+    bg_feather=BG_FEATHER,
+    backend="occ",
+    timings=False
+):
+    """
+    Convert a CAD file to one image per view with a single load
+
+    Args:
+        file_name: Path to .py, .step, or .obj file
+        views: View angles to render (see VIEW_TYPES)
+        save_paths: Output image path for each entry in views
+        b_rep_name: B-rep name (unused, for compatibility)
+        resolution_height: Image height
+        resolution_width: Image width
+        remove_bg_flag: Whether to remove white background
+        bg_threshold: Channel level above which a pixel counts as background
+        bg_feather: Width of the soft alpha ramp below bg_threshold
+        backend: "occ" for the OpenGL viewer, "numpy" for the software rasterizer
+        timings: Whether to record per-stage wall/CPU time in the result
+
+    Returns:
+        dict with the file type, tessellation cache status and, when
+        timings is set, per-stage times
+    """
+    if len(views) != len(save_paths):
+        raise ValueError("views and save_paths must have the same length")
+
+    with StageTimer() if timings else nullcontext() as timer:
+        arrays, info = convert_part_to_arrays(
+            file_name,
+            views,
+            resolution_height=resolution_height,
+            resolution_width=resolution_width,
+            remove_bg_flag=remove_bg_flag,
+            bg_threshold=bg_threshold,
+            bg_feather=bg_feather,
+            backend=backend
+        )
+
+        with timed("encode"):
+            for view_type, save_path in zip(views, save_paths):
+                Image.fromarray(arrays[view_type]).save(save_path, "PNG")
+
+    if timings:
+        info["timings"] = timer.as_dict()
+    return info
+
+
+def view_save_paths(save_path, views):
+    """
+    Expand one output path into a path per view
+
+    A single view keeps save_path unchanged so existing single-view outputs
+    keep their names; multiple views get a _<view> suffix before the extension.
+    """
+    if len(views) == 1:
+        return [save_path]
+    root, ext = os.path.splitext(save_path)
+    return [f"{root}_{view_type}{ext}" for view_type in views]
@@ -0,0 +1,447 @@
+"""
+Static pre-screen for generated CadQuery scripts
+Rejects scripts that cannot work (syntax errors, no `result`, Workplane
+methods or keyword arguments that do not exist in the installed cadquery)
+from the AST alone, before any worker executes them
+
+Usage: python ast_prescreen.py data/generated_code
+"""
+import ast
+import sys
+import time
+import inspect
+import typing
+from pathlib import Path
+import cadquery as cq
+
+
+# Parameters, return types and literal argument checks come from cadquery's
+# real signatures, read once at import
+_PARAMETER_KINDS = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+_NUMERIC = (float, int)
+
+
+class _MethodSpec:
+    """What a call needs checked against one Workplane method signature"""
+
+    def __init__(self, signature):
+        parameters = [p for name, p in signature.parameters.items() if name != "self"]
+        self.positional = [p for p in parameters if p.kind in _PARAMETER_KINDS]
+        self.keywords = {p.name: p for p in parameters if p.kind != inspect.Parameter.POSITIONAL_ONLY}
+        self.var_positional = any(p.kind == inspect.Parameter.VAR_POSITIONAL for p in parameters)
+        self.var_keyword = any(p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters)
+        annotation = signature.return_annotation
+        self.returns_workplane = (isinstance(annotation, typing.TypeVar)
+                                  or annotation is cq.Workplane
+                                  or annotation in ("Workplane", "T"))
+
+
+def _method_specs():
+    specs = {}
+    for name, member in inspect.getmembers(cq.Workplane, callable):
+        if name.startswith("_") and name != "__init__":
+            continue
+        try:
+            specs[name] = _MethodSpec(inspect.signature(member))
+        except (TypeError, ValueError):
+            specs[name] = None
+    return specs
+
+
+WORKPLANE_METHODS = _method_specs()
+
+
+class _Checker(ast.NodeVisitor):
+    """
+    Walks a module in source order, tracking which names hold Workplanes
+
+    Only module-level bindings are tracked. Inside functions, classes,
+    lambdas and comprehensions a name may be a parameter or local that
+    shadows them, so findings there are only warnings; names a nested scope
+    can rebind at module level (global, :=) are never taken as Workplanes.
+    Where control flow joins (after if/else, try/except, match and loops) a
+    name only stays a Workplane if it is one on every path that gets there.
+    """
+
+    def __init__(self, unprovable=()):
+        self.issues = []
+        self.depth = 0
+        self.unprovable = set(unprovable)
+        # The script runners inject `cq`, so it is always a cadquery alias
+        self.cadquery_names = {"cq"}
+        self.workplane_classes = set()
+        self.workplanes = set()
+        self.plugins = set()
+        self.imports_cadquery = False
+        self.uses_cq = False
+        self.binds_result = False
+        self.call_results = {}
+        # Per enclosing loop: workplanes at each break and continue
+        self.loops = []
+
+    def issue(self, node, severity, rule, message):
+        if self.depth:
+            severity = "warning"
+        self.issues.append({
+            "line": getattr(node, "lineno", None),
+            "severity": severity,
+            "rule": rule,
+            "message": message,
+        })
+
+    def is_workplane_class(self, node):
+        if isinstance(node, ast.Attribute):
+            return (node.attr == "Workplane" and isinstance(node.value, ast.Name)
+                    and node.value.id in self.cadquery_names)
+        return isinstance(node, ast.Name) and node.id in self.workplane_classes
+
+    def is_workplane(self, node):
+        """Whether an expression certainly evaluates to a Workplane"""
+        if isinstance(node, ast.Name):
+            return node.id in self.workplanes
+        if not isinstance(node, ast.Call):
+            return False
+        # Each link of a chain is asked about its receiver, so remember calls
+        if node not in self.call_results:
+            if self.is_workplane_class(node.func):
+                self.call_results[node] = True
+            elif isinstance(node.func, ast.Attribute) and self.is_workplane(node.func.value):
+                spec = WORKPLANE_METHODS.get(node.func.attr)
+                self.call_results[node] = spec is not None and spec.returns_workplane
+            else:
+                self.call_results[node] = False
+        return self.call_results[node]
+
+    def visit_nested(self, node):
+        """Visit a nested scope without letting its bindings leak into the module's"""
+        workplanes = set(self.workplanes)
+        self.depth += 1
+        self.generic_visit(node)
+        self.depth -= 1
+        self.workplanes = workplanes
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            self.workplanes.discard(node.name)
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_ClassDef = visit_Lambda = visit_nested
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = visit_nested
+
+    def branch(self, statements, workplanes):
+        """Visit statements starting from workplanes; returns the workplanes after them"""
+        self.workplanes = set(workplanes)
+        for statement in statements:
+            self.visit(statement)
+        return self.workplanes
+
+    def visit_If(self, node):
+        self.visit(node.test)
+        entry = set(self.workplanes)
+        body = self.branch(node.body, entry)
+        self.workplanes = body & self.branch(node.orelse, entry)
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self.visit_loop(node, [node.target] + node.body)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self.visit_loop(node, [node.test] + node.body)
+
+    def visit_loop(self, node, parts):
+        """
+        Visit a loop whose every iteration runs parts
+
+        An iteration starts from the workplanes that hold both on entry and
+        after any earlier iteration, found by re-running the body without
+        recording issues until that set stops shrinking.
+        """
+        entry = set(self.workplanes)
+        start = entry
+        while True:
+            end, _ = self.loop_iteration(parts, start, dry=True)
+            narrowed = entry & end
+            if narrowed == start:
+                break
+            start = narrowed
+        _, breaks = self.loop_iteration(parts, start, dry=False)
+        # The else clause runs once the loop ends without a break
+        self.workplanes = self.branch(node.orelse, start).intersection(*breaks)
+
+    def loop_iteration(self, parts, workplanes, dry):
+        """Visit one iteration; returns (workplanes at its end or a continue, workplanes at each break)"""
+        if dry:
+            issues, self.issues = self.issues, []
+        self.loops.append({"breaks": [], "continues": []})
+        end = self.branch(parts, workplanes)
+        frame = self.loops.pop()
+        if dry:
+            self.issues = issues
+            # Call results depend on the workplanes they were worked out under
+            self.call_results = {}
+        return end.intersection(*frame["continues"]), frame["breaks"]
+
+    def visit_Break(self, node):
+        if self.loops:
+            self.loops[-1]["breaks"].append(set(self.workplanes))
+
+    def visit_Continue(self, node):
+        if self.loops:
+            self.loops[-1]["continues"].append(set(self.workplanes))
+
+    def visit_Try(self, node):
+        entry = set(self.workplanes)
+        body = self.branch(node.body, entry)
+        # A handler can start before any statement of the body has run, or
+        # after any of them has rebound a name
+        handler_entry = entry - _bound_names(node.body)
+        exits = [self.branch(node.orelse, body)]
+        for handler in node.handlers:
+            exits.append(self.branch([handler], handler_entry))
+        self.workplanes = set.intersection(*exits)
+        if node.finalbody:
+            interrupted = handler_entry - _bound_names(node.handlers + node.orelse)
+            self.workplanes = self.branch(node.finalbody, self.workplanes & interrupted)
+
+    visit_TryStar = visit_Try
+
+    def visit_Match(self, node):
+        self.visit(node.subject)
+        # A pattern that fails partway may already have bound some captures
+        unmatched = set(self.workplanes)
+        exits = []
+        for case in node.cases:
+            self.workplanes = unmatched
+            self.visit(case.pattern)
+            unmatched = set(self.workplanes)
+            if case.guard is not None:
+                self.visit(case.guard)
+            exits.append(self.branch(case.body, self.workplanes))
+        self.workplanes = unmatched.intersection(*exits)
+
+    def visit_MatchAs(self, node):
+        if node.name:
+            self.workplanes.discard(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self.workplanes.discard(node.name)
+
+    def visit_MatchMapping(self, node):
+        if node.rest:
+            self.workplanes.discard(node.rest)
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.workplanes.discard(node.name)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.workplanes.discard((alias.asname or alias.name).split(".")[0])
+            if (alias.asname or alias.name) == "result":
+                self.binds_result = True
+            if alias.name == "cadquery":
+                self.imports_cadquery = True
+                self.cadquery_names.add(alias.asname or alias.name)
+
+    def visit_ImportFrom(self, node):
+        if node.module == "cadquery":
+            self.imports_cadquery = True
+        for alias in node.names:
+            self.workplanes.discard(alias.asname or alias.name)
+            if (alias.asname or alias.name) == "result":
+                self.binds_result = True
+            if node.module == "cadquery" and alias.name == "Workplane":
+                self.workplane_classes.add(alias.asname or alias.name)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            if node.id in self.cadquery_names:
+                self.uses_cq = True
+            return
+        # Any other binding (for, with, del, +=, ...) makes the name unknown
+        self.workplanes.discard(node.id)
+        if node.id == "result":
+            self.binds_result = True
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        holds_workplane = self.is_workplane(node.value)
+        for target in node.targets:
+            self.visit(target)
+            self.bind(target, holds_workplane)
+
+    def visit_AnnAssign(self, node):
+        if node.value is not None:
+            self.visit(node.value)
+        self.visit(node.target)
+        if node.value is not None:
+            self.bind(node.target, self.is_workplane(node.value))
+
+    def bind(self, target, holds_workplane):
+        if isinstance(target, ast.Name):
+            if holds_workplane and target.id not in self.unprovable:
+                self.workplanes.add(target.id)
+            else:
+                self.workplanes.discard(target.id)
+        elif isinstance(target, ast.Attribute) and self.is_workplane_class(target.value):
+            # cq.Workplane.name = func registers a plugin method
+            self.plugins.add(target.attr)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self.bind(element, False)
+
+    def visit_Constant(self, node):
+        pass
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id == "show_object":
+            self.issue(node, "warning", "ShowObject", "show_object() leftover (ignored when run)")
+        elif self.is_workplane_class(node.func):
+            self.check_arguments(node, "Workplane", WORKPLANE_METHODS.get("__init__"))
+        elif isinstance(node.func, ast.Attribute) and self.is_workplane(node.func.value):
+            method = node.func.attr
+            if method in self.plugins:
+                pass
+            elif method not in WORKPLANE_METHODS:
+                self.issue(node, "error", "UnknownMethod", f"Workplane has no method '{method}'")
+            else:
+                self.check_arguments(node, method, WORKPLANE_METHODS[method])
+        self.generic_visit(node)
+
+    def check_arguments(self, node, method, spec):
+        if spec is None:
+            return
+        positional = spec.positional
+        keywords = spec.keywords
+
+        if any(isinstance(arg, ast.Starred) for arg in node.args):
+            return
+        if not spec.var_positional and len(node.args) > len(positional):
+            self.issue(node, "error", "TooManyArguments",
+                       f"{method}() takes {len(positional)} positional arguments, got {len(node.args)}")
+
+        for keyword in node.keywords:
+            if keyword.arg is None or spec.var_keyword or keyword.arg in keywords:
+                continue
+            self.issue(node, "error", "UnknownKeyword",
+                       f"{method}() has no parameter '{keyword.arg}'")
+
+        passed = list(zip(positional, node.args))
+        passed += [(keywords[k.arg], k.value) for k in node.keywords if k.arg in keywords]
+        for parameter, value in passed:
+            if (parameter.annotation in _NUMERIC and isinstance(value, ast.Constant)
+                    and isinstance(value.value, str)):
+                self.issue(node, "error", "BadArgumentType",
+                           f"{method}() parameter '{parameter.name}' expects a number, got {value.value!r}")
+
+
+def _bound_names(statements):
+    """Every name statements can bind or delete, in any scope"""
+    names = set()
+    for statement in statements:
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, ast.alias):
+                names.add((node.asname or node.name).split(".")[0])
+            elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)) and node.name:
+                names.add(node.name)
+            elif isinstance(node, ast.MatchMapping) and node.rest:
+                names.add(node.rest)
+    return names
+
+
+def prescreen(code, filename="<cadquery>"):
+    """
+    Statically check a script; returns a list of issue dicts
+
+    Each issue has line, severity ("error" rejects the script, "warning"
+    does not), rule and message.
+    """
+    try:
+        tree = ast.parse(code, filename)
+    except (SyntaxError, ValueError) as e:
+        return [{"line": getattr(e, "lineno", None), "severity": "error",
+                 "rule": "SyntaxError", "message": f"Syntax error: {e}"}]
+
+    # Names a nested scope can rebind behind the module's back
+    unprovable = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Global):
+            unprovable.update(node.names)
+        elif isinstance(node, ast.NamedExpr):
+            unprovable.add(node.target.id)
+
+    checker = _Checker(unprovable)
+    checker.visit(tree)
+    issues = checker.issues
+
+    if not checker.binds_result:
+        issues.append({"line": None, "severity": "error", "rule": "MissingResult",
+                       "message": "script never assigns 'result'"})
+    if checker.uses_cq and not checker.imports_cadquery:
+        issues.append({"line": None, "severity": "warning", "rule": "MissingImport",
+                       "message": "uses cq without 'import cadquery as cq' (injected when run)"})
+    return issues
+
+
+def prescreen_entry(code, filename="<cadquery>"):
+    """
+    Validation entry for a script the pre-screen rejects, or None
+
+    Rejected scripts get status 2 (syntax/runtime error) with the first
+    error's rule as error_class; every issue is kept under "prescreen".
+    """
+    issues = prescreen(code, filename)
+    errors = [issue for issue in issues if issue["severity"] == "error"]
+    if not errors:
+        return None
+    first = errors[0]
+    location = f"line {first['line']}: " if first["line"] else ""
+    return {
+        "status_code": 2,
+        "error": f"Prescreen: {location}{first['message']}",
+        "error_class": first["rule"],
+        "prescreen": issues,
+    }
+
+
+def main():
+    paths = sorted(Path(sys.argv[1] if len(sys.argv) > 1 else ".").glob("*.py"))
+    sources = [(path, path.read_text()) for path in paths]
+
+    start = time.perf_counter()
+    for path, code in sources:
+        try:
+            ast.parse(code)
+        except (SyntaxError, ValueError):
+            pass
+    parse_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reports = [(path, prescreen(code, str(path))) for path, code in sources]
+    elapsed = time.perf_counter() - start
+
+    rejected = 0
+    rules = {}
+    for path, issues in reports:
+        if any(issue["severity"] == "error" for issue in issues):
+            rejected += 1
+        for issue in issues:
+            rules[issue["rule"]] = rules.get(issue["rule"], 0) + 1
+            print(f"{path.name}:{issue['line'] or '-'}: {issue['severity']}: {issue['message']}")
+
+    count = max(len(paths), 1)
+    print(f"\n{len(paths)} files, {rejected} rejected, "
+          f"{elapsed / count * 1e6:.0f} µs per file ({parse_elapsed / count * 1e6:.0f} µs of it ast.parse)")
+    for rule, count in sorted(rules.items(), key=lambda item: -item[1]):
+        print(f"  {rule}: {count}")
+
+
+if __name__ == "__main__":
+    main()
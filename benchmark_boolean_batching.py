@@ -0,0 +1,136 @@
+"""
+Benchmark boolean batching against the scripts as written
+Runs every script that batch_booleans() rewrites both ways, checks that the
+batched result matches the original in volume and bounding box, and reports
+the speedup. Each verdict is stored in the validation cache; with
+PIPELINE_BATCH_BOOLEANS=1, run_cadquery_script batches only the scripts
+recorded as a match.
+"""
+import json
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+from boolean_batching import batch_booleans, results_match
+from geometry_checks import geometry_stats
+from script_runner import result_to_shape, run_cadquery_script
+from validation_cache import default_cache
+from worker_pool import WarmPool
+
+
+CODE_DIR = "data/claude_fixed_code"
+RESULTS_FILE = "boolean_batching_benchmark.json"
+NUM_WORKERS = 8
+TIMEOUT_SECONDS = 300  # Covers both runs of a script
+
+
+def timed_run(code, filename, batch):
+    """Run a script and return (seconds, geometry stats or None, error or None)"""
+    start = time.perf_counter()
+    try:
+        shape = result_to_shape(run_cadquery_script(code, filename, batch=batch))
+        stats = geometry_stats(shape)
+        return time.perf_counter() - start, stats, None
+    except Exception as e:
+        return time.perf_counter() - start, None, f"{type(e).__name__}: {e}"[:200]
+
+
+def benchmark_single_file(code_path):
+    """Time a script as written and batched (runs in a warm worker)"""
+    with open(code_path, 'r') as f:
+        code = f.read()
+    optimized, rewrites = batch_booleans(code)
+
+    original_seconds, original, original_error = timed_run(code, code_path, batch=False)
+    # Timed without run_cadquery_script's fallback, so a failing rewrite shows
+    batched_seconds, batched, batched_error = timed_run(optimized, code_path, batch=False)
+
+    if original is None:
+        outcome = "original_failed"
+    elif batched is None:
+        outcome = "batched_failed"
+    elif results_match(batched, original):
+        outcome = "match"
+    else:
+        outcome = "mismatch"
+    default_cache().store_batch_verdict(code, optimized, {
+        "match": outcome == "match",
+        "outcome": outcome,
+        "original": original,
+        "batched": batched,
+    })
+
+    return {
+        "file": Path(code_path).name,
+        "rewrites": rewrites,
+        "outcome": outcome,
+        "original_seconds": original_seconds,
+        "batched_seconds": batched_seconds,
+        "original_volume": original and original["volume"],
+        "batched_volume": batched and batched["volume"],
+        "error": original_error or batched_error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched booleans against the original scripts")
+    parser.add_argument("--input-dir", default=CODE_DIR)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    args = parser.parse_args()
+
+    code_paths = sorted(Path(args.input_dir).glob("*.py"))
+    candidates = [str(path) for path in code_paths if batch_booleans(path.read_text())[1]]
+
+    print("=" * 60)
+    print("Boolean Batching Benchmark")
+    print("=" * 60)
+    print(f"Scripts: {len(code_paths)} in {args.input_dir}, {len(candidates)} with batchable loops\n")
+
+    pool = WarmPool(benchmark_single_file, workers=args.workers, timeout=TIMEOUT_SECONDS)
+    records = []
+    for (code_path,), outcome, value in pool.run([(path,) for path in candidates]):
+        if outcome != "done":
+            print(f"  ✗ {Path(code_path).name}: {value}")
+            continue
+        records.append(value)
+        mark = "✓" if value["outcome"] == "match" else "✗"
+        speedup = value["original_seconds"] / value["batched_seconds"] if value["batched_seconds"] else 0.0
+        print(f"  {mark} {value['file']}: {value['original_seconds']:.3f}s -> "
+              f"{value['batched_seconds']:.3f}s ({speedup:.2f}x) {value['outcome']}")
+
+    matched = [record for record in records if record["outcome"] == "match"]
+    outcomes = {}
+    for record in records:
+        outcomes[record["outcome"]] = outcomes.get(record["outcome"], 0) + 1
+    original_total = sum(record["original_seconds"] for record in matched)
+    batched_total = sum(record["batched_seconds"] for record in matched)
+    speedups = [record["original_seconds"] / record["batched_seconds"] for record in matched
+                if record["batched_seconds"] > 0]
+
+    results = {
+        "scripts": len(code_paths),
+        "candidates": len(candidates),
+        "outcomes": outcomes,
+        "matched_original_seconds": original_total,
+        "matched_batched_seconds": batched_total,
+        "overall_speedup": original_total / batched_total if batched_total else 0.0,
+        "median_speedup": float(np.median(speedups)) if speedups else 0.0,
+        "files": records,
+    }
+
+    print("\n" + "=" * 60)
+    print("Summary")
+    print("=" * 60)
+    print(f"Batchable scripts: {len(candidates)} of {len(code_paths)}")
+    print("Outcomes:          " + ", ".join(f"{count} {name}" for name, count in sorted(outcomes.items())))
+    print(f"Matched scripts:   {original_total:.1f}s as written, {batched_total:.1f}s batched "
+          f"({results['overall_speedup']:.2f}x overall, {results['median_speedup']:.2f}x median)")
+    print("=" * 60)
+
+    with open(RESULTS_FILE, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark OCCT boolean options on the boolean-heavy generated scripts
+Runs each script under cadquery's defaults, serial booleans, OBB and OBB with
+a fuzzy value (see boolean_options), and reports latency per configuration
+and whether the geometry still matches the defaults
+"""
+import ast
+import json
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+from boolean_batching import results_match
+from geometry_checks import geometry_stats
+from script_runner import result_to_shape, run_cadquery_script
+from worker_pool import WarmPool
+
+
+CODE_DIR = "data/claude_fixed_code"
+RESULTS_FILE = "boolean_options_benchmark.json"
+DEFAULT_LIMIT = 20
+NUM_WORKERS = 8
+TIMEOUT_SECONDS = 600  # Covers every configuration of a script
+FUZZY_VALUE = 1e-5
+
+CONFIGS = {
+    "cadquery": {},
+    "serial": {"parallel": False},
+    "obb": {"use_obb": True},
+    "obb_fuzzy": {"use_obb": True, "fuzzy": FUZZY_VALUE},
+}
+
+BOOLEAN_CALLS = {"union", "cut", "intersect", "cutBlind", "cutThruAll", "hole", "cboreHole", "cskHole", "split"}
+LOOP_WEIGHT = 10  # A boolean inside a loop usually runs many times
+
+
+def boolean_weight(code):
+    """Rough count of the booleans a script runs, weighting calls inside loops"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return 0
+
+    def weigh(node, in_loop):
+        weight = 0
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in BOOLEAN_CALLS):
+            weight += LOOP_WEIGHT if in_loop else 1
+        in_loop = in_loop or isinstance(node, (ast.For, ast.While))
+        return weight + sum(weigh(child, in_loop) for child in ast.iter_child_nodes(node))
+
+    return weigh(tree, False)
+
+
+def benchmark_single_file(code_path, configs):
+    """Run one script under every configuration (runs in a warm worker)"""
+    with open(code_path, 'r') as f:
+        code = f.read()
+
+    # Untimed first run so imports and first-use setup do not count against
+    # whichever configuration comes first
+    try:
+        run_cadquery_script(code, code_path, batch=False)
+    except Exception as e:
+        return {"file": Path(code_path).name, "error": f"{type(e).__name__}: {e}"[:200]}
+
+    runs = {}
+    for name, overrides in configs.items():
+        start = time.perf_counter()
+        try:
+            shape = result_to_shape(run_cadquery_script(code, code_path, batch=False, booleans=overrides))
+            seconds = time.perf_counter() - start
+            runs[name] = {"seconds": seconds, "stats": geometry_stats(shape), "error": None}
+        except Exception as e:
+            runs[name] = {"seconds": time.perf_counter() - start, "stats": None,
+                          "error": f"{type(e).__name__}: {e}"[:200]}
+
+    reference = runs["cadquery"]["stats"]
+    for run in runs.values():
+        stats = run.pop("stats")
+        run["matches"] = bool(reference and stats and results_match(stats, reference))
+        run["volume"] = stats["volume"] if stats else None
+    return {"file": Path(code_path).name, "error": None, "runs": runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCCT boolean options on boolean-heavy scripts")
+    parser.add_argument("--input-dir", default=CODE_DIR)
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT,
+                        help="Number of the most boolean-heavy scripts to run (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS,
+                        help="Workers; each runs one script at a time so OCCT threads are not shared")
+    args = parser.parse_args()
+
+    weights = {str(path): boolean_weight(path.read_text()) for path in Path(args.input_dir).glob("*.py")}
+    scripts = sorted(weights, key=lambda path: -weights[path])[:args.limit]
+
+    print("=" * 60)
+    print("Boolean Options Benchmark")
+    print("=" * 60)
+    print(f"Scripts: {len(scripts)} most boolean-heavy of {len(weights)} in {args.input_dir}")
+    print(f"Configurations: {', '.join(f'{name} {options}' for name, options in CONFIGS.items())}\n")
+
+    pool = WarmPool(benchmark_single_file, workers=args.workers, timeout=TIMEOUT_SECONDS)
+    records = []
+    for (code_path, _), outcome, value in pool.run([(path, CONFIGS) for path in scripts]):
+        if outcome != "done" or value["error"]:
+            print(f"  ✗ {Path(code_path).name}: {value if outcome != 'done' else value['error']}")
+            continue
+        records.append(value)
+        print(f"  {value['file']}: " + ", ".join(
+            f"{name} {run['seconds']:.3f}s{'' if run['matches'] else ' (differs)'}"
+            for name, run in value["runs"].items()
+        ))
+
+    summary = {}
+    for name in CONFIGS:
+        seconds = np.array([record["runs"][name]["seconds"] for record in records])
+        if not len(seconds):
+            continue
+        summary[name] = {
+            "total_seconds": float(seconds.sum()),
+            "p50_seconds": float(np.percentile(seconds, 50)),
+            "p95_seconds": float(np.percentile(seconds, 95)),
+            "max_seconds": float(seconds.max()),
+            "mismatches": sum(1 for record in records if not record["runs"][name]["matches"]),
+        }
+
+    print("\n" + "=" * 60)
+    print(f"Latency over {len(records)} scripts (seconds)")
+    print("=" * 60)
+    print(f"  {'config':12s} {'total':>8s} {'p50':>7s} {'p95':>7s} {'max':>7s} {'vs cadquery':>12s} {'differs':>8s}")
+    baseline = summary.get("cadquery", {}).get("total_seconds")
+    for name, stats in summary.items():
+        ratio = baseline / stats["total_seconds"] if baseline and stats["total_seconds"] else 0.0
+        print(f"  {name:12s} {stats['total_seconds']:8.2f} {stats['p50_seconds']:7.3f} "
+              f"{stats['p95_seconds']:7.3f} {stats['max_seconds']:7.3f} {ratio:11.2f}x {stats['mismatches']:8d}")
+
+    with open(RESULTS_FILE, 'w') as f:
+        json.dump({"configs": CONFIGS, "summary": summary, "files": records}, f, indent=2)
+    print(f"\nResults saved to: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark the OCC and NumPy render backends against each other
+Reports render throughput for each backend and how closely their images agree
+"""
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+from tqdm import tqdm
+from PartToImage import VIEW_TYPES, get_renderer, load_shape
+
+
+STEP_DIR = "data/claude_fixed_steps"
+RESULTS_FILE = "render_backend_benchmark.json"
+DEFAULT_LIMIT = 50
+RESOLUTION = 448
+
+
+def render_file(backend, file_path, views):
+    """Load and render one file, returning (images, seconds)"""
+    start = time.perf_counter()
+    shape, file_type = load_shape(file_path)
+    images = get_renderer(backend).render_images(
+        shape,
+        views,
+        resolution_height=RESOLUTION,
+        resolution_width=RESOLUTION,
+        draw_face_boundaries=(file_type != "obj"),
+        premeshed=(file_type == "obj"),
+        remove_bg_flag=True
+    )
+    return images, time.perf_counter() - start
+
+
+def compare_images(reference, candidate):
+    """Silhouette IoU and mean RGB difference (0-255) over shared foreground"""
+    reference = np.asarray(reference.convert("RGBA"), dtype=np.float32)
+    candidate = np.asarray(candidate.convert("RGBA"), dtype=np.float32)
+
+    mask_a = reference[..., 3] > 127
+    mask_b = candidate[..., 3] > 127
+    union = np.logical_or(mask_a, mask_b).sum()
+    overlap = np.logical_and(mask_a, mask_b)
+
+    iou = overlap.sum() / union if union else 1.0
+    rgb_diff = float(np.abs(reference[overlap, :3] - candidate[overlap, :3]).mean()) if overlap.any() else 0.0
+    return float(iou), rgb_diff
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCC and NumPy render backends")
+    parser.add_argument("--input-dir", default=STEP_DIR)
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT,
+                        help="Number of files to render (default: %(default)s)")
+    parser.add_argument("--views", nargs="+", default=["iso"], choices=VIEW_TYPES)
+    args = parser.parse_args()
+
+    files = sorted(str(path) for path in Path(args.input_dir).glob("*.step"))[:args.limit]
+    if not files:
+        print(f"Error: No STEP files found in {args.input_dir}")
+        return
+
+    print("=" * 60)
+    print("Render Backend Benchmark")
+    print("=" * 60)
+    print(f"Files: {len(files)} from {args.input_dir}")
+    print(f"Views: {', '.join(args.views)}\n")
+
+    # Create both renderers up front so their startup is not timed
+    for backend in ("occ", "numpy"):
+        get_renderer(backend)
+
+    timings = {"occ": [], "numpy": []}
+    ious = []
+    rgb_diffs = []
+    failed = 0
+
+    for file_path in tqdm(files, desc="Benchmarking"):
+        try:
+            occ_images, occ_seconds = render_file("occ", file_path, args.views)
+            numpy_images, numpy_seconds = render_file("numpy", file_path, args.views)
+        except Exception as e:
+            tqdm.write(f"✗ {os.path.basename(file_path)}: {e}")
+            failed += 1
+            continue
+
+        timings["occ"].append(occ_seconds)
+        timings["numpy"].append(numpy_seconds)
+        for occ_image, numpy_image in zip(occ_images, numpy_images):
+            iou, rgb_diff = compare_images(occ_image, numpy_image)
+            ious.append(iou)
+            rgb_diffs.append(rgb_diff)
+
+    results = {
+        "files": len(files),
+        "failed": failed,
+        "views": args.views,
+        "backends": {},
+        "agreement": {
+            "silhouette_iou_mean": float(np.mean(ious)) if ious else 0.0,
+            "silhouette_iou_p5": percentile(ious, 5),
+            "rgb_abs_diff_mean": float(np.mean(rgb_diffs)) if rgb_diffs else 0.0,
+        },
+    }
+    for backend, seconds in timings.items():
+        total = sum(seconds)
+        results["backends"][backend] = {
+            "files_per_second": len(seconds) / total if total else 0.0,
+            "p50_seconds": percentile(seconds, 50),
+            "p95_seconds": percentile(seconds, 95),
+        }
+
+    print("\n" + "=" * 60)
+    print("Benchmark Summary")
+    print("=" * 60)
+    for backend, stats in results["backends"].items():
+        print(f"{backend:6s} {stats['files_per_second']:.2f} files/s  "
+              f"p50 {stats['p50_seconds'] * 1000:.0f} ms  p95 {stats['p95_seconds'] * 1000:.0f} ms")
+    agreement = results["agreement"]
+    print(f"Silhouette IoU:  {agreement['silhouette_iou_mean']:.3f} mean, "
+          f"{agreement['silhouette_iou_p5']:.3f} p5")
+    print(f"RGB difference:  {agreement['rgb_abs_diff_mean']:.1f} / 255 mean")
+    print(f"Failed:          {failed}")
+    print("=" * 60)
+
+    with open(RESULTS_FILE, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Batch boolean operations that generated scripts run inside for loops
+`result = result.union(x)` and `result = result.faces(">Z").workplane()...cutBlind()`
+in a loop run a full boolean against the growing solid on every iteration.
+batch_booleans() rewrites such loops so each iteration only builds its tool
+and a single multi-tool fuse or cut runs after the loop
+
+Batching is opt-in (PIPELINE_BATCH_BOOLEANS=1, see script_runner) and only
+applies to scripts whose batched result was checked once against the
+original in volume and bounding box: benchmark_boolean_batching.py runs
+the check, stores each verdict in the validation cache and reports the
+speedup.
+"""
+import ast
+import math
+import cadquery as cq
+from cadquery.cq import _selectShapes
+
+
+# Batched and original results must agree this closely
+REL_VOLUME_TOL = 1e-6
+REL_BBOX_TOL = 1e-6
+
+# Calls that are deferred; every other use of the batched name blocks a rewrite
+FUSE_METHODS = {"union"}
+CUT_METHODS = {"cut", "cutBlind", "cutThruAll"}
+
+BATCH_IMPORT = "from boolean_batching import BooleanBatch as _BooleanBatch"
+
+
+class BatchingUnsupported(Exception):
+    """A deferred call used arguments the batch cannot reproduce; run the script unbatched"""
+
+
+class BooleanBatch:
+    """
+    Collects the tools of one loop's booleans and applies them in flush()
+
+    union/cut/cut_blind/cut_thru_all mirror the Workplane methods they replace
+    but leave the base solid untouched, so later iterations select faces and
+    workplanes on it exactly as before. Only arguments whose result does not
+    depend on the partly-built solid are accepted; anything else raises
+    BatchingUnsupported.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind  # "fuse" or "cut"
+        self.tools = []
+        self.clean = False
+
+    def union(self, wp, toUnion=None, clean=True, glue=False, tol=None):
+        if glue or tol is not None:
+            raise BatchingUnsupported("union with glue or tol")
+        if toUnion is None:
+            raise BatchingUnsupported("union of the stack")
+        if isinstance(toUnion, cq.Workplane):
+            solids = toUnion.solids().vals()
+            if not solids:
+                raise ValueError("Workplane object must have at least one solid on the stack to union!")
+            wp._mergeTags(toUnion)
+            self.tools.extend(solids)
+        elif isinstance(toUnion, (cq.Solid, cq.Compound)):
+            self.tools.append(toUnion)
+        else:
+            raise ValueError(f"Cannot union type '{type(toUnion)}'")
+        self.clean = self.clean or clean
+        return wp
+
+    def cut(self, wp, toCut, clean=True, tol=None):
+        if tol is not None:
+            raise BatchingUnsupported("cut with tol")
+        solid = wp.findSolid()
+        if isinstance(toCut, cq.Workplane):
+            self.tools.extend(_selectShapes(toCut.vals()))
+            wp._mergeTags(toCut)
+        elif isinstance(toCut, (cq.Solid, cq.Compound)):
+            self.tools.append(toCut)
+        else:
+            raise ValueError(f"Cannot cut type '{type(toCut)}'")
+        self.clean = self.clean or clean
+        return wp.newObject([solid])
+
+    def cut_blind(self, wp, until, clean=True, both=False, taper=None):
+        # "next", "last" and faces cut up to the partly-built solid
+        if isinstance(until, bool) or not isinstance(until, (int, float)) or not isinstance(both, bool):
+            raise BatchingUnsupported("cutBlind up to a face")
+        self.tools.append(wp._extrude(until, both=both, taper=taper, additive=False))
+        self.clean = self.clean or clean
+        return wp.newObject([wp.findSolid()])
+
+    def cut_thru_all(self, wp, clean=True, taper=0):
+        if taper:
+            raise BatchingUnsupported("tapered cutThruAll")
+        solid = wp.findSolid()
+        # Cutting only shrinks the solid, so extruding both ways past the
+        # base solid's bounding box reaches through every later one too
+        box = solid.BoundingBox()
+        distance = 2 * box.DiagonalLength + (wp.plane.origin - box.center).Length
+        self.tools.append(wp._extrude(distance, both=True, additive=False))
+        self.clean = self.clean or clean
+        return wp.newObject([solid])
+
+    def flush(self, wp):
+        """Apply every collected tool in one boolean and return the result"""
+        if not self.tools:
+            return wp
+        tools, self.tools = self.tools, []
+        if self.kind == "cut":
+            result = wp.findSolid().cut(*tools)
+        else:
+            # The same base lookup as Workplane.union; with no base solid
+            # the tools are fused with each other
+            solid = wp._findType((cq.Solid, cq.Compound), searchStack=True, searchParents=True)
+            if solid is not None:
+                result = solid.fuse(*tools)
+            elif len(tools) > 1:
+                result = tools[0].fuse(*tools[1:])
+            else:
+                result = tools[0]
+        if self.clean:
+            result = result.clean()
+        return wp.newObject([result])
+
+
+_BATCH_METHODS = {
+    "union": "union",
+    "cut": "cut",
+    "cutBlind": "cut_blind",
+    "cutThruAll": "cut_thru_all",
+}
+
+
+def _names(node):
+    return [child.id for child in ast.walk(node) if isinstance(child, ast.Name)]
+
+
+def _chain_root(node):
+    """Name a method chain starts from (result in result.faces(...).cutBlind(...)), or None"""
+    while True:
+        if isinstance(node, ast.Call):
+            node = node.func
+        elif isinstance(node, ast.Attribute):
+            node = node.value
+        elif isinstance(node, ast.Name):
+            return node.id
+        else:
+            return None
+
+
+def _batchable(stmt):
+    """(name, method) for `name = <chain on name>.<boolean>(...)`, else None"""
+    if not (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1
+            and isinstance(stmt.targets[0], ast.Name)):
+        return None
+    call = stmt.value
+    if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+            and call.func.attr in _BATCH_METHODS):
+        return None
+    name = stmt.targets[0].id
+    if _chain_root(call.func.value) != name:
+        return None
+
+    # union/cut tools must not be built from the solid being deferred
+    arguments = call.args + [keyword.value for keyword in call.keywords]
+    if any(name in _names(argument) for argument in arguments):
+        return None
+    # Only cut-family chains may select on the base (faces(">Z").workplane()...)
+    if call.func.attr in ("union", "cut") and not isinstance(call.func.value, ast.Name):
+        return None
+    return name, call.func.attr
+
+
+class _LoopBatcher(ast.NodeTransformer):
+    """Rewrites the outermost eligible for loop of each loop nest"""
+
+    def __init__(self):
+        self.rewrites = []
+
+    def visit_For(self, node):
+        plan = self.plan(node)
+        if plan is None:
+            self.generic_visit(node)
+            return node
+
+        name, kind, statements = plan
+        batch = f"_boolean_batch_{len(self.rewrites)}"
+        for stmt in statements:
+            call = stmt.value
+            stmt.value = ast.Call(
+                func=ast.Attribute(ast.Name(batch, ast.Load()), _BATCH_METHODS[call.func.attr], ast.Load()),
+                args=[call.func.value] + call.args,
+                keywords=call.keywords
+            )
+        self.rewrites.append({
+            "line": node.lineno,
+            "name": name,
+            "kind": kind,
+            "operations": sorted({stmt.lineno for stmt in statements}),
+        })
+
+        create = ast.Assign(
+            targets=[ast.Name(batch, ast.Store())],
+            value=ast.Call(ast.Name("_BooleanBatch", ast.Load()), [ast.Constant(kind)], [])
+        )
+        flush = ast.Assign(
+            targets=[ast.Name(name, ast.Store())],
+            value=ast.Call(ast.Attribute(ast.Name(batch, ast.Load()), "flush", ast.Load()),
+                           [ast.Name(name, ast.Load())], [])
+        )
+        return [create, node, flush]
+
+    def plan(self, loop):
+        """(name, kind, statements) if every use of one name in the loop is a batchable boolean"""
+        if loop.orelse:
+            return None
+        statements = [stmt for stmt in ast.walk(loop) if isinstance(stmt, ast.stmt)
+                      and stmt is not loop and _batchable(stmt)]
+        if not statements:
+            return None
+        names = {_batchable(stmt)[0] for stmt in statements}
+        methods = {_batchable(stmt)[1] for stmt in statements}
+        if len(names) != 1:
+            return None
+        name = names.pop()
+        if methods <= FUSE_METHODS:
+            kind = "fuse"
+        elif methods <= CUT_METHODS:
+            kind = "cut"
+        else:
+            return None
+
+        # The loop variable and every other mention of name must be absent:
+        # the name reappears only as target and chain root of the booleans
+        if name in _names(loop.target):
+            return None
+        for stmt in loop.body:
+            for node in ast.walk(stmt):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+                                     ast.Global, ast.Nonlocal)):
+                    return None
+        uses = sum(1 for stmt in loop.body for node in ast.walk(stmt)
+                   if isinstance(node, ast.Name) and node.id == name)
+        if uses != 2 * len(statements):
+            return None
+        return name, kind, statements
+
+
+def _import_index(tree):
+    """Position after the module docstring and any __future__ imports"""
+    index = 0
+    body = tree.body
+    if (body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+            and isinstance(body[0].value.value, str)):
+        index = 1
+    while (index < len(body) and isinstance(body[index], ast.ImportFrom)
+           and body[index].module == "__future__"):
+        index += 1
+    return index
+
+
+def batch_booleans(code):
+    """
+    Rewrite loops of booleans on one solid into a single batched boolean
+
+    Returns (optimized_code, rewrites); rewrites lists each batched loop's
+    line, solid name, batch kind and the lines of its booleans. With no
+    rewrites optimized_code is code unchanged.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return code, []
+
+    batcher = _LoopBatcher()
+    tree = batcher.visit(tree)
+    if not batcher.rewrites:
+        return code, []
+
+    tree.body.insert(_import_index(tree), ast.parse(BATCH_IMPORT).body[0])
+    return ast.unparse(ast.fix_missing_locations(tree)), batcher.rewrites
+
+
+def results_match(stats, reference):
+    """Whether two geometry_stats dicts agree on volume and bounding box"""
+    scale = max(abs(reference["volume"]), 1e-12)
+    if not math.isclose(stats["volume"], reference["volume"], rel_tol=REL_VOLUME_TOL, abs_tol=1e-12):
+        return False
+    if stats["bbox"] is None or reference["bbox"] is None:
+        return stats["bbox"] == reference["bbox"]
+    size = max(high - low for low, high in zip(reference["bbox"][:3], reference["bbox"][3:]))
+    tolerance = REL_BBOX_TOL * max(size, scale ** (1 / 3))
+    return all(abs(a - b) <= tolerance for a, b in zip(stats["bbox"], reference["bbox"]))
@@ -0,0 +1,98 @@
+"""
+OCCT boolean options for the scripts the pipeline executes
+cadquery builds every fuse/cut/intersect/split through Shape._bool_op with
+parallel mode on and no OBB or fuzzy tolerance; this wraps it so the harness
+can switch on OBB acceleration and a fuzzy value, turn parallel mode off, and
+size OCCT's thread pool
+
+Options come from the environment so warm and forkserver workers inherit them:
+  PIPELINE_BOOLEAN_PARALLEL=0|1   SetRunParallel (default 1, as cadquery)
+  PIPELINE_BOOLEAN_OBB=0|1        SetUseOBB (default 0)
+  PIPELINE_BOOLEAN_FUZZY=<tol>    SetFuzzyValue (default 0, off)
+  PIPELINE_BOOLEAN_THREADS=<n>    OCCT thread pool size (default: OCCT's)
+  PIPELINE_BOOLEAN_SCOPE=process|script
+With scope "process" the options hold for everything the worker does; with
+"script" they only apply while run_cadquery_script executes a script.
+"""
+import os
+from contextlib import contextmanager
+import cadquery as cq
+from OCP.OSD import OSD_ThreadPool
+
+
+DEFAULT_OPTIONS = {
+    "parallel": True,
+    "use_obb": False,
+    "fuzzy": 0.0,
+    "threads": None,
+}
+SCOPES = ("process", "script")
+
+
+def options_from_env(environ=os.environ):
+    """Boolean options set by PIPELINE_BOOLEAN_* variables, defaults elsewhere"""
+    threads = environ.get("PIPELINE_BOOLEAN_THREADS")
+    return {
+        "parallel": environ.get("PIPELINE_BOOLEAN_PARALLEL", "1") != "0",
+        "use_obb": environ.get("PIPELINE_BOOLEAN_OBB", "0") == "1",
+        "fuzzy": float(environ.get("PIPELINE_BOOLEAN_FUZZY", "0")),
+        "threads": int(threads) if threads else None,
+    }
+
+
+BOOLEAN_OPTIONS = options_from_env()
+BOOLEAN_SCOPE = os.getenv("PIPELINE_BOOLEAN_SCOPE", "process")
+if BOOLEAN_SCOPE not in SCOPES:
+    raise ValueError(f"PIPELINE_BOOLEAN_SCOPE must be one of {SCOPES}, got {BOOLEAN_SCOPE!r}")
+
+_cadquery_bool_op = cq.Shape._bool_op
+_active = dict(DEFAULT_OPTIONS)
+
+
+def _bool_op(self, args, tools, op, parallel=True):
+    """Shape._bool_op with the active options applied to the builder"""
+    if _active["use_obb"]:
+        op.SetUseOBB(True)
+    # A script's own tol= wins when it is the larger tolerance
+    if _active["fuzzy"] and op.FuzzyValue() < _active["fuzzy"]:
+        op.SetFuzzyValue(_active["fuzzy"])
+    return _cadquery_bool_op(self, args, tools, op, parallel=parallel and _active["parallel"])
+
+
+def apply_options(options):
+    """Make options the active boolean options of this process"""
+    options = dict(DEFAULT_OPTIONS, **options)
+    if options["threads"] and options["threads"] != _active["threads"]:
+        OSD_ThreadPool.DefaultPool_s().Init(options["threads"])
+    _active.update(options)
+    cq.Shape._bool_op = _cadquery_bool_op if options == DEFAULT_OPTIONS else _bool_op
+
+
+@contextmanager
+def boolean_options(**overrides):
+    """Apply the active options updated with overrides for the enclosed block"""
+    previous = dict(_active)
+    previous_threads = OSD_ThreadPool.DefaultPool_s().NbThreads()
+    apply_options(dict(previous, **overrides))
+    try:
+        yield
+    finally:
+        apply_options(previous)
+        if OSD_ThreadPool.DefaultPool_s().NbThreads() != previous_threads:
+            OSD_ThreadPool.DefaultPool_s().Init(previous_threads)
+
+
+def script_options(overrides=None):
+    """Context for running one script: the per-script options, plus any overrides"""
+    options = dict(BOOLEAN_OPTIONS) if BOOLEAN_SCOPE == "script" else {}
+    options.update(overrides or {})
+    return boolean_options(**options)
+
+
+def result_affecting_options():
+    """Options that can change geometry (for cache keys); parallel, OBB and threads cannot"""
+    return {"boolean_fuzzy": BOOLEAN_OPTIONS["fuzzy"]} if BOOLEAN_OPTIONS["fuzzy"] else {}
+
+
+if BOOLEAN_SCOPE == "process":
+    apply_options(BOOLEAN_OPTIONS)
@@ -0,0 +1,363 @@
+"""
+Build each CadQuery script once: validate, export STEP and render together
+validate_generated_code.py, export_valid_to_step.py and render_valid_samples.py
+each execute a script on their own; here a single execution is checked in
+memory, written to STEP when requested and rendered from the live shape, and
+each script gets one JSONL record with the outcome of every stage
+
+Usage: python build_once.py [--views iso front] [--no-step] [--sink shards]
+"""
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+from contextlib import nullcontext
+import numpy as np
+import cadquery as cq
+from PartToImage import RENDER_BACKENDS, VIEW_TYPES, brep_to_occ_shape, get_renderer
+from ast_prescreen import prescreen_entry
+from render_sinks import IMAGE_FORMATS, SHARD_MAX_SAMPLES, PngSink, ShardSink
+from result_journal import ResultJournal, content_hash, load_journal
+from script_runner import shape_to_brep
+from stage_timing import SLOWEST_N, StageTimer, TimingLog, make_record, print_summary, summarize, timed
+from validation_cache import ValidationCache, default_cache, execute_shape, worker_failure_entry
+from worker_launch import format_startup
+from worker_pool import WarmPool
+
+
+# Configuration
+CODE_DIR = "data/claude_fixed_code"
+STEP_DIR = "data/claude_fixed_steps"
+OUTPUT_DIR = "data/claude_fixed_renders"
+SHARD_OUTPUT_DIR = "data/claude_fixed_render_shards"
+BUILD_JOURNAL_FILE = "data/build_results.jsonl"
+BUILD_RESULTS_FILE = "data/build_results.json"
+MAX_WORKERS = 8
+TIMEOUT_SECONDS = 30
+MAX_TASKS_PER_WORKER = 100  # Recycle each builder to bound renderer memory growth
+
+# Image settings
+VIEWS = ["iso"]
+RESOLUTION = 448
+REMOVE_BG = True  # Remove white background
+
+
+def build_single_file(code_path, step_path=None, views=VIEWS, backend="occ", entry=None, timings=False):
+    """
+    Validate, export and render one script from a single execution
+
+    entry is the script's validation cache entry when the parent already had
+    one; its BREP is used instead of running the script, which only runs
+    again if the BREP is missing from the cache. Each stage's outcome
+    is recorded under 'stages': validate is "valid" or "invalid", step and
+    render are "written"/"rendered", "skipped" or "failed" (with an error).
+    Returns a dict with the validation entry, stage outcomes and images.
+    """
+    with open(code_path, 'r') as f:
+        code = f.read()
+    cache = default_cache()
+    stages = {}
+    images = None
+
+    with StageTimer() if timings else nullcontext() as timer:
+        shape = None
+        brep = cache.brep_bytes(entry) if entry is not None else None
+        if brep is not None:
+            source = "cache"
+        else:
+            with timed("exec"):
+                entry, shape = execute_shape(code, code_path)
+            if shape is not None:
+                with timed("brep"):
+                    brep = shape_to_brep(shape)
+            entry = cache.store(code, entry, brep=brep)
+            source = "executed"
+
+        valid = entry["status_code"] == 0
+        stages["validate"] = {"outcome": "valid" if valid else "invalid", "source": source}
+
+        if not valid or not step_path:
+            stages["step"] = {"outcome": "skipped"}
+        else:
+            try:
+                with timed("step_export"):
+                    if shape is not None:
+                        cq.exporters.export(shape, step_path)
+                    else:
+                        cache.write_step(entry, step_path)
+                stages["step"] = {"outcome": "written", "path": step_path}
+            except Exception as e:
+                stages["step"] = {"outcome": "failed", "error": f"{type(e).__name__}: {e}"[:200]}
+
+        if not valid or not views:
+            stages["render"] = {"outcome": "skipped"}
+        else:
+            try:
+                # cadquery (OCP) and the renderer (pythonocc) bind OCCT
+                # separately, so the live shape crosses over as BREP
+                with timed("brep_handoff"):
+                    occ_shape = brep_to_occ_shape(brep)
+                rendered = get_renderer(backend).render_images(
+                    occ_shape,
+                    views,
+                    resolution_height=RESOLUTION,
+                    resolution_width=RESOLUTION,
+                    remove_bg_flag=REMOVE_BG
+                )
+                images = {view: np.asarray(image) for view, image in zip(views, rendered)}
+                stages["render"] = {"outcome": "rendered", "views": list(views)}
+            except Exception as e:
+                stages["render"] = {"outcome": "failed", "error": f"{type(e).__name__}: {e}"[:200]}
+
+    return {
+        'file': os.path.basename(code_path),
+        'entry': entry,
+        'stages': stages,
+        'images': images,
+        'timings': timer.as_dict() if timings else None
+    }
+
+
+def failed_build(code_path, entry, source):
+    """Result for a script that never reaches a builder (or whose builder died)"""
+    return {
+        'file': os.path.basename(code_path),
+        'entry': entry,
+        'stages': {
+            'validate': {'outcome': 'invalid', 'source': source},
+            'step': {'outcome': 'skipped'},
+            'render': {'outcome': 'skipped'}
+        },
+        'images': None,
+        'timings': None
+    }
+
+
+def build_record(result, sha256):
+    """Journal record for one script"""
+    entry = result['entry']
+    return {
+        "file": result['file'],
+        "sha256": sha256,
+        "status_code": entry["status_code"],
+        "error": entry["error"],
+        "error_class": entry.get("error_class"),
+        "valid": entry["status_code"] == 0,
+        "geometry": entry.get("stats"),
+        "stages": result['stages'],
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Validate, export and render CadQuery scripts in one pass")
+    parser.add_argument("--code-dir", default=CODE_DIR,
+                        help="Directory of CadQuery scripts (default: %(default)s)")
+    parser.add_argument("--step-dir", default=STEP_DIR,
+                        help="Where to write STEP files (default: %(default)s)")
+    parser.add_argument("--no-step", action="store_true",
+                        help="Do not write STEP files")
+    parser.add_argument("--views", nargs="*", default=VIEWS, choices=VIEW_TYPES,
+                        help="Views to render for each valid script; none to skip rendering (default: %(default)s)")
+    parser.add_argument("--backend", default="occ", choices=RENDER_BACKENDS,
+                        help="occ (OpenGL viewer) or numpy (headless software rasterizer)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Builder processes (default: %(default)s)")
+    parser.add_argument("--sink", default="png", choices=("png", "shards"),
+                        help="png: one file per view; shards: WebDataset-style tar shards")
+    parser.add_argument("--shard-size", type=int, default=SHARD_MAX_SAMPLES,
+                        help="Samples per shard (default: %(default)s)")
+    parser.add_argument("--image-format", default="png", choices=IMAGE_FORMATS,
+                        help="Image encoding inside shards (default: %(default)s)")
+    parser.add_argument("--journal", default=BUILD_JOURNAL_FILE,
+                        help="Append-only JSONL of per-script records (default: %(default)s)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip scripts whose journal entry matches their current content hash")
+    parser.add_argument("--timings", metavar="JSONL",
+                        help="Record per-stage wall/CPU time for each script to this JSONL file")
+    parser.add_argument("--slowest", type=int, default=SLOWEST_N,
+                        help="How many of the slowest scripts to list with --timings")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    output_dir = SHARD_OUTPUT_DIR if args.sink == "shards" else OUTPUT_DIR
+    step_dir = None if args.no_step else args.step_dir
+
+    print("=" * 60)
+    print("Build CadQuery Scripts Once (validate, STEP, render)")
+    print("=" * 60)
+
+    code_dir = Path(args.code_dir)
+    if not code_dir.exists():
+        print(f"Error: Directory {args.code_dir} does not exist")
+        return
+
+    py_files = sorted(code_dir.glob("*.py"))
+    hashes = {py_file.name: content_hash(py_file) for py_file in py_files}
+    previous = load_journal(args.journal) if args.resume else {}
+    to_build = [
+        py_file for py_file in py_files
+        if previous.get(py_file.name, {}).get("sha256") != hashes[py_file.name]
+    ]
+
+    print(f"Found {len(py_files)} scripts")
+    if args.resume:
+        print(f"Resuming: {len(py_files) - len(to_build)} unchanged scripts already in {args.journal}")
+    print(f"STEP output: {step_dir or 'off'}")
+    print(f"Views: {', '.join(args.views) or 'none'}")
+    print(f"Backend: {args.backend}")
+    print(f"Sink: {args.sink} ({output_dir})")
+    print(f"Workers: {args.workers}, timeout {TIMEOUT_SECONDS} seconds per script")
+    print()
+
+    if step_dir:
+        os.makedirs(step_dir, exist_ok=True)
+
+    # Rejected scripts and cached failures are recorded without a worker;
+    # cached valid scripts still go to one, which renders their cached BREP
+    cache = ValidationCache()
+    settled = []
+    tasks = []
+    for py_file in to_build:
+        with open(py_file, 'r') as f:
+            code = f.read()
+        entry = prescreen_entry(code, str(py_file))
+        if entry is not None:
+            settled.append(failed_build(py_file, entry, "prescreen"))
+            continue
+        entry = cache.lookup(code, timeout=TIMEOUT_SECONDS)
+        if entry is not None and entry["status_code"] != 0:
+            settled.append(failed_build(py_file, entry, "cache"))
+            continue
+        step_path = os.path.join(step_dir, f"{py_file.stem}.step") if step_dir else None
+        tasks.append((str(py_file), step_path, args.views, args.backend, entry, bool(args.timings)))
+
+    print(f"Pre-screen or cache settled: {len(settled)}, to build: {len(tasks)}\n")
+
+    if args.sink == "shards":
+        sink = ShardSink(output_dir, max_samples=args.shard_size, image_format=args.image_format)
+    else:
+        sink = PngSink(output_dir)
+    timing_log = TimingLog(args.timings) if args.timings else None
+
+    pool = WarmPool(
+        build_single_file,
+        workers=args.workers,
+        timeout=TIMEOUT_SECONDS,
+        max_tasks_per_worker=MAX_TASKS_PER_WORKER,
+        preload=("cadquery", "PartToImage")
+    )
+
+    outcomes = {stage: {} for stage in ("validate", "step", "render")}
+    start_time = time.time()
+    completed = 0
+    executed = 0
+    queued = {}  # base_name -> result (without images), for samples handed to the sink
+
+    def finish(result, journal):
+        for stage, status in result['stages'].items():
+            outcomes[stage][status['outcome']] = outcomes[stage].get(status['outcome'], 0) + 1
+        journal.write(build_record(result, hashes[result['file']]))
+
+    with ResultJournal(args.journal, resume=args.resume) as journal:
+        for result in settled:
+            finish(result, journal)
+
+        for task, outcome, value in pool.run(tasks):
+            code_path, step_path = task[0], task[1]
+            completed += 1
+            if outcome == "done":
+                result = value
+            else:
+                if outcome == "timeout":
+                    with open(code_path, 'r') as f:
+                        cache.store_timeout(f.read(), TIMEOUT_SECONDS)
+                result = failed_build(code_path, worker_failure_entry(outcome, value), "executed")
+
+            if result['stages']['validate']['source'] == "executed":
+                executed += 1
+
+            if result['images']:
+                base_name = Path(code_path).stem
+                sink.write(
+                    base_name,
+                    result['images'],
+                    source_path=code_path,
+                    step_path=step_path,
+                    metadata={
+                        'file': result['file'],
+                        'views': args.views,
+                        'resolution': RESOLUTION,
+                        'backend': args.backend
+                    }
+                )
+                queued[base_name] = dict(result, images=None)
+            if timing_log and result['timings']:
+                timing_log.write(make_record(result['file'], result['timings']))
+            finish(result, journal)
+
+            stages = result['stages']
+            failed = [stage for stage, status in stages.items() if status['outcome'] in ('invalid', 'failed')]
+            if failed:
+                error = result['entry']['error'] or stages[failed[0]].get('error')
+                print(f"[{completed}/{len(tasks)}] ✗ {result['file']} - {failed[0]}: {error}")
+            else:
+                print(f"[{completed}/{len(tasks)}] ✓ {result['file']}")
+
+        # Flush queued encodes before timing stops; a render only counts once
+        # written, so failed writes supersede their journal records
+        for base_name, error in sink.close().items():
+            result = queued[base_name]
+            outcomes['render']['rendered'] -= 1
+            result['stages']['render'] = {"outcome": "failed", "error": f"write failed: {error}"[:200]}
+            outcomes['render']['failed'] = outcomes['render'].get('failed', 0) + 1
+            journal.write(build_record(result, hashes[result['file']]))
+            print(f"✗ {result['file']} - render: {result['stages']['render']['error']}")
+    elapsed = time.time() - start_time
+
+    results = {
+        'total': len(py_files),
+        'built_this_run': len(to_build),
+        'executed': executed,
+        'stages': outcomes,
+        'elapsed_seconds': elapsed,
+        'scripts_per_second': len(to_build) / elapsed if elapsed > 0 else 0,
+        'workers': dict(pool.stats, startup=pool.startup_summary()),
+        'timestamp': datetime.now().isoformat()
+    }
+
+    print("\n" + "=" * 60)
+    print("Build Summary")
+    print("=" * 60)
+    print(f"Total scripts:   {results['total']}")
+    print(f"Built now:       {results['built_this_run']} ({results['executed']} executed, "
+          f"{len(tasks) - results['executed']} from cached BREP, {len(settled)} settled without a worker)")
+    for stage, counts in outcomes.items():
+        print(f"{stage + ':':<16} " + ", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items())))
+    print(f"Elapsed:         {elapsed:.1f} seconds ({results['scripts_per_second']:.2f} scripts/second)")
+    print(f"Workers started: {pool.stats['started']} "
+          f"({pool.stats['recycled']} recycled, {pool.stats['timeouts']} killed on timeout, "
+          f"{pool.stats['crashes']} crashed)")
+    print(format_startup(pool.startup_summary()))
+    print("=" * 60)
+
+    if timing_log:
+        timing_log.close()
+        results['stage_timings'] = summarize(timing_log.records, args.slowest)
+        print_summary(results['stage_timings'])
+        print(f"\nTiming records saved to: {args.timings}")
+
+    with open(BUILD_RESULTS_FILE, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\nJournal:          {args.journal}")
+    print(f"Results saved to: {BUILD_RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Local rule-based repair of known CadQuery API mistakes
+Each rule finds its mistake in the AST and returns text edits at the nodes'
+source positions, so everything it does not touch (comments, formatting)
+is kept as written. repair() applies every registered rule until none
+fires; the pipeline re-validates the result and only sends scripts it
+cannot repair to the LLM fixer.
+
+Rules for the mistakes CLAUDE_FIXING_PROMPT lists are built in; add more
+with @repair_rule("name").
+
+Usage: python code_repair.py data/gemini_generated_code [--validate]
+"""
+import re
+import ast
+import argparse
+from pathlib import Path
+
+
+MAX_PASSES = 10  # Rules re-run on the edited code until none fires
+
+# cq.Plane.named names, which Workplane() takes and workplane() does not
+PLANE_NAMES = {"XY", "YZ", "ZX", "XZ", "YX", "ZY", "front", "back", "left", "right", "top", "bottom"}
+
+# name -> function(tree, source) returning [(node, start, end, replacement)]
+REPAIR_RULES = {}
+
+
+def repair_rule(name):
+    """Register function(tree, source) as a repair rule"""
+    def register(func):
+        REPAIR_RULES[name] = func
+        return func
+    return register
+
+
+class _Source:
+    """Converts AST (line, UTF-8 byte column) positions to string offsets"""
+
+    def __init__(self, code):
+        self.code = code
+        # Only the line breaks the tokenizer counts (str.splitlines knows more)
+        self.lines = re.findall(r"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+$", code)
+        self.starts = [0]
+        for line in self.lines:
+            self.starts.append(self.starts[-1] + len(line))
+
+    def offset(self, lineno, col_offset):
+        line = self.lines[lineno - 1] if lineno <= len(self.lines) else ""
+        return self.starts[lineno - 1] + len(line.encode()[:col_offset].decode(errors="ignore"))
+
+    def start(self, node):
+        return self.offset(node.lineno, node.col_offset)
+
+    def end(self, node):
+        return self.offset(node.end_lineno, node.end_col_offset)
+
+    def text(self, node):
+        return self.code[self.start(node):self.end(node)]
+
+    def method(self, call):
+        """Offset of the method name in call (after the dot), so chain layout is kept"""
+        return self.end(call.func) - len(call.func.attr)
+
+
+def _method_calls(tree, names):
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in names:
+            yield node
+
+
+def _bound_names(tree):
+    """(names bound to the cadquery module by imports, names bound any other way)"""
+    modules, others = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == "cadquery":
+                    modules.add(alias.asname or "cadquery")
+                else:
+                    others.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.ImportFrom):
+            others.update(alias.asname or alias.name for alias in node.names)
+        elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            others.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            others.add(node.name)
+    return modules, others
+
+
+def _cadquery_names(tree):
+    """Names that only ever refer to the cadquery module (cq is injected when run)"""
+    modules, others = _bound_names(tree)
+    return (modules | {"cq"}) - others
+
+
+def _arguments(source, node, skip=(), extra=()):
+    """Source of a call's arguments without the keywords in skip, plus extra"""
+    parts = [source.text(arg) for arg in node.args]
+    for keyword in node.keywords:
+        if keyword.arg not in skip:
+            parts.append(f"{keyword.arg}={source.text(keyword.value)}" if keyword.arg
+                         else f"**{source.text(keyword.value)}")
+    return ", ".join(parts + list(extra))
+
+
+@repair_rule("filterBy")
+def remove_filter_by(tree, source):
+    """x.filterBy(...) does not exist: drop the call and keep x"""
+    return [(node, source.end(node.func.value), source.end(node), "")
+            for node in _method_calls(tree, {"filterBy"})]
+
+
+@repair_rule("rect_center")
+def rect_center(tree, source):
+    """.rect(w, h, center=(x, y), mode="a") -> .center(x, y).rect(w, h)"""
+    edits = []
+    for node in _method_calls(tree, {"rect"}):
+        keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+        if "center" not in keywords:
+            continue
+        center = keywords["center"]
+        skip = ("center", "mode")
+        if isinstance(center, ast.Constant) and isinstance(center.value, bool):
+            # center=True meant centered=True
+            replacement = f"rect({_arguments(source, node, skip, [f'centered={center.value}'])})"
+        elif isinstance(center, (ast.Tuple, ast.List)) and len(center.elts) == 2:
+            x, y = (source.text(element) for element in center.elts)
+            replacement = f"center({x}, {y}).rect({_arguments(source, node, skip)})"
+        else:
+            replacement = f"center(*{source.text(center)}).rect({_arguments(source, node, skip)})"
+        edits.append((node, source.method(node), source.end(node), replacement))
+    return edits
+
+
+@repair_rule("workplane_plane")
+def workplane_plane(tree, source):
+    """
+    result.workplane("XY") -> cq.Workplane("XY"), and cq.workplane(...) -> cq.Workplane(...)
+
+    A plane name passed to workplane() on an existing Workplane (where the
+    first parameter is the offset) meant a new Workplane on that plane.
+    workplane() with a numeric offset or no arguments is valid and kept.
+    """
+    modules = _cadquery_names(tree)
+    # Prefer the script's own import alias over the injected cq
+    alias = min(modules, key=lambda name: (name == "cq", name)) if modules else None
+    edits = []
+    for node in _method_calls(tree, {"workplane"}):
+        if isinstance(node.func.value, ast.Name) and node.func.value.id in modules:
+            edits.append((node, source.method(node), source.end(node.func), "Workplane"))
+        elif (alias and node.args and isinstance(node.args[0], ast.Constant)
+                and node.args[0].value in PLANE_NAMES):
+            arguments = [source.text(node.args[0])]
+            arguments += [f"origin={source.text(keyword.value)}" for keyword in node.keywords if keyword.arg == "origin"]
+            edits.append((node, source.start(node), source.end(node), f"{alias}.Workplane({', '.join(arguments)})"))
+    return edits
+
+
+@repair_rule("translate")
+def move_to_translate(tree, source):
+    """.move(x, y, z) and .position(...) -> .translate((x, y, z))"""
+    edits = []
+    for node in _method_calls(tree, {"move", "position"}):
+        if node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+            continue
+        if len(node.args) == 3:
+            vector = "(" + ", ".join(source.text(arg) for arg in node.args) + ")"
+        elif len(node.args) == 1 and node.func.attr == "position":
+            vector = source.text(node.args[0])
+        else:
+            # Workplane.move(x, y) is valid
+            continue
+        edits.append((node, source.method(node), source.end(node), f"translate({vector})"))
+    return edits
+
+
+@repair_rule("import_cadquery")
+def import_cadquery(tree, source):
+    """Add `import cadquery as cq` to scripts that use cq without importing it"""
+    imported = any(
+        (isinstance(node, ast.Import) and any(alias.name == "cadquery" for alias in node.names))
+        or (isinstance(node, ast.ImportFrom) and node.module == "cadquery")
+        for node in ast.walk(tree)
+    )
+    uses_cq = any(isinstance(node, ast.Name) and node.id == "cq" for node in ast.walk(tree))
+    if imported or not uses_cq or "cq" in _bound_names(tree)[1]:
+        return []
+
+    # Before the first statement after a module docstring and __future__
+    # imports; that statement uses cq, as neither of those can
+    for stmt in tree.body:
+        is_docstring = (stmt is tree.body[0] and isinstance(stmt, ast.Expr)
+                        and isinstance(stmt.value, ast.Constant) and isinstance(stmt.value.value, str))
+        if not (is_docstring or (isinstance(stmt, ast.ImportFrom) and stmt.module == "__future__")):
+            break
+    position = source.start(stmt)
+    # A statement sharing its line with the docstring (after a ;) gets the import on that line too
+    separator = "; " if stmt.col_offset else "\n"
+    return [(tree, position, position, "import cadquery as cq" + separator)]
+
+
+def repair(code, rules=None):
+    """
+    Apply repair rules to code until none fires
+
+    rules is a list of REPAIR_RULES names (default: all). Returns
+    (repaired_code, applied) where applied lists {"rule", "line"} per edit;
+    code that does not parse is returned unchanged.
+    """
+    rules = {name: REPAIR_RULES[name] for name in (rules or REPAIR_RULES)}
+    applied = []
+    for _ in range(MAX_PASSES):
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            break
+        source = _Source(code)
+
+        # Non-overlapping edits, innermost first; overlapping ones wait for the next pass
+        edits = []
+        for name, rule in rules.items():
+            for node, start, end, replacement in rule(tree, source):
+                if code[start:end] != replacement:
+                    # In a chain, the line of the method name rather than the chain's start
+                    line = node.func.end_lineno if isinstance(node, ast.Call) else getattr(node, "lineno", 1)
+                    edits.append((start, end, replacement, name, line))
+        chosen = []
+        for edit in sorted(edits, key=lambda edit: edit[1] - edit[0]):
+            if all(edit[1] <= other[0] or edit[0] >= other[1] for other in chosen):
+                chosen.append(edit)
+        if not chosen:
+            break
+
+        # Back to front; at one position a replacement goes before an insertion
+        for start, end, replacement, name, line in sorted(chosen, key=lambda edit: (-edit[0], edit[0] - edit[1])):
+            code = code[:start] + replacement + code[end:]
+            applied.append({"rule": name, "line": line})
+    return code, sorted(applied, key=lambda item: item["line"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the local CadQuery repair rules to a directory of scripts")
+    parser.add_argument("input_dir", nargs="?", default=".")
+    parser.add_argument("--validate", action="store_true",
+                        help="Validate each repaired script against its original")
+    args = parser.parse_args()
+
+    if args.validate:
+        from validation_cache import validate_source
+
+    rules = {}
+    outcomes = {}
+    paths = sorted(Path(args.input_dir).glob("*.py"))
+    for path in paths:
+        code = path.read_text()
+        repaired, applied = repair(code)
+        if not applied:
+            continue
+        for item in applied:
+            rules[item["rule"]] = rules.get(item["rule"], 0) + 1
+        line = f"{path.name}: " + ", ".join(f"{item['rule']}@{item['line']}" for item in applied)
+        if args.validate:
+            before = validate_source(code, str(path))[0]["status_code"]
+            after = validate_source(repaired, str(path))[0]["status_code"]
+            outcome = f"{before} -> {after}"
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            line += f" (status {outcome})"
+        print(line)
+
+    repaired_files = sum(1 for path in paths if repair(path.read_text())[1])
+    print(f"\n{len(paths)} files, {repaired_files} repaired")
+    for rule, count in sorted(rules.items(), key=lambda item: -item[1]):
+        print(f"  {rule}: {count}")
+    for outcome, count in sorted(outcomes.items()):
+        print(f"  status {outcome}: {count}")
+
+
+if __name__ == "__main__":
+    main()
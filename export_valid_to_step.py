@@ -3,12 +3,12 @@ Export all 144 valid Claude-fixed code samples to STEP files
 """
 import os
 import json
-import sys
-import subprocess
-import tempfile
-from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
 from tqdm import tqdm
+from ast_prescreen import prescreen_entry
+from validation_cache import default_cache, validate_source, worker_failure_entry
+from worker_launch import format_startup
+from worker_pool import MAX_TASKS_PER_WORKER, WarmPool
 
 
 # Configuration
@@ -19,66 +19,45 @@ MAX_WORKERS = 8
 TIMEOUT_SECONDS = 30
 
 
+def export_entry(entry, code_path, step_path, cache):
+    """
+    Write a validation cache entry's geometry to step_path
+
+    As before the geometry checks, any script that produced a shape is
+    exported; shapes that fail the checks are flagged 'non_solid'.
+    """
+    if not entry.get('has_brep'):
+        return {
+            'success': False,
+            'file': os.path.basename(code_path),
+            'error': (entry['error'] or 'No STEP file created')[:200]
+        }
+
+    cache.write_step(entry, step_path)
+    return {
+        'success': True,
+        'file': os.path.basename(code_path),
+        'output': step_path,
+        'size': os.path.getsize(step_path),
+        'non_solid': entry['status_code'] != 0
+    }
+
+
 def export_single_file(code_path, step_path):
-    """Export a single CadQuery Python file to STEP"""
+    """Export a single CadQuery Python file to STEP (runs in a warm worker)"""
     try:
         with open(code_path, 'r') as f:
             code = f.read()
 
-        # Remove show_object() calls
-        code = code.replace('show_object(result)', '')
-        code = code.replace('show_object(', '# show_object(')
-
-        # Create export script
-        export_template = f"""
-import cadquery as cq
-
-{code}
-
-cq.exporters.export(result, '{step_path}')
-"""
+        # show_object() calls are no-ops in the script namespace
+        entry, _ = validate_source(code, code_path, export_step=True)
+        return export_entry(entry, code_path, step_path, default_cache())
 
-        # Write and execute
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as tmp_py:
-            tmp_py_name = tmp_py.name
-            tmp_py.write(export_template)
-
-        result = subprocess.run(
-            [sys.executable, tmp_py_name],
-            timeout=TIMEOUT_SECONDS,
-            capture_output=True,
-            text=True
-        )
-
-        os.unlink(tmp_py_name)
-
-        if result.returncode == 0 and os.path.exists(step_path) and os.path.getsize(step_path) > 0:
-            return {
-                'success': True,
-                'file': os.path.basename(code_path),
-                'output': step_path,
-                'size': os.path.getsize(step_path)
-            }
-        else:
-            return {
-                'success': False,
-                'file': os.path.basename(code_path),
-                'error': result.stderr[:200] if result.stderr else 'No STEP file created'
-            }
-
-    except subprocess.TimeoutExpired:
-        if os.path.exists(tmp_py_name):
-            os.unlink(tmp_py_name)
-        return {
-            'success': False,
-            'file': os.path.basename(code_path),
-            'error': f'Timeout after {TIMEOUT_SECONDS}s'
-        }
     except Exception as e:
         return {
             'success': False,
             'file': os.path.basename(code_path),
-            'error': str(e)
+            'error': f"{type(e).__name__}: {e}"[:200]
         }
 
 
@@ -123,41 +102,76 @@ def main():
         'total': len(tasks),
         'successful': 0,
         'failed': 0,
+        'non_solid': 0,
         'total_size': 0,
         'files': []
     }
 
-    print(f"Processing {len(tasks)} files...\n")
-
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(export_single_file, code_path, step_path): (code_path, step_path)
-            for code_path, step_path in tasks
-        }
-
-        with tqdm(total=len(tasks), desc="Exporting") as pbar:
-            for future in as_completed(futures):
-                result = future.result()
-
-                if result['success']:
-                    results['successful'] += 1
-                    results['total_size'] += result.get('size', 0)
-                else:
-                    results['failed'] += 1
-                    error = result.get('error', 'Unknown')
-                    tqdm.write(f"✗ {result['file']}: {error}")
-
-                results['files'].append(result)
-                pbar.update(1)
+    # Scripts the pre-screen rejects fail here and ones with a cached
+    # validation are written straight from the cache
+    cache = default_cache()
+    cached_results = []
+    to_execute = []
+    for code_path, step_path in tasks:
+        with open(code_path, 'r') as f:
+            code = f.read()
+        entry = prescreen_entry(code, code_path) or cache.lookup(code, timeout=TIMEOUT_SECONDS)
+        if entry is None:
+            to_execute.append((code_path, step_path))
+        else:
+            cached_results.append(export_entry(entry, code_path, step_path, cache))
+    results['validation_cache_hits'] = len(cached_results)
+
+    print(f"Processing {len(tasks)} files ({len(cached_results)} from the pre-screen or validation cache)...\n")
+
+    # Workers fork from a server with cadquery preloaded and export many files
+    # each; a file that hangs past the timeout only costs its worker
+    pool = WarmPool(
+        export_single_file,
+        workers=MAX_WORKERS,
+        timeout=TIMEOUT_SECONDS,
+        max_tasks_per_worker=MAX_TASKS_PER_WORKER
+    )
+
+    with tqdm(total=len(tasks), desc="Exporting") as pbar:
+        def executed_results():
+            for (code_path, step_path), outcome, value in pool.run(to_execute):
+                if outcome == "done":
+                    yield value
+                    continue
+                if outcome == "timeout":
+                    with open(code_path, 'r') as f:
+                        cache.store_timeout(f.read(), TIMEOUT_SECONDS)
+                yield {
+                    'success': False,
+                    'file': os.path.basename(code_path),
+                    'error': worker_failure_entry(outcome, value)['error']
+                }
+
+        for result in itertools.chain(cached_results, executed_results()):
+            if result['success']:
+                results['successful'] += 1
+                results['total_size'] += result.get('size', 0)
+                if result.get('non_solid'):
+                    results['non_solid'] += 1
+            else:
+                results['failed'] += 1
+                error = result.get('error', 'Unknown')
+                tqdm.write(f"✗ {result['file']}: {error}")
+
+            results['files'].append(result)
+            pbar.update(1)
 
     # Summary
     print("\n" + "=" * 60)
     print("Export Summary")
     print("=" * 60)
     print(f"Total files:     {results['total']}")
-    print(f"Successful:      {results['successful']}")
+    print(f"Successful:      {results['successful']} ({results['non_solid']} non-solid shapes)")
     print(f"Failed:          {results['failed']}")
     print(f"Total size:      {results['total_size'] / 1024 / 1024:.2f} MB")
+    results['worker_startup'] = pool.startup_summary()
+    print(format_startup(results['worker_startup']))
     print("=" * 60)
 
     # Save results
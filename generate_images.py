@@ -1,18 +1,33 @@
 """
 Generate images from validated CadQuery code
 Renders 3D geometry to PNG images at 448x448 resolution
+
+Files can be split across machines with --shard-index/--num-shards; each
+shard writes its own summary and --merge-summaries combines them
 """
 import os
+import hashlib
+import argparse
 from pathlib import Path
 import json
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
-from PartToImage import convert_part_to_image
+from stage_timing import SLOWEST_N, TimingLog, make_record, merge_summaries as merge_timings, print_summary, summarize
+from worker_launch import format_startup, get_context, startup_summary, take_startup_report
+from PartToImage import (
+    RENDER_BACKENDS, VIEW_TYPES, convert_part_to_views, init_render_worker, view_save_paths
+)
 
 
 GENERATED_CODE_DIR = "data/generated_code"
 OUTPUT_IMAGE_DIR = "data/generated_code_images"
 VALIDATION_RESULTS_FILE = "data/validation_results.json"
+SUMMARY_FILE = "data/generated_code_images/render_summary.json"
 IMAGE_SIZE = 448
+VIEWS = ["iso"]
+MAX_WORKERS = 8
+MAX_TASKS_PER_CHILD = 100  # Recycle each renderer process to bound memory growth
 
 
 def load_validation_results():
@@ -38,8 +53,129 @@ def get_cad_paths(root_dir):
     return model_paths
 
 
+def shard_for(file, num_shards):
+    """Stable shard assignment from the file name, identical on every machine"""
+    digest = hashlib.sha1(file.encode('utf-8')).hexdigest()
+    return int(digest, 16) % num_shards
+
+
+def shard_summary_path(shard_index, num_shards):
+    root, ext = os.path.splitext(SUMMARY_FILE)
+    return f"{root}.shard-{shard_index:05d}-of-{num_shards:05d}{ext}"
+
+
+def render_file(input_path, output_paths, views, backend, timings=False):
+    """Render one CAD file in a worker process"""
+    worker_startup = take_startup_report()
+    try:
+        render_info = convert_part_to_views(
+            input_path,
+            views,
+            output_paths,
+            "BRepName",
+            resolution_height=IMAGE_SIZE,
+            resolution_width=IMAGE_SIZE,
+            remove_bg_flag=True,
+            backend=backend,
+            timings=timings
+        )
+        return {
+            "file": Path(input_path).name,
+            "success": True,
+            "tessellation_cache": render_info["tessellation_cache"],
+            "tessellation_evictions": render_info["tessellation_evictions"],
+            "timings": render_info.get("timings"),
+            "worker_startup": worker_startup
+        }
+    except Exception as e:
+        return {
+            "file": Path(input_path).name,
+            "success": False,
+            "error": str(e),
+            "worker_startup": worker_startup
+        }
+
+
+def merge_summaries(num_shards, slowest_n=SLOWEST_N):
+    """Combine per-shard summaries, including their stage timings, into SUMMARY_FILE"""
+    merged = {
+        "num_shards": num_shards,
+        "missing_shards": [],
+        "total": 0,
+        "successful": 0,
+        "failed": 0,
+        "skipped": 0,
+        "tessellation_cache": {"hit": 0, "miss": 0, "evicted": 0},
+        "files": [],
+        "timestamp": datetime.now().isoformat()
+    }
+    stage_timings = []
+
+    for shard_index in range(num_shards):
+        path = shard_summary_path(shard_index, num_shards)
+        if not os.path.exists(path):
+            merged["missing_shards"].append(shard_index)
+            continue
+        with open(path, 'r') as f:
+            shard = json.load(f)
+        for key in ("total", "successful", "failed", "skipped"):
+            merged[key] += shard[key]
+        for status in ("hit", "miss", "evicted"):
+            merged["tessellation_cache"][status] += shard["tessellation_cache"].get(status, 0)
+        merged["files"].extend(shard["files"])
+        if "stage_timings" in shard:
+            stage_timings.append(shard["stage_timings"])
+
+    if stage_timings:
+        merged["stage_timings"] = merge_timings(stage_timings, slowest_n)
+
+    with open(SUMMARY_FILE, 'w') as f:
+        json.dump(merged, f, indent=2)
+    return merged
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Generate images from validated CadQuery code")
+    parser.add_argument("--views", nargs="+", default=VIEWS, choices=VIEW_TYPES,
+                        help="Views to render for each file (default: %(default)s)")
+    parser.add_argument("--tessellation-cache", metavar="DIR",
+                        help="Reuse STEP and script meshes from this cache directory")
+    parser.add_argument("--backend", default="occ", choices=RENDER_BACKENDS,
+                        help="occ (OpenGL viewer) or numpy (headless software rasterizer)")
+    parser.add_argument("--timings", metavar="JSONL",
+                        help="Record per-stage wall/CPU time for each file to this JSONL file")
+    parser.add_argument("--slowest", type=int, default=SLOWEST_N,
+                        help="How many of the slowest files to list with --timings")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Renderer processes (default: %(default)s)")
+    parser.add_argument("--shard-index", type=int, default=0,
+                        help="Which shard of the file list this run renders")
+    parser.add_argument("--num-shards", type=int, default=1,
+                        help="Total number of shards the file list is split into")
+    parser.add_argument("--merge-summaries", action="store_true",
+                        help="Only merge existing shard summaries into one report")
+    args = parser.parse_args()
+    if not 0 <= args.shard_index < args.num_shards:
+        parser.error("--shard-index must be in [0, --num-shards)")
+    return args
+
+
 def main():
     """Main image generation process"""
+    args = parse_args()
+
+    if args.merge_summaries:
+        merged = merge_summaries(args.num_shards, args.slowest)
+        print(f"Merged {args.num_shards - len(merged['missing_shards'])}/{args.num_shards} shard summaries")
+        if merged["missing_shards"]:
+            print(f"Missing shards: {merged['missing_shards']}")
+        print(f"Successful: {merged['successful']}, Failed: {merged['failed']}, Skipped: {merged['skipped']}")
+        if "stage_timings" in merged:
+            print_summary(merged["stage_timings"])
+        print(f"Report saved to: {SUMMARY_FILE}")
+        return
+
     print("=" * 60)
     print("CadQuery Image Generation")
     print("=" * 60)
@@ -48,6 +184,9 @@ def main():
     os.makedirs(OUTPUT_IMAGE_DIR, exist_ok=True)
     print(f"Output directory: {OUTPUT_IMAGE_DIR}")
 
+    if args.tessellation_cache:
+        print(f"Tessellation cache: {args.tessellation_cache}")
+
     # Load validation results
     validation_data = load_validation_results()
 
@@ -59,22 +198,40 @@ def main():
         print(f"Error: No CAD files found in {GENERATED_CODE_DIR}")
         return
 
+    # Keep only this machine's share of the files
+    shard_files = sorted(
+        file for file in all_cad_files
+        if shard_for(file, args.num_shards) == args.shard_index
+    )
+
     print(f"Found {len(all_cad_files)} CAD files")
+    print(f"Shard {args.shard_index + 1}/{args.num_shards}: {len(shard_files)} files")
     print(f"Image size: {IMAGE_SIZE}x{IMAGE_SIZE}")
-    print(f"View: Isometric\n")
+    print(f"Backend: {args.backend}")
+    print(f"Workers: {args.workers}")
+    print(f"Views: {', '.join(args.views)}\n")
 
-    successful = 0
-    failed = 0
-    skipped = 0
+    summary = {
+        "shard_index": args.shard_index,
+        "num_shards": args.num_shards,
+        "total": len(shard_files),
+        "successful": 0,
+        "failed": 0,
+        "skipped": 0,
+        "tessellation_cache": {"hit": 0, "miss": 0, "evicted": 0},
+        "files": [],
+        "timestamp": datetime.now().isoformat()
+    }
 
-    for file in tqdm(all_cad_files, desc="Rendering"):
+    tasks = []
+    for file in shard_files:
         file_name = Path(file).name
 
         # Check validation if available
         if validation_data:
             file_info = validation_data.get("files", {}).get(file_name)
             if not file_info or not file_info.get("valid"):
-                skipped += 1
+                summary["skipped"] += 1
                 continue
 
         # Prepare paths
@@ -82,37 +239,81 @@ def main():
         png_name = os.path.splitext(file)[0] + ".png"
         png_name = png_name.replace("/", "_")
         output_path = os.path.join(OUTPUT_IMAGE_DIR, png_name)
+        output_paths = view_save_paths(output_path, args.views)
 
         # Skip if already exists
-        if os.path.exists(output_path):
-            skipped += 1
+        if all(os.path.exists(path) for path in output_paths):
+            summary["skipped"] += 1
             continue
 
-        # Render image
-        try:
-            convert_part_to_image(
-                input_path,
-                "iso",
-                output_path,
-                "BRepName",
-                resolution_height=IMAGE_SIZE,
-                resolution_width=IMAGE_SIZE,
-                remove_bg_flag=True
-            )
-            successful += 1
-        except Exception as e:
-            print(f"\n✗ Error rendering {file_name}: {str(e)}")
-            failed += 1
-            continue
+        tasks.append((input_path, output_paths))
+
+    timing_log = TimingLog(args.timings) if args.timings else None
+    worker_startups = []
+
+    # Render every view of a file from a single load, one file per task
+    # Workers fork from a server with OCC, cadquery and the renderer preloaded
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=get_context(extra_preload=("PartToImage",)),
+        initializer=init_render_worker,
+        initargs=(args.tessellation_cache, args.backend),
+        max_tasks_per_child=MAX_TASKS_PER_CHILD
+    ) as executor:
+        futures = [
+            executor.submit(render_file, input_path, output_paths, args.views, args.backend, bool(timing_log))
+            for input_path, output_paths in tasks
+        ]
+
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Rendering"):
+            result = future.result()
+            worker_startups.append(result.pop("worker_startup"))
+            if result["success"]:
+                summary["successful"] += 1
+                stages = result.pop("timings")
+                if timing_log:
+                    timing_log.write(make_record(result["file"], stages))
+                if result["tessellation_cache"]:
+                    summary["tessellation_cache"][result["tessellation_cache"]] += 1
+                summary["tessellation_cache"]["evicted"] += result["tessellation_evictions"]
+            else:
+                summary["failed"] += 1
+                tqdm.write(f"✗ Error rendering {result['file']}: {result['error']}")
+            summary["files"].append(result)
+
+    if timing_log:
+        timing_log.close()
+        summary["stage_timings"] = summarize(timing_log.records, args.slowest)
+
+    summary["worker_startup"] = startup_summary(worker_startups)
+
+    summary_path = shard_summary_path(args.shard_index, args.num_shards)
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    # A single shard is already the whole run
+    if args.num_shards == 1:
+        merge_summaries(1, args.slowest)
 
     # Summary
     print("\n" + "=" * 60)
     print("Rendering Complete")
     print("=" * 60)
-    print(f"Total files:    {len(all_cad_files)}")
-    print(f"Successful:     {successful}")
-    print(f"Failed:         {failed}")
-    print(f"Skipped:        {skipped}")
+    print(f"Total files:    {summary['total']}")
+    print(f"Successful:     {summary['successful']}")
+    print(f"Failed:         {summary['failed']}")
+    print(f"Skipped:        {summary['skipped']}")
+    if args.tessellation_cache:
+        print(f"Mesh cache:     {summary['tessellation_cache']['hit']} hits, "
+              f"{summary['tessellation_cache']['miss']} misses, "
+              f"{summary['tessellation_cache']['evicted']} evicted")
+    print(format_startup(summary["worker_startup"]))
+    print(f"Shard summary:  {summary_path}")
+    if timing_log:
+        print_summary(summary["stage_timings"])
+        print(f"\nTiming records saved to: {args.timings} (merge shards with: python stage_timing.py *.jsonl)")
+    if args.num_shards > 1:
+        print(f"Run with --merge-summaries --num-shards {args.num_shards} once all shards finish")
     print("=" * 60)
 
 
@@ -0,0 +1,273 @@
+"""
+asyncio engine for rate-limited LLM generation calls
+Each call waits on token buckets for requests/min and tokens/min and on an
+AIMD concurrency limit that grows while latency holds and halves on 429s,
+overload errors or latency blow-ups. Failed calls retry with jittered
+exponential backoff (honouring Retry-After), so throughput settles at what
+the provider actually allows rather than a hand-tuned worker count.
+"""
+import time
+import random
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0      # seconds before the first retry, doubled per attempt
+BACKOFF_CAP = 60.0      # seconds
+BURST_SECONDS = 10.0    # bucket capacity, in seconds of quota
+
+INITIAL_CONCURRENCY = 4
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 64
+DECREASE_FACTOR = 0.5
+# A call slower than this multiple of the baseline latency signals congestion
+LATENCY_TOLERANCE = 2.0
+# How fast the baseline (fastest recent latency) creeps up to follow the provider
+BASELINE_DRIFT = 0.01
+
+RATE_LIMIT_STATUSES = {429}
+OVERLOAD_STATUSES = {500, 502, 503, 504, 529}
+TRANSIENT_ERRORS = ("Timeout", "Connection", "DeadlineExceeded", "ServiceUnavailable", "Overloaded")
+
+
+def error_status(error):
+    """HTTP status of an SDK exception, or None"""
+    for attr in ("status_code", "code", "http_status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limit(error):
+    status = error_status(error)
+    name = type(error).__name__
+    return status in RATE_LIMIT_STATUSES or name in ("RateLimitError", "ResourceExhausted") or "429" in str(error)
+
+
+def is_retryable(error):
+    """Rate limits, overloads, 5xx and transport errors are worth retrying"""
+    if is_rate_limit(error) or error_status(error) in OVERLOAD_STATUSES:
+        return True
+    return any(marker in type(error).__name__ for marker in TRANSIENT_ERRORS)
+
+
+def retry_after(error):
+    """Seconds from a Retry-After header on the error's response, or None"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def gemini_usage_tokens(response):
+    """Prompt + output tokens of a google.generativeai response"""
+    usage = response.usage_metadata
+    return usage.prompt_token_count + usage.candidates_token_count
+
+
+class TokenBucket:
+    """
+    Continuous-refill token bucket shared by every in-flight call
+
+    Waiters are served in order. adjust() settles the difference once the
+    real cost of a call is known, so the level can go negative and hold
+    back later calls.
+    """
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                delay = (amount - self.level) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+    def adjust(self, amount):
+        """Charge amount more (or refund, if negative) than was acquired"""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class AIMDLimiter:
+    """
+    In-flight concurrency limit with additive increase, multiplicative decrease
+
+    Each call that completes without congestion adds 1/limit, so the limit
+    grows by one per window of calls; congestion cuts it by DECREASE_FACTOR,
+    at most once per baseline latency so one burst of 429s counts once.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY,
+                 decrease_factor=DECREASE_FACTOR, latency_tolerance=LATENCY_TOLERANCE):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline = None
+        self.last_decrease = 0.0
+        self.decreases = 0
+        self.peak = self.limit
+        self.samples = []
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency=None, congested=False):
+        """Return a slot; latency is None for calls that failed before a response"""
+        async with self.condition:
+            self.in_flight -= 1
+            if latency is not None:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    self.baseline *= 1 + BASELINE_DRIFT
+                congested = congested or latency > self.latency_tolerance * self.baseline
+
+            now = time.monotonic()
+            if congested:
+                if now - self.last_decrease > (self.baseline or 1.0):
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self.last_decrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.peak = max(self.peak, self.limit)
+            self.samples.append(self.limit)
+            self.condition.notify_all()
+
+
+class GenerationEngine:
+    """
+    Run provider calls under rate limits, adaptive concurrency and retries
+
+    call() accepts a coroutine function or a blocking SDK call; blocking
+    calls run on the engine's own thread pool, sized to max_concurrency.
+    usage_tokens(result) returns the tokens a response actually used so the
+    tokens/min bucket is settled against the estimate.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute,
+        tokens_per_minute,
+        usage_tokens=None,
+        initial_concurrency=INITIAL_CONCURRENCY,
+        max_concurrency=MAX_CONCURRENCY,
+        max_retries=MAX_RETRIES
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.limiter = AIMDLimiter(initial_concurrency, maximum=max_concurrency)
+        self.usage_tokens = usage_tokens
+        self.max_retries = max_retries
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.started = time.monotonic()
+        self.stats = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0,
+                      "rate_limited": 0, "tokens": 0, "latency_seconds": 0.0}
+
+    async def call(self, func, *args, estimated_tokens=1, timing=None, **kwargs):
+        """
+        Await func(*args, **kwargs) once the limits allow, retrying transient errors
+
+        If given, timing is filled with the successful call's latency, the
+        attempts it took and the seconds spent waiting for limits and backoff.
+        """
+        loop = asyncio.get_running_loop()
+        queued = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            await self.limiter.acquire()
+            self.stats["calls"] += 1
+            start = time.monotonic()
+            try:
+                if asyncio.iscoroutinefunction(func):
+                    result = await func(*args, **kwargs)
+                else:
+                    result = await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+            except Exception as e:
+                rate_limited = is_rate_limit(e)
+                self.stats["rate_limited"] += rate_limited
+                await self.limiter.release(congested=rate_limited or error_status(e) in OVERLOAD_STATUSES)
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(retry_after(e) or backoff_delay(attempt))
+                continue
+
+            latency = time.monotonic() - start
+            if timing is not None:
+                timing.update(latency=latency, attempts=attempt + 1, waited=start - queued)
+            self.stats["latency_seconds"] += latency
+            await self.limiter.release(latency)
+            used = self.usage_tokens(result) if self.usage_tokens else None
+            if used is not None:
+                self.tokens.adjust(used - estimated_tokens)
+                self.stats["tokens"] += used
+            self.stats["succeeded"] += 1
+            return result
+
+    def summary(self):
+        """Call counts, achieved rates and how concurrency adapted"""
+        elapsed = time.monotonic() - self.started
+        samples = self.limiter.samples
+        return dict(
+            self.stats,
+            elapsed_seconds=elapsed,
+            requests_per_minute=self.stats["calls"] / elapsed * 60 if elapsed > 0 else 0.0,
+            tokens_per_minute=self.stats["tokens"] / elapsed * 60 if elapsed > 0 else 0.0,
+            mean_latency_seconds=(self.stats["latency_seconds"] / self.stats["succeeded"]
+                                  if self.stats["succeeded"] else 0.0),
+            concurrency={
+                "final": self.limiter.limit,
+                "peak": self.limiter.peak,
+                "mean": sum(samples) / len(samples) if samples else self.limiter.limit,
+                "decreases": self.limiter.decreases,
+            },
+            bucket_wait_seconds={"requests": self.requests.waited, "tokens": self.tokens.waited},
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def format_summary(summary):
+    concurrency = summary["concurrency"]
+    return (f"Engine:          {summary['calls']} calls ({summary['retries']} retries, "
+            f"{summary['rate_limited']} rate-limited), {summary['requests_per_minute']:.1f} req/min, "
+            f"{summary['tokens_per_minute']:,.0f} tokens/min\n"
+            f"Concurrency:     {concurrency['final']:.1f} final, {concurrency['peak']:.1f} peak, "
+            f"{concurrency['mean']:.1f} mean, {concurrency['decreases']} decreases")
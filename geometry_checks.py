@@ -0,0 +1,56 @@
+"""
+In-memory geometric validity checks for CadQuery results
+Validation inspects the result shape directly instead of treating a
+non-empty exported STEP file as success
+"""
+import math
+
+
+# Bump when the checks change so cached validations are recomputed
+CHECKS_VERSION = 2
+
+MIN_SOLID_VOLUME = 1e-9
+
+
+def geometry_stats(shape):
+    """Topology counts, volume, area, bounding box and BRepCheck validity of a cadquery Shape"""
+    solids = shape.Solids()
+    shells = shape.Shells()
+    try:
+        box = shape.BoundingBox()
+        bbox = [box.xmin, box.ymin, box.zmin, box.xmax, box.ymax, box.zmax]
+    except Exception:
+        bbox = None
+
+    return {
+        "solids": len(solids),
+        "shells": len(shells),
+        "open_shells": sum(1 for shell in shells if not shell.Closed()),
+        "faces": len(shape.Faces()),
+        "edges": len(shape.Edges()),
+        "vertices": len(shape.Vertices()),
+        "volume": shape.Volume(),
+        "min_solid_volume": min((solid.Volume() for solid in solids), default=0.0),
+        "area": shape.Area(),
+        "bbox": bbox,
+        "brep_valid": shape.isValid(),
+    }
+
+
+def geometry_problem(stats):
+    """(error_class, message) for the first check stats fail, or None if the geometry is a valid solid"""
+    if stats["solids"] == 0:
+        return "NoSolid", f"no solids ({stats['faces']} faces, {stats['edges']} edges)"
+    if not stats["brep_valid"]:
+        return "InvalidShape", "BRepCheck_Analyzer reported defects"
+    if stats["open_shells"]:
+        return "OpenShell", f"{stats['open_shells']} of {stats['shells']} shells are not closed"
+    if not stats["min_solid_volume"] > MIN_SOLID_VOLUME:
+        return "NonPositiveVolume", f"solid volume {stats['min_solid_volume']:.3g}"
+
+    bbox = stats["bbox"]
+    if bbox is None or not all(math.isfinite(value) for value in bbox):
+        return "BadBoundingBox", "bounding box is not finite"
+    if any(high - low <= 0 for low, high in zip(bbox[:3], bbox[3:])):
+        return "BadBoundingBox", "bounding box is flat"
+    return None
@@ -0,0 +1,270 @@
+"""
+Per-operation profiler for CadQuery scripts
+While a script runs, public cq.Workplane methods are wrapped to record call
+counts, cumulative wall time and the B-rep size (faces) of each result, per
+operation and per script source line; records from a corpus are aggregated
+into a report of the hottest operations, lines and scripts
+
+Usage: python op_profiler.py data/claude_fixed_code [--output data/op_profile.jsonl]
+       python op_profiler.py --report data/op_profile.jsonl
+"""
+import sys
+import json
+import time
+import inspect
+import argparse
+import functools
+from pathlib import Path
+import cadquery as cq
+from script_runner import run_cadquery_script
+from worker_pool import WarmPool
+
+
+PROFILE_FILE = "data/op_profile.jsonl"
+NUM_WORKERS = 8
+TIMEOUT_SECONDS = 120
+TOP_N = 15
+
+
+def profiled_methods():
+    """Public Workplane methods defined as plain functions (properties are left alone)"""
+    return sorted(
+        name for name, member in inspect.getmembers(cq.Workplane, inspect.isfunction)
+        if not name.startswith("_")
+    )
+
+
+def brep_faces(result):
+    """Number of faces in the shapes an operation returned"""
+    if isinstance(result, cq.Workplane):
+        shapes = [val for val in result.vals() if isinstance(val, cq.Shape)]
+    elif isinstance(result, cq.Shape):
+        shapes = [result]
+    else:
+        return None
+    return sum(len(shape.Faces()) for shape in shapes)
+
+
+class OperationProfile:
+    """
+    Patch cq.Workplane methods for the duration of a with block
+
+    Only calls made directly by the script (filename) are recorded, so
+    Workplane methods calling each other internally are not counted twice:
+    a cutBlind's time includes the cut it performs. Results are kept per
+    operation and per (line, operation).
+    """
+
+    def __init__(self, filename, methods=None):
+        self.filename = filename
+        self.methods = methods or profiled_methods()
+        self.operations = {}
+        self.lines = {}
+        self._depth = 0
+        self._originals = {}
+
+    def __enter__(self):
+        for name in self.methods:
+            original = cq.Workplane.__dict__.get(name)
+            if original is None:
+                continue
+            self._originals[name] = original
+            setattr(cq.Workplane, name, self._wrap(name, original))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for name, original in self._originals.items():
+            setattr(cq.Workplane, name, original)
+        self._originals = {}
+        return False
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if self._depth:
+                return method(*args, **kwargs)
+
+            self._depth += 1
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+                elapsed = time.perf_counter() - start
+                # Still inside the call, so vals() here is not recorded
+                faces = brep_faces(result)
+            except Exception:
+                self._record(name, time.perf_counter() - start, None, failed=True)
+                raise
+            finally:
+                self._depth -= 1
+            self._record(name, elapsed, faces)
+            return result
+        return wrapper
+
+    def _caller_line(self):
+        frame = sys._getframe(2)
+        while frame is not None and frame.f_code.co_filename != self.filename:
+            frame = frame.f_back
+        return frame.f_lineno if frame is not None else None
+
+    def _record(self, name, elapsed, faces, failed=False):
+        line = self._caller_line()
+        for stats in (self.operations.setdefault(name, {"calls": 0, "seconds": 0.0, "max_faces": 0, "failed": 0}),
+                      self.lines.setdefault((line, name), {"calls": 0, "seconds": 0.0, "max_faces": 0, "failed": 0})):
+            stats["calls"] += 1
+            stats["seconds"] += elapsed
+            stats["failed"] += failed
+            if faces is not None:
+                stats["max_faces"] = max(stats["max_faces"], faces)
+
+    def as_record(self):
+        return {
+            "operations": self.operations,
+            "lines": [
+                dict(stats, line=line, operation=name)
+                for (line, name), stats in sorted(self.lines.items(), key=lambda item: -item[1]["seconds"])
+            ],
+        }
+
+
+def profile_source(code, filename="<cadquery>", methods=None):
+    """Run a script under OperationProfile and return its profile record"""
+    profile = OperationProfile(filename, methods)
+    error = None
+    start = time.perf_counter()
+    with profile:
+        try:
+            run_cadquery_script(code, filename)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:200]
+    record = {"file": filename, "total_seconds": time.perf_counter() - start, "error": error}
+    record.update(profile.as_record())
+    return record
+
+
+def profile_single_file(code_path):
+    """Profile one script file (runs in a warm worker)"""
+    with open(code_path, 'r') as f:
+        code = f.read()
+    record = profile_source(code, str(code_path))
+    source_lines = code.splitlines()
+    for item in record["lines"]:
+        if item["line"] and item["line"] <= len(source_lines):
+            item["source"] = source_lines[item["line"] - 1].strip()[:120]
+    return record
+
+
+def summarize_profiles(records, top_n=TOP_N):
+    """Hottest operations, source lines and scripts over many profile records"""
+    operations = {}
+    lines = []
+    for record in records:
+        for name, stats in record["operations"].items():
+            total = operations.setdefault(name, {"calls": 0, "seconds": 0.0, "scripts": 0, "max_faces": 0})
+            total["calls"] += stats["calls"]
+            total["seconds"] += stats["seconds"]
+            total["scripts"] += 1
+            total["max_faces"] = max(total["max_faces"], stats["max_faces"])
+        for item in record["lines"]:
+            lines.append(dict(item, file=Path(record["file"]).name))
+
+    profiled_seconds = sum(stats["seconds"] for stats in operations.values())
+    for stats in operations.values():
+        stats["mean_ms"] = stats["seconds"] / stats["calls"] * 1000
+        stats["share"] = stats["seconds"] / profiled_seconds if profiled_seconds else 0.0
+
+    hottest = sorted(operations.items(), key=lambda item: -item[1]["seconds"])[:top_n]
+    lines.sort(key=lambda item: -item["seconds"])
+    scripts = sorted(records, key=lambda record: -record["total_seconds"])[:top_n]
+    return {
+        "scripts": len(records),
+        "total_seconds": sum(record["total_seconds"] for record in records),
+        "profiled_seconds": profiled_seconds,
+        "operations": dict(hottest),
+        "lines": lines[:top_n],
+        "slowest": [
+            {
+                "file": Path(record["file"]).name,
+                "total_seconds": record["total_seconds"],
+                "top_operation": max(record["operations"].items(), key=lambda item: item[1]["seconds"],
+                                     default=(None, None))[0],
+                "error": record.get("error")
+            }
+            for record in scripts
+        ],
+    }
+
+
+def print_report(summary):
+    print(f"\nOperation profile over {summary['scripts']} scripts "
+          f"({summary['total_seconds']:.1f}s total, {summary['profiled_seconds']:.1f}s in Workplane calls)")
+    print(f"  {'operation':18s} {'calls':>7s} {'total s':>9s} {'share':>6s} {'mean ms':>9s} {'scripts':>8s} {'max faces':>10s}")
+    for name, stats in summary["operations"].items():
+        print(f"  {name:18s} {stats['calls']:7d} {stats['seconds']:9.2f} {stats['share']:6.1%} "
+              f"{stats['mean_ms']:9.2f} {stats['scripts']:8d} {stats['max_faces']:10d}")
+
+    if summary["lines"]:
+        print(f"\nHottest {len(summary['lines'])} source lines:")
+        for item in summary["lines"]:
+            print(f"  {item['seconds']:8.3f}s {item['calls']:5d}x {item['operation']:12s} "
+                  f"{item['file']}:{item['line']}  {item.get('source', '')}")
+
+    if summary["slowest"]:
+        print(f"\nSlowest {len(summary['slowest'])} scripts:")
+        for item in summary["slowest"]:
+            note = f"  ({item['error']})" if item["error"] else ""
+            print(f"  {item['total_seconds']:8.3f}s  {item['file']}  [{item['top_operation']}]{note}")
+
+
+def load_profiles(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile CadQuery scripts per Workplane operation")
+    parser.add_argument("paths", nargs="*", help="Script files or directories of scripts")
+    parser.add_argument("--output", default=PROFILE_FILE,
+                        help="JSONL of per-script profiles (default: %(default)s)")
+    parser.add_argument("--report", nargs="+", metavar="JSONL",
+                        help="Only summarize existing profile JSONL files")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_SECONDS,
+                        help="Seconds per script (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=TOP_N,
+                        help="Rows per report section (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.report:
+        records = [record for path in args.report for record in load_profiles(path)]
+        print_report(summarize_profiles(records, args.top))
+        return
+
+    code_paths = []
+    for path in map(Path, args.paths):
+        code_paths += sorted(path.glob("*.py")) if path.is_dir() else [path]
+    if not code_paths:
+        parser.error("no scripts to profile")
+
+    print(f"Profiling {len(code_paths)} scripts with {args.workers} workers "
+          f"({args.timeout:g}s timeout each)")
+
+    # Profiling patches cq.Workplane, so it only ever happens in the workers
+    pool = WarmPool(profile_single_file, workers=args.workers, timeout=args.timeout)
+    records = []
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        for (code_path,), outcome, value in pool.run([(str(path),) for path in code_paths]):
+            if outcome != "done":
+                # Keep killed scripts in the report; they are the slowest ones
+                print(f"  ✗ {Path(code_path).name}: {value}")
+                value = {"file": code_path, "total_seconds": args.timeout if outcome == "timeout" else 0.0,
+                         "error": value, "operations": {}, "lines": []}
+            records.append(value)
+            f.write(json.dumps(value) + "\n")
+
+    print_report(summarize_profiles(records, args.top))
+    print(f"\nProfiles saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
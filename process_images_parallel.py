@@ -4,11 +4,14 @@ Process images with Gemini API in parallel to generate CadQuery code
 import os
 import json
 import time
+import asyncio
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import google.generativeai as genai
 from PIL import Image
 from tqdm import tqdm
+from generation_engine import GenerationEngine, format_summary, gemini_usage_tokens
+from response_cache import CACHE_MODE, default_cache, file_hash, gemini_entry
+from response_cache import format_summary as format_cache_summary
 
 # Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
@@ -18,7 +21,11 @@ OUTPUT_PRICE_PER_1M = 5.00
 IMAGE_DIR = "data/sdg_abc_1k_images"
 OUTPUT_DIR = "data/cadquery_outputs"
 CODE_OUTPUT_DIR = "data/generated_code"
-MAX_WORKERS = 20  # Process 20 images in parallel
+# Provider quota; in-flight concurrency adapts up to MAX_CONCURRENCY within it
+REQUESTS_PER_MINUTE = 150
+TOKENS_PER_MINUTE = 1_000_000
+ESTIMATED_TOKENS_PER_IMAGE = 3000  # Settled against usage_metadata after each call
+MAX_CONCURRENCY = 64
 
 PROMPT = '''You are an expert CAD engineer. Analyze this 3D object image and generate CadQuery Python code to recreate it.
 
@@ -39,23 +46,29 @@ def clean_code(code_text):
         code_text = code_text.split('```')[1].split('```')[0]
     return code_text.strip()
 
-def process_single_image(model, image_path, output_path, code_output_path):
+def generate_for_image(model, image_path):
+    """One Gemini call for an image, opened only once the engine runs the call"""
+    with Image.open(image_path) as img:
+        return model.generate_content([PROMPT, img])
+
+async def process_single_image(engine, model, image_path, output_path, code_output_path):
     """Process a single image"""
     try:
-        start_time = time.time()
-
-        img = Image.open(image_path)
-        response = model.generate_content([PROMPT, img])
+        async def request():
+            timing = {}
+            response = await engine.call(generate_for_image, model, image_path,
+                                         estimated_tokens=ESTIMATED_TOKENS_PER_IMAGE, timing=timing)
+            return dict(gemini_entry(response), latency_seconds=timing["latency"])
 
-        elapsed_time = time.time() - start_time
+        entry = await default_cache().aget_or_call(MODEL_NAME, PROMPT, file_hash(image_path), {}, request)
+        elapsed_time = entry["latency_seconds"]
 
-        code = response.text
+        code = entry["text"]
         clean_code_text = clean_code(code)
 
-        # Get metrics
-        usage = response.usage_metadata
-        input_tokens = usage.prompt_token_count
-        output_tokens = usage.candidates_token_count
+        # Get metrics (a cached response is not paid for again)
+        input_tokens = entry["usage"]["input_tokens"]
+        output_tokens = entry["usage"]["output_tokens"]
         total_cost = (input_tokens / 1_000_000) * INPUT_PRICE_PER_1M + \
                      (output_tokens / 1_000_000) * OUTPUT_PRICE_PER_1M
 
@@ -68,7 +81,8 @@ def process_single_image(model, image_path, output_path, code_output_path):
             'output_tokens': output_tokens,
             'cost': total_cost,
             'time': elapsed_time,
-            'model': MODEL_NAME
+            'model': MODEL_NAME,
+            'cached': entry['cached']
         }
 
         # Save JSON
@@ -87,7 +101,8 @@ def process_single_image(model, image_path, output_path, code_output_path):
             'cost': total_cost,
             'time': elapsed_time,
             'input_tokens': input_tokens,
-            'output_tokens': output_tokens
+            'output_tokens': output_tokens,
+            'cached': entry['cached']
         }
 
     except Exception as e:
@@ -97,12 +112,49 @@ def process_single_image(model, image_path, output_path, code_output_path):
             'error': str(e)
         }
 
+async def process_all(model, tasks, metrics):
+    """Run every task through one engine, updating metrics as results arrive"""
+    engine = GenerationEngine(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, usage_tokens=gemini_usage_tokens,
+                              max_concurrency=MAX_CONCURRENCY)
+    pending = [process_single_image(engine, model, *task) for task in tasks]
+
+    try:
+        with tqdm(total=len(tasks), desc="Processing") as pbar:
+            for future in asyncio.as_completed(pending):
+                result = await future
+
+                if result['success'] and result['cached']:
+                    metrics['successful'] += 1
+                    metrics['cached'] += 1
+                    metrics['saved_cost'] += result['cost']
+                elif result['success']:
+                    metrics['successful'] += 1
+                    metrics['total_cost'] += result['cost']
+                    metrics['total_time'] += result['time']
+                    metrics['total_input_tokens'] += result['input_tokens']
+                    metrics['total_output_tokens'] += result['output_tokens']
+
+                    pbar.set_postfix({
+                        'cost': f"${metrics['total_cost']:.2f}",
+                        'avg': f"{metrics['total_cost']/max(metrics['successful'] - metrics['cached'], 1):.4f}",
+                        'conc': f"{engine.limiter.limit:.1f}"
+                    })
+                else:
+                    metrics['failed'] += 1
+                    tqdm.write(f"✗ Error: {result['file']} - {result.get('error', 'Unknown')}")
+
+                pbar.update(1)
+    finally:
+        engine.close()
+    return engine.summary()
+
 def main():
     print("=" * 60)
     print("CadQuery Code Generation with Gemini (Parallel)")
     print("=" * 60)
 
-    if not GEMINI_API_KEY:
+    # Replaying cached responses needs no key
+    if not GEMINI_API_KEY and CACHE_MODE != "replay":
         print("ERROR: GEMINI_API_KEY environment variable not set!")
         return
 
@@ -116,7 +168,8 @@ def main():
     # Get all images
     image_files = sorted([f for f in os.listdir(IMAGE_DIR) if f.endswith('.png')])
     print(f"Found {len(image_files)} images")
-    print(f"Workers: {MAX_WORKERS} parallel")
+    print(f"Limits: {REQUESTS_PER_MINUTE} req/min, {TOKENS_PER_MINUTE:,} tokens/min, "
+          f"up to {MAX_CONCURRENCY} in flight")
     print(f"Output: {OUTPUT_DIR}")
     print(f"Code: {CODE_OUTPUT_DIR}\n")
 
@@ -131,7 +184,7 @@ def main():
         if os.path.exists(output_path) and os.path.exists(code_output_path):
             continue
 
-        tasks.append((model, image_path, output_path, code_output_path))
+        tasks.append((image_path, output_path, code_output_path))
 
     if not tasks:
         print("All images already processed!")
@@ -147,36 +200,13 @@ def main():
         'total_cost': 0,
         'total_time': 0,
         'total_input_tokens': 0,
-        'total_output_tokens': 0
+        'total_output_tokens': 0,
+        'cached': 0,
+        'saved_cost': 0
     }
 
     start_time = time.time()
-
-    # Process in parallel with progress bar
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(process_single_image, *task): task for task in tasks}
-
-        with tqdm(total=len(tasks), desc="Processing") as pbar:
-            for future in as_completed(futures):
-                result = future.result()
-
-                if result['success']:
-                    metrics['successful'] += 1
-                    metrics['total_cost'] += result['cost']
-                    metrics['total_time'] += result['time']
-                    metrics['total_input_tokens'] += result['input_tokens']
-                    metrics['total_output_tokens'] += result['output_tokens']
-
-                    pbar.set_postfix({
-                        'cost': f"${metrics['total_cost']:.2f}",
-                        'avg': f"{metrics['total_cost']/metrics['successful']:.4f}"
-                    })
-                else:
-                    metrics['failed'] += 1
-                    tqdm.write(f"✗ Error: {result['file']} - {result.get('error', 'Unknown')}")
-
-                pbar.update(1)
-
+    engine_summary = asyncio.run(process_all(model, tasks, metrics))
     elapsed = time.time() - start_time
 
     # Final summary
@@ -187,17 +217,20 @@ def main():
     print(f"Successful:      {metrics['successful']}")
     print(f"Failed:          {metrics['failed']}")
     print(f"\nTotal cost:      ${metrics['total_cost']:.2f}")
-    print(f"Avg cost:        ${metrics['total_cost']/metrics['successful']:.4f} per image")
+    print(f"Avg cost:        ${metrics['total_cost']/max(metrics['successful'] - metrics['cached'], 1):.4f} per generated image")
+    print(f"Cached:          {metrics['cached']} images (${metrics['saved_cost']:.2f} not spent again)")
     print(f"\nTotal time:      {elapsed/3600:.2f} hours ({elapsed/60:.1f} minutes)")
     print(f"Throughput:      {metrics['successful']/(elapsed/60):.1f} images/minute")
     print(f"\nTokens:")
     print(f"  Input:         {metrics['total_input_tokens']:,}")
     print(f"  Output:        {metrics['total_output_tokens']:,}")
+    print(f"\n{format_summary(engine_summary)}")
+    print(format_cache_summary(default_cache().summary()))
     print("=" * 60)
 
     # Save summary
     with open('generation_summary.json', 'w') as f:
-        json.dump(metrics, f, indent=2)
+        json.dump(dict(metrics, engine=engine_summary, response_cache=default_cache().summary()), f, indent=2)
 
 if __name__ == "__main__":
     main()
@@ -3,12 +3,14 @@ Process images with Gemini API to generate CadQuery code
 """
 import os
 import json
+import asyncio
 from pathlib import Path
 import google.generativeai as genai
 from PIL import Image
 import time
 from datetime import datetime
 from dataclasses import dataclass, asdict
+from generation_engine import GenerationEngine, format_summary, gemini_usage_tokens
 
 # Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')  # Your API key
@@ -23,6 +25,12 @@ MODEL_NAME = "gemini-3-pro-preview"  # Gemini 3 Pro Preview model
 INPUT_PRICE_PER_1M = 1.25  # USD per 1M input tokens
 OUTPUT_PRICE_PER_1M = 5.00  # USD per 1M output tokens
 
+# Provider quota; concurrency adapts within it (see generation_engine)
+REQUESTS_PER_MINUTE = 150
+TOKENS_PER_MINUTE = 1_000_000
+ESTIMATED_TOKENS_PER_IMAGE = 3000  # Prompt + image + code, settled against usage_metadata
+MAX_CONCURRENCY = 32
+
 @dataclass
 class ProcessingMetrics:
     """Track metrics for image processing"""
@@ -96,16 +104,21 @@ def clean_code(code):
     return code.strip()
 
 
-def process_image(model, image_path, output_path, code_output_path, metrics):
+def generate_for_image(model, image_path):
+    """One Gemini call for an image, opened only once the engine runs the call"""
+    with Image.open(image_path) as img:
+        return model.generate_content([PROMPT, img])
+
+
+async def process_image(engine, model, image_path, output_path, code_output_path, metrics):
     """Process a single image with Gemini and track metrics"""
-    start_time = time.time()
+    timing = {}
 
     try:
-        # Load image
-        img = Image.open(image_path)
-
-        # Generate content
-        response = model.generate_content([PROMPT, img])
+        # Generate content once the engine's limits allow; every image
+        # is queued at once, so none is opened before its call runs
+        response = await engine.call(generate_for_image, model, image_path,
+                                     estimated_tokens=ESTIMATED_TOKENS_PER_IMAGE, timing=timing)
 
         # Extract code from response
         code = response.text
@@ -126,7 +139,8 @@ def process_image(model, image_path, output_path, code_output_path, metrics):
         metrics.total_output_tokens += output_tokens
         metrics.total_cost_usd += total_cost
 
-        processing_time = time.time() - start_time
+        # API time only; time spent queued behind the rate limits is not the image's
+        processing_time = timing["latency"]
         metrics.processing_times.append(processing_time)
 
         # Save JSON output
@@ -182,6 +196,31 @@ def save_metrics(metrics, filename):
         json.dump(metrics_dict, f, indent=2)
 
 
+async def process_images(model, pending, metrics):
+    """Process (image, json, code) paths through one engine; returns its summary"""
+    engine = GenerationEngine(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, usage_tokens=gemini_usage_tokens,
+                              max_concurrency=MAX_CONCURRENCY)
+
+    async def process(image_path, output_path, code_output_path):
+        if await process_image(engine, model, image_path, output_path, code_output_path, metrics):
+            metrics.successful += 1
+        else:
+            metrics.failed += 1
+        done = metrics.successful + metrics.failed
+        print(f"[{done}/{len(pending)}] {image_path.name} "
+              f"(concurrency {engine.limiter.limit:.1f}, {engine.limiter.in_flight} in flight)")
+
+        # Save metrics after each image (in case of interruption)
+        metrics.end_time = time.time()
+        save_metrics(metrics, METRICS_FILE)
+
+    try:
+        await asyncio.gather(*(process(*paths) for paths in pending))
+    finally:
+        engine.close()
+    return engine.summary()
+
+
 def main():
     """Main processing loop"""
     # Initialize metrics
@@ -206,11 +245,14 @@ def main():
 
     print(f"\nFound {len(images)} images to process")
     print(f"Model: {MODEL_NAME}")
+    print(f"Limits: {REQUESTS_PER_MINUTE} req/min, {TOKENS_PER_MINUTE:,} tokens/min, "
+          f"up to {MAX_CONCURRENCY} in flight")
     print(f"JSON output: {OUTPUT_DIR}")
     print(f"Code output: {CODE_OUTPUT_DIR}\n")
 
-    # Process each image
-    for idx, image_path in enumerate(images, 1):
+    # Skip images that are already processed, then run the rest concurrently
+    pending = []
+    for image_path in images:
         # Create output filenames
         output_filename = image_path.stem + ".json"
         output_path = output_dir / output_filename
@@ -223,21 +265,9 @@ def main():
             print(f"⊘ Skipped (already exists): {image_path.name}")
             metrics.skipped += 1
             continue
+        pending.append((image_path, output_path, code_output_path))
 
-        # Process image
-        print(f"[{idx}/{len(images)}] Processing {image_path.name}...")
-
-        if process_image(model, image_path, output_path, code_output_path, metrics):
-            metrics.successful += 1
-        else:
-            metrics.failed += 1
-
-        # Rate limiting - be nice to the API
-        time.sleep(1)  # Adjust as needed
-
-        # Save metrics after each image (in case of interruption)
-        metrics.end_time = time.time()
-        save_metrics(metrics, METRICS_FILE)
+    engine_summary = asyncio.run(process_images(model, pending, metrics))
 
     # Final metrics
     metrics.end_time = time.time()
@@ -264,6 +294,7 @@ def main():
     print(f"  Per image:  {metrics.avg_time_per_image:.2f} seconds")
     print(f"\nThroughput:")
     print(f"  {metrics.throughput_images_per_minute:.2f} images/minute")
+    print(f"\n{format_summary(engine_summary)}")
     print(f"\nMetrics saved to: {METRICS_FILE}")
     print(f"{'='*60}")
 
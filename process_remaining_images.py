@@ -1,19 +1,28 @@
 """
-Complete pipeline: Gemini generation → Claude fixing → Validation → STEP export
+Complete pipeline: Gemini generation → Validation → local rule repair → Claude
+fixing (only of code still failing) → Validation → STEP export
 Processes the remaining images (244-1000) from the dataset
 """
 import os
 import json
 import sys
-import subprocess
+import asyncio
 import tempfile
 import time
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
 import anthropic
 import google.generativeai as genai
 from PIL import Image
+from ast_prescreen import prescreen_entry
+from code_repair import repair
+from response_cache import CACHE_MODE, claude_entry, default_cache as response_cache, file_hash, gemini_entry, sha256_bytes
+from response_cache import format_summary as format_cache_summary
+from generation_engine import GenerationEngine
+from generation_engine import format_summary as format_engine_summary
+from staged_pipeline import Stage, run_stages
+from validation_cache import default_cache, validate_source, worker_failure_entry
+from worker_launch import format_startup, run_in_child, startup_summary, take_startup_report
 
 # Configuration
 IMAGES_DIR = "data/sdg_abc_1k_images"
@@ -24,22 +33,44 @@ VALIDATION_RESULTS_FILE = "data/pipeline_validation_results.json"
 # API Configuration
 GEMINI_MODEL = "gemini-2.0-flash-exp"
 CLAUDE_MODEL = "claude-sonnet-4-5-20250929"
-MAX_WORKERS = 8
 TIMEOUT_SECONDS = 30
+CLAUDE_PARAMS = {"max_tokens": 4000}
+
+# Claude Sonnet 4.5: $3/MTok input, $15/MTok output
+CLAUDE_INPUT_PRICE_PER_1M = 3.00
+CLAUDE_OUTPUT_PRICE_PER_1M = 15.00
+# Per-call usage assumed for saved fixer calls when no fixer call ran
+ESTIMATED_FIX_INPUT_TOKENS = 500
+ESTIMATED_FIX_OUTPUT_TOKENS = 1000
+
+# Stages run overlapped, each with its own workers and bounded input queue
+GEMINI_WORKERS = 32
+CLAUDE_WORKERS = 32
+VALIDATE_WORKERS = 8  # Concurrent validations, each script in its own child
+STAGE_QUEUE_SIZE = 16
+DASHBOARD_INTERVAL = 10.0  # seconds
+
+# Provider quotas for the generation engines
+GEMINI_REQUESTS_PER_MINUTE = 150
+GEMINI_TOKENS_PER_MINUTE = 1_000_000
+CLAUDE_REQUESTS_PER_MINUTE = 50
+CLAUDE_TOKENS_PER_MINUTE = 400_000
+ESTIMATED_TOKENS_PER_CALL = 3000  # Settled against usage after each call
 
 # Get API keys from environment
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not ANTHROPIC_API_KEY:
+# Replaying cached responses (PIPELINE_LLM_CACHE=replay) needs no keys
+if not ANTHROPIC_API_KEY and CACHE_MODE != "replay":
     print("Error: ANTHROPIC_API_KEY environment variable not set")
     sys.exit(1)
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and CACHE_MODE != "replay":
     print("Error: GEMINI_API_KEY environment variable not set")
     sys.exit(1)
 
 # Initialize clients
-anthropic_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+anthropic_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY) if ANTHROPIC_API_KEY else None
 genai.configure(api_key=GEMINI_API_KEY)
 gemini_model = genai.GenerativeModel(GEMINI_MODEL)
 
@@ -72,6 +103,9 @@ COMMON ERRORS TO FIX:
 
 5. Missing `import cadquery as cq` at the top
 
+Running the code failed with:
+{error_class}: {error}
+
 RULES:
 - Keep the same design intent
 - Fix API errors while preserving functionality
@@ -114,175 +148,261 @@ def get_already_processed_files():
     return processed
 
 
-def generate_with_gemini(image_path):
-    """Generate CadQuery code using Gemini"""
-    try:
-        image = Image.open(image_path)
-        response = gemini_model.generate_content([GEMINI_PROMPT, image])
+def extract_code(text):
+    """Extract code from markdown if present"""
+    if "```python" in text:
+        return text.split("```python")[1].split("```")[0].strip()
+    if "```" in text:
+        return text.split("```")[1].split("```")[0].strip()
+    return text
 
-        if not response.text:
-            return None, "Empty response from Gemini"
 
-        # Extract code from markdown if present
-        code = response.text
-        if "```python" in code:
-            code = code.split("```python")[1].split("```")[0].strip()
-        elif "```" in code:
-            code = code.split("```")[1].split("```")[0].strip()
+def gemini_request(image_path):
+    """One Gemini call for an image, as response cache entry fields"""
+    image = Image.open(image_path)
+    return gemini_entry(gemini_model.generate_content([GEMINI_PROMPT, image]))
 
-        return code, None
-    except Exception as e:
-        return None, str(e)
 
+def claude_request(code, error_class, error):
+    """One Claude fixing call, as response cache entry fields"""
+    return claude_entry(anthropic_client.messages.create(
+        model=CLAUDE_MODEL,
+        messages=[{
+            "role": "user",
+            "content": CLAUDE_FIXING_PROMPT.format(code=code, error_class=error_class, error=error)
+        }],
+        **CLAUDE_PARAMS
+    ))
 
-def fix_with_claude(code):
-    """Fix code using Claude"""
-    try:
-        message = anthropic_client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=4000,
-            messages=[{
-                "role": "user",
-                "content": CLAUDE_FIXING_PROMPT.format(code=code)
-            }]
-        )
 
-        fixed_code = message.content[0].text
+def entry_usage_tokens(entry):
+    """Tokens a request used, from its cache entry fields"""
+    return entry["usage"]["input_tokens"] + entry["usage"]["output_tokens"]
 
-        # Extract code from markdown if present
-        if "```python" in fixed_code:
-            fixed_code = fixed_code.split("```python")[1].split("```")[0].strip()
-        elif "```" in fixed_code:
-            fixed_code = fixed_code.split("```")[1].split("```")[0].strip()
 
-        return fixed_code, None
+async def generate_with_gemini(engine, image_path):
+    """Generate CadQuery code using Gemini (through the response cache and engine)"""
+    try:
+        entry = await response_cache().aget_or_call(
+            GEMINI_MODEL, GEMINI_PROMPT, file_hash(image_path), {},
+            lambda: engine.call(gemini_request, image_path, estimated_tokens=ESTIMATED_TOKENS_PER_CALL)
+        )
+        if not entry["text"]:
+            return None, "Empty response from Gemini"
+        return extract_code(entry["text"]), None
     except Exception as e:
         return None, str(e)
 
 
-def validate_code(code_path, timeout):
-    """Validate CadQuery code by executing it"""
+async def fix_with_claude(engine, code, error_class, error):
+    """
+    Fix code that failed validation using Claude (through the response cache
+    and engine); returns (code, error, usage) where usage notes whether the
+    response came from the cache
+    """
     try:
-        with tempfile.NamedTemporaryFile(suffix='.step', delete=False) as tmp:
-            step_file = tmp.name
+        entry = await response_cache().aget_or_call(
+            CLAUDE_MODEL, CLAUDE_FIXING_PROMPT, sha256_bytes(json.dumps([code, error_class, error])), CLAUDE_PARAMS,
+            lambda: engine.call(claude_request, code, error_class, error, estimated_tokens=ESTIMATED_TOKENS_PER_CALL)
+        )
+        return extract_code(entry["text"]), None, dict(entry["usage"], cached=entry["cached"])
+    except Exception as e:
+        return None, str(e), None
 
+
+def validate_code(code_path, timeout):
+    """
+    Validate CadQuery code from the validation cache, or by executing it in a
+    child forked from a preloaded server (which caches the result)
+    Returns (status_code, error, step_file, error_class)
+    """
+    try:
         with open(code_path, 'r') as f:
             code = f.read()
 
-        # Remove show_object() calls
-        code = code.replace('show_object(result)', '')
-        code = code.replace('show_object(', '# show_object(')
-
-        template = f"""
-import cadquery as cq
-
-{code}
+        cache = default_cache()
+        entry = prescreen_entry(code, code_path) or cache.lookup(code, timeout=timeout)
+        if entry is None:
+            # show_object() calls are no-ops in the script namespace
+            outcome, value = run_in_child(validate_source, (code, code_path), timeout)
+            if outcome == "timeout":
+                cache.store_timeout(code, timeout)
+            if outcome == "done":
+                entry, _ = value
+            else:
+                entry = worker_failure_entry(outcome, value)
 
-cq.exporters.export(result, '{step_file}')
-"""
+        if entry['status_code'] != 0:
+            return entry['status_code'], entry['error'][:200], None, entry.get('error_class')
 
-        # Write to temp Python file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as tmp_py:
-            tmp_py_name = tmp_py.name
-            tmp_py.write(template)
-
-        # Execute with subprocess
-        result = subprocess.run(
-            [sys.executable, tmp_py_name],
-            timeout=timeout,
-            capture_output=True,
-            text=True
-        )
+        with tempfile.NamedTemporaryFile(suffix='.step', delete=False) as tmp:
+            step_file = tmp.name
+        cache.write_step(entry, step_file)
+        return 0, None, step_file, None
 
-        # Clean up temp Python file
-        os.unlink(tmp_py_name)
-
-        if result.returncode != 0:
-            error_msg = result.stderr if result.stderr else result.stdout
-            if "SyntaxError" in error_msg:
-                return 2, f"Syntax error: {error_msg[:200]}", None
-            elif "NameError" in error_msg:
-                return 2, f"Name error: {error_msg[:200]}", None
-            elif "OCC" in error_msg or "opencascade" in error_msg.lower():
-                return 3, f"OCC error: {error_msg[:200]}", None
-            else:
-                return 2, f"Runtime error: {error_msg[:200]}", None
-
-        # Check if STEP file was created
-        if os.path.exists(step_file) and os.path.getsize(step_file) > 0:
-            return 0, None, step_file
-        else:
-            if os.path.exists(step_file):
-                os.unlink(step_file)
-            return 5, "No geometry created", None
-
-    except subprocess.TimeoutExpired:
-        if os.path.exists(tmp_py_name):
-            os.unlink(tmp_py_name)
-        return 4, f"Timeout after {timeout} seconds", None
     except Exception as e:
-        return 6, f"Error: {str(e)}", None
-    finally:
-        if 'step_file' in locals() and os.path.exists(step_file):
-            try:
-                if 'step_file' not in str(locals().get('step_file', '')):
-                    os.unlink(step_file)
-            except:
-                pass
-
-
-def process_single_image(image_path, base_name):
-    """Process a single image through the complete pipeline"""
-    result = {
-        'image': base_name,
-        'gemini_success': False,
-        'claude_success': False,
-        'validation_code': None,
-        'validation_error': None
-    }
-
-    # Step 1: Generate with Gemini
-    gemini_code, gemini_error = generate_with_gemini(image_path)
-    if gemini_error:
-        result['gemini_error'] = gemini_error
-        return result
+        return 6, f"Error: {str(e)}", None, type(e).__name__
 
-    result['gemini_success'] = True
 
-    # Save Gemini output
-    gemini_output_path = os.path.join(GEMINI_OUTPUT_DIR, f"{base_name}.py")
-    with open(gemini_output_path, 'w') as f:
-        f.write(gemini_code)
-
-    # Step 2: Fix with Claude
-    claude_code, claude_error = fix_with_claude(gemini_code)
-    if claude_error:
-        result['claude_error'] = claude_error
-        return result
+def validate_in_worker(code_path, timeout):
+    """Validation stage task (runs on a validation thread); the STEP file is not kept"""
+    error_code, error_msg, step_file, error_class = validate_code(code_path, timeout)
+    if step_file and os.path.exists(step_file):
+        os.unlink(step_file)
+    return error_code, error_msg, error_class, take_startup_report()
 
-    result['claude_success'] = True
 
-    # Save Claude output
-    claude_output_path = os.path.join(CLAUDE_OUTPUT_DIR, f"{base_name}.py")
-    with open(claude_output_path, 'w') as f:
-        f.write(claude_code)
+def pipeline_stages(gemini_engine, claude_engine, validate_pool):
+    """
+    Gemini generation → validation → local repair → Claude fixing →
+    validation, as overlapped stages; code that validates first time, or
+    once the local rules (code_repair) have repaired it, skips the fixer
+    """
+    loop = asyncio.get_running_loop()
 
-    # Step 3: Validate code (check if it executes without error)
-    error_code, error_msg, step_file = validate_code(claude_output_path, TIMEOUT_SECONDS)
+    async def validate(result, code_path):
+        # Check the code executes without error
+        error_code, error_msg, error_class, startup = await loop.run_in_executor(
+            validate_pool, validate_in_worker, code_path, TIMEOUT_SECONDS
+        )
+        result['validation_code'] = error_code
+        result['validation_error'] = error_msg
+        result['validation_error_class'] = error_class
+        if startup is not None:
+            result['worker_startup'] = startup
+        return error_code == 0
+
+    async def generate(result):
+        gemini_code, gemini_error = await generate_with_gemini(gemini_engine, result['image_path'])
+        if gemini_error:
+            result['gemini_error'] = gemini_error
+            return False
+        result['gemini_success'] = True
+
+        # Save Gemini output
+        gemini_output_path = os.path.join(GEMINI_OUTPUT_DIR, f"{result['image']}.py")
+        with open(gemini_output_path, 'w') as f:
+            f.write(gemini_code)
+        result['gemini_code'] = gemini_code
+        return True
+
+    async def validate_generated(result):
+        gemini_output_path = os.path.join(GEMINI_OUTPUT_DIR, f"{result['image']}.py")
+        if not await validate(result, gemini_output_path):
+            result['gemini_validation'] = {'code': result['validation_code'],
+                                           'error_class': result['validation_error_class'],
+                                           'error': result['validation_error']}
+            return True
+
+        # Already valid: it is the final code as it stands
+        result['fixer_skipped'] = True
+        claude_output_path = os.path.join(CLAUDE_OUTPUT_DIR, f"{result['image']}.py")
+        with open(claude_output_path, 'w') as f:
+            f.write(result.pop('gemini_code'))
+        return False
+
+    async def repair_locally(result):
+        repaired_code, applied = repair(result['gemini_code'])
+        if not applied:
+            return True
+        result['repairs'] = applied
+
+        repaired_path = os.path.join(CLAUDE_OUTPUT_DIR, f"{result['image']}.py")
+        with open(repaired_path, 'w') as f:
+            f.write(repaired_code)
+        if await validate(result, repaired_path):
+            result['fixer_skipped'] = True
+            result['repaired_locally'] = True
+            result.pop('gemini_code')
+            return False
+
+        # Still failing: the fixer gets the repaired code and its error
+        result['gemini_code'] = repaired_code
+        result['repair_validation'] = {'code': result['validation_code'],
+                                       'error_class': result['validation_error_class'],
+                                       'error': result['validation_error']}
+        return True
+
+    async def fix(result):
+        failure = result.get('repair_validation') or result['gemini_validation']
+        claude_code, claude_error, usage = await fix_with_claude(
+            claude_engine, result.pop('gemini_code'), failure['error_class'], failure['error']
+        )
+        result['claude_usage'] = usage
+        if claude_error:
+            result['claude_error'] = claude_error
+            return False
+        result['claude_success'] = True
+
+        # Save Claude output
+        claude_output_path = os.path.join(CLAUDE_OUTPUT_DIR, f"{result['image']}.py")
+        with open(claude_output_path, 'w') as f:
+            f.write(claude_code)
+        return True
+
+    async def validate_fixed(result):
+        await validate(result, os.path.join(CLAUDE_OUTPUT_DIR, f"{result['image']}.py"))
+        return False
+
+    return [
+        Stage("gemini", generate, GEMINI_WORKERS, STAGE_QUEUE_SIZE),
+        Stage("validate", validate_generated, VALIDATE_WORKERS, STAGE_QUEUE_SIZE),
+        Stage("repair", repair_locally, VALIDATE_WORKERS, STAGE_QUEUE_SIZE),
+        Stage("claude", fix, CLAUDE_WORKERS, STAGE_QUEUE_SIZE),
+        Stage("revalidate", validate_fixed, VALIDATE_WORKERS, STAGE_QUEUE_SIZE),
+    ]
 
-    result['validation_code'] = error_code
-    result['validation_error'] = error_msg
 
-    # Clean up temporary STEP file
-    if step_file and os.path.exists(step_file):
-        os.unlink(step_file)
+async def run_pipeline(images_to_process, results):
+    """Stream every image through the stages; returns (stage stats, engine summaries)"""
+    gemini_engine = GenerationEngine(GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE,
+                                     usage_tokens=entry_usage_tokens,
+                                     max_concurrency=GEMINI_WORKERS)
+    claude_engine = GenerationEngine(CLAUDE_REQUESTS_PER_MINUTE, CLAUDE_TOKENS_PER_MINUTE,
+                                     usage_tokens=entry_usage_tokens, max_concurrency=CLAUDE_WORKERS)
+
+    def finish(result):
+        if result['gemini_success']:
+            results['gemini_success'] += 1
+        if result['claude_success']:
+            results['claude_success'] += 1
+        if result.get('fixer_skipped'):
+            results['fixer_skipped'] += 1
+        if result.get('repaired_locally'):
+            results['repaired_locally'] += 1
+        for item in result.get('repairs', []):
+            results['repair_rules'][item['rule']] = results['repair_rules'].get(item['rule'], 0) + 1
+        if result['validation_code'] == 0:
+            results['validation_success'] += 1
+        elif result.get('validation_error'):
+            error = result['validation_error']
+            print(f"✗ {result['image']}: {error[:100]}")
+        results['files'].append(result)
+
+    items = ({
+        'image': img.stem,
+        'image_path': str(img),
+        'gemini_success': False,
+        'claude_success': False,
+        'validation_code': None,
+        'validation_error': None
+    } for img in images_to_process)
 
-    return result
+    # Validation threads only look up the cache; each uncached script runs
+    # in one child forked from a server with cadquery preloaded
+    with ThreadPoolExecutor(max_workers=VALIDATE_WORKERS) as validate_pool:
+        try:
+            stages = pipeline_stages(gemini_engine, claude_engine, validate_pool)
+            stage_stats = await run_stages(items, stages, finish, DASHBOARD_INTERVAL)
+        finally:
+            gemini_engine.close()
+            claude_engine.close()
+    return stage_stats, {"gemini": gemini_engine.summary(), "claude": claude_engine.summary()}
 
 
 def main():
     print("=" * 60)
-    print("Complete Pipeline: Gemini → Claude → Validation")
+    print("Complete Pipeline: Gemini → Validation → Repair → Claude (on failure) → Validation")
     print("=" * 60)
 
     # Start timing
@@ -307,7 +427,8 @@ def main():
 
     print(f"Already processed: {len(already_processed)}")
     print(f"Remaining to process: {len(images_to_process)}")
-    print(f"Workers: {MAX_WORKERS}")
+    print(f"Workers: {GEMINI_WORKERS} Gemini, {CLAUDE_WORKERS} Claude, {VALIDATE_WORKERS} validation "
+          f"(queues of {STAGE_QUEUE_SIZE})")
     print()
 
     if len(images_to_process) == 0:
@@ -319,34 +440,18 @@ def main():
         'total': len(images_to_process),
         'gemini_success': 0,
         'claude_success': 0,
+        'fixer_skipped': 0,
+        'repaired_locally': 0,
+        'repair_rules': {},
         'validation_success': 0,
         'files': []
     }
 
     print(f"Processing {len(images_to_process)} images...\n")
 
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(process_single_image, str(img), img.stem): img
-            for img in images_to_process
-        }
-
-        with tqdm(total=len(images_to_process), desc="Processing") as pbar:
-            for future in as_completed(futures):
-                result = future.result()
-
-                if result['gemini_success']:
-                    results['gemini_success'] += 1
-                if result['claude_success']:
-                    results['claude_success'] += 1
-                if result['validation_code'] == 0:
-                    results['validation_success'] += 1
-                elif result.get('validation_error'):
-                    error = result['validation_error']
-                    tqdm.write(f"✗ {result['image']}: {error[:100]}")
-
-                results['files'].append(result)
-                pbar.update(1)
+    stage_stats, engine_summaries = asyncio.run(run_pipeline(images_to_process, results))
+    results['stages'] = stage_stats
+    results['engines'] = engine_summaries
 
     # End timing
     end_time = time.time()
@@ -354,14 +459,27 @@ def main():
 
     # Calculate costs
     # Gemini: Free tier (no cost calculation needed)
-    # Claude Sonnet 4.5: $3/MTok input, $15/MTok output
-    # Estimate: ~500 tokens input per request, ~1000 tokens output per request
+    # Claude: the usage of the fixer calls actually sent (cache hits are free)
     gemini_cost = 0  # Free tier
-    claude_input_tokens = results['claude_success'] * 500
-    claude_output_tokens = results['claude_success'] * 1000
-    claude_cost = (claude_input_tokens / 1_000_000 * 3) + (claude_output_tokens / 1_000_000 * 15)
+    fixer_usage = [item['claude_usage'] for item in results['files'] if item.get('claude_usage')]
+    paid_usage = [usage for usage in fixer_usage if not usage['cached']]
+    claude_input_tokens = sum(usage['input_tokens'] for usage in paid_usage)
+    claude_output_tokens = sum(usage['output_tokens'] for usage in paid_usage)
+    claude_cost = (claude_input_tokens / 1_000_000 * CLAUDE_INPUT_PRICE_PER_1M) + \
+                  (claude_output_tokens / 1_000_000 * CLAUDE_OUTPUT_PRICE_PER_1M)
     total_cost = gemini_cost + claude_cost
 
+    # Fixer calls skipped because the Gemini code validated as generated or
+    # after local repair, priced at the mean fixer call of this run (or the
+    # old per-call estimate without one)
+    if fixer_usage:
+        call_input_tokens = sum(usage['input_tokens'] for usage in fixer_usage) / len(fixer_usage)
+        call_output_tokens = sum(usage['output_tokens'] for usage in fixer_usage) / len(fixer_usage)
+    else:
+        call_input_tokens, call_output_tokens = ESTIMATED_FIX_INPUT_TOKENS, ESTIMATED_FIX_OUTPUT_TOKENS
+    saved_cost = results['fixer_skipped'] * (call_input_tokens / 1_000_000 * CLAUDE_INPUT_PRICE_PER_1M +
+                                             call_output_tokens / 1_000_000 * CLAUDE_OUTPUT_PRICE_PER_1M)
+
     # Summary
     print("\n" + "=" * 60)
     print("Pipeline Summary")
@@ -369,15 +487,33 @@ def main():
     print(f"Total images:        {results['total']}")
     print(f"Gemini success:      {results['gemini_success']} ({100*results['gemini_success']/results['total']:.1f}%)")
     print(f"Claude success:      {results['claude_success']} ({100*results['claude_success']/results['total']:.1f}%)")
+    print(f"Fixer skipped:       {results['fixer_skipped']} ({results['fixer_skipped'] - results['repaired_locally']} "
+          f"valid as generated, {results['repaired_locally']} repaired locally)")
+    if results['repair_rules']:
+        print("Repair rules fired:  " + ", ".join(f"{rule} {count}" for rule, count in
+                                                 sorted(results['repair_rules'].items(), key=lambda item: -item[1])))
     print(f"Validation success:  {results['validation_success']} ({100*results['validation_success']/results['total']:.1f}%)")
     print()
     print(f"Total time:          {total_time/60:.1f} minutes ({total_time:.0f} seconds)")
     print(f"Time per image:      {total_time/results['total']:.1f} seconds")
+    results['worker_startup'] = startup_summary([item.get('worker_startup') for item in results['files']])
+    print(format_startup(results['worker_startup']))
+    results['response_cache'] = response_cache().summary()
+    print(format_cache_summary(results['response_cache']))
+    print()
+    print("Stage throughput:")
+    for name, stats in results['stages'].items():
+        print(f"  {name:10s} {stats['done']:6d} items  {stats['items_per_minute']:7.1f}/min  "
+              f"{100 * stats['utilization']:5.1f}% of {stats['workers']} workers busy")
+    for name, summary in results['engines'].items():
+        print(f"{name.capitalize()}:")
+        print(format_engine_summary(summary))
     print()
     print(f"Estimated cost:")
     print(f"  Gemini:            $0.00 (free tier)")
-    print(f"  Claude:            ${claude_cost:.2f}")
+    print(f"  Claude:            ${claude_cost:.2f} ({len(paid_usage)} fixer calls)")
     print(f"  Total:             ${total_cost:.2f}")
+    print(f"  Saved:             ${saved_cost:.2f} ({results['fixer_skipped']} fixer calls skipped)")
     print("=" * 60)
 
     # Save results with timing and cost
@@ -391,6 +527,9 @@ def main():
         'claude_usd': claude_cost,
         'claude_input_tokens': claude_input_tokens,
         'claude_output_tokens': claude_output_tokens,
+        'claude_calls': len(paid_usage),
+        'fixer_calls_skipped': results['fixer_skipped'],
+        'fixer_saved_usd': saved_cost,
         'total_usd': total_cost
     }
 
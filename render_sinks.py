@@ -0,0 +1,188 @@
+"""
+Output sinks for rendered images
+PngSink keeps the one-PNG-per-view layout; ShardSink streams renders, the
+source script, the STEP file and metadata into WebDataset-style tar shards
+Image encoding runs on a thread pool in both sinks, with at most
+max_pending samples queued; a sample whose write fails is reported by
+close() instead of stopping the run
+"""
+import io
+import os
+import json
+import tarfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+
+ENCODE_WORKERS = 8
+MAX_PENDING = 32  # Queued samples; write() waits for the oldest beyond this
+SHARD_MAX_SAMPLES = 1000
+SHARD_MAX_BYTES = 1024 ** 3  # 1 GB
+IMAGE_FORMATS = ("png", "webp")
+
+
+def encode_image(array, image_format="png"):
+    """Encode an HxWx3 or HxWx4 uint8 array to PNG or lossless WebP bytes"""
+    image = Image.fromarray(array)
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        image.save(buffer, "WEBP", lossless=True)
+    else:
+        image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class _QueuedSink:
+    """
+    Runs each sample's write on a thread pool, holding at most max_pending
+    queued samples (and their image arrays) at a time
+
+    Failed samples are collected in failures (key -> error) as their writes
+    are waited on.
+    """
+
+    def __init__(self, encode_workers, max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=encode_workers)
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.failures = {}
+
+    def _submit(self, key, func, *args):
+        while len(self.pending) >= self.max_pending:
+            self._settle(*self.pending.popleft())
+        self.pending.append((key, self.executor.submit(func, *args)))
+
+    def _settle(self, key, future):
+        try:
+            future.result()
+        except Exception as e:
+            self.failures.setdefault(key, f"{type(e).__name__}: {e}")
+
+    def _drain(self):
+        while self.pending:
+            self._settle(*self.pending.popleft())
+        self.executor.shutdown(wait=True)
+
+
+class PngSink(_QueuedSink):
+    """Write each view to <output_dir>/<key>.png, or <key>_<view>.png for several views"""
+
+    def __init__(self, output_dir, encode_workers=ENCODE_WORKERS, max_pending=MAX_PENDING):
+        super().__init__(encode_workers, max_pending)
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def output_paths(self, key, views):
+        if len(views) == 1:
+            return [os.path.join(self.output_dir, f"{key}.png")]
+        return [os.path.join(self.output_dir, f"{key}_{view}.png") for view in views]
+
+    def write(self, key, images, source_path=None, step_path=None, metadata=None):
+        """Queue a sample's images (dict of view -> array) for encoding"""
+        self._submit(key, self._write_sample, key, images)
+
+    def _write_sample(self, key, images):
+        views = list(images)
+        for view, path in zip(views, self.output_paths(key, views)):
+            with open(path, 'wb') as f:
+                f.write(encode_image(images[view], "png"))
+
+    def close(self):
+        """Wait for queued encodes; returns the failed samples as {key: error}"""
+        self._drain()
+        return dict(self.failures)
+
+
+class ShardSink(_QueuedSink):
+    """
+    Stream samples into tar shards named shard-000000.tar, shard-000001.tar, ...
+
+    Each sample becomes <key>.<view>.png|webp members plus optional <key>.py,
+    <key>.step and <key>.json members, the layout WebDataset loaders expect.
+    A shard is closed once it holds max_samples samples or max_bytes bytes.
+    """
+
+    def __init__(
+        self,
+        output_dir,
+        max_samples=SHARD_MAX_SAMPLES,
+        max_bytes=SHARD_MAX_BYTES,
+        image_format="png",
+        encode_workers=ENCODE_WORKERS,
+        max_pending=MAX_PENDING
+    ):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"image_format must be one of {IMAGE_FORMATS}")
+        super().__init__(encode_workers, max_pending)
+        self.output_dir = output_dir
+        self.max_samples = max_samples
+        self.max_bytes = max_bytes
+        self.image_format = image_format
+        self.lock = threading.Lock()
+        self.shard_index = -1
+        self.tar = None
+        self.shard_samples = 0
+        self.shard_bytes = 0
+        self.shard_keys = []
+        self.shards = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, key, images, source_path=None, step_path=None, metadata=None):
+        """Queue a sample (dict of view -> array plus optional files) for encoding"""
+        self._submit(key, self._write_sample, key, images, source_path, step_path, metadata)
+
+    def _write_sample(self, key, images, source_path, step_path, metadata):
+        # Encode outside the lock so samples encode in parallel
+        members = [
+            (f"{key}.{view}.{self.image_format}", encode_image(array, self.image_format))
+            for view, array in images.items()
+        ]
+        for path, extension in ((source_path, "py"), (step_path, "step")):
+            if path and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    members.append((f"{key}.{extension}", f.read()))
+        if metadata is not None:
+            members.append((f"{key}.json", json.dumps(metadata).encode()))
+
+        with self.lock:
+            if self.tar is None or self.shard_samples >= self.max_samples or self.shard_bytes >= self.max_bytes:
+                self._next_shard()
+            for name, data in members:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = time.time()
+                self.tar.addfile(info, io.BytesIO(data))
+                self.shard_bytes += len(data)
+            self.shard_samples += 1
+            self.shard_keys.append(key)
+
+    def _close_shard(self):
+        """Close the open shard; if that fails, every sample in it failed"""
+        try:
+            self.tar.close()
+        except Exception as e:
+            for key in self.shard_keys:
+                self.failures.setdefault(key, f"closing {self.shards[-1]}: {type(e).__name__}: {e}")
+        self.tar = None
+        self.shard_keys = []
+
+    def _next_shard(self):
+        if self.tar is not None:
+            self._close_shard()
+        self.shard_index += 1
+        path = os.path.join(self.output_dir, f"shard-{self.shard_index:06d}.tar")
+        self.tar = tarfile.open(path, "w")
+        self.shards.append(path)
+        self.shard_samples = 0
+        self.shard_bytes = 0
+
+    def close(self):
+        """Wait for queued samples and close the open shard; returns the failed samples as {key: error}"""
+        self._drain()
+        with self.lock:
+            if self.tar is not None:
+                self._close_shard()
+        return dict(self.failures)
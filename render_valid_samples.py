@@ -4,58 +4,93 @@ Using PartToImage.py rendering approach
 """
 import os
 import json
+import time
+import argparse
 from pathlib import Path
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
-from PartToImage import convert_part_to_image
+from PartToImage import RENDER_BACKENDS, VIEW_TYPES, convert_part_to_arrays, init_render_worker
+from render_sinks import IMAGE_FORMATS, SHARD_MAX_SAMPLES, PngSink, ShardSink
+from stage_timing import SLOWEST_N, TimingLog, make_record, print_summary, summarize
+from worker_launch import format_startup, get_context, startup_summary, take_startup_report
 
 
 # Configuration
 VALIDATION_RESULTS = "data/claude_fixed_validation_results_simple.json"
 CODE_DIR = "data/claude_fixed_code"
 OUTPUT_DIR = "data/claude_fixed_renders"
+SHARD_OUTPUT_DIR = "data/claude_fixed_render_shards"
+STEP_DIR = "data/claude_fixed_steps"  # Bundled into shards when present
 MAX_WORKERS = 8
+MAX_TASKS_PER_CHILD = 100  # Recycle each renderer process to bound memory growth
 
 # Image settings
-VIEW_TYPE = "iso"  # isometric view
+VIEWS = ["iso"]  # isometric view; any of VIEW_TYPES, rendered from one load
 RESOLUTION = 448
 REMOVE_BG = True  # Remove white background
 
 
-def render_single_file(code_path, output_path):
-    """Render a single CadQuery Python file to PNG"""
+def render_single_file(code_path, views=VIEWS, backend="occ", timings=False):
+    """Render a single CadQuery Python file to one in-memory image per view"""
+    worker_startup = take_startup_report()
     try:
-        convert_part_to_image(
+        images, render_info = convert_part_to_arrays(
             file_name=code_path,
-            view_type=VIEW_TYPE,
-            save_path=output_path,
-            b_rep_name="BRepName",
-            remove_bg_flag=REMOVE_BG
+            views=views,
+            resolution_height=RESOLUTION,
+            resolution_width=RESOLUTION,
+            remove_bg_flag=REMOVE_BG,
+            backend=backend,
+            timings=timings
         )
 
-        # Check if output was created
-        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-            return {
-                'success': True,
-                'file': os.path.basename(code_path),
-                'output': output_path
-            }
-        else:
-            return {
-                'success': False,
-                'file': os.path.basename(code_path),
-                'error': 'No output file created'
-            }
+        return {
+            'success': True,
+            'file': os.path.basename(code_path),
+            'images': images,
+            'tessellation_cache': render_info['tessellation_cache'],
+            'tessellation_evictions': render_info['tessellation_evictions'],
+            'timings': render_info.get('timings'),
+            'worker_startup': worker_startup
+        }
 
     except Exception as e:
         return {
             'success': False,
             'file': os.path.basename(code_path),
-            'error': str(e)
+            'error': str(e),
+            'worker_startup': worker_startup
         }
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render valid Claude-fixed samples to PNG")
+    parser.add_argument("--views", nargs="+", default=VIEWS, choices=VIEW_TYPES,
+                        help="Views to render for each file (default: %(default)s)")
+    parser.add_argument("--tessellation-cache", metavar="DIR",
+                        help="Reuse script meshes from this cache directory (keyed by each script's BREP)")
+    parser.add_argument("--backend", default="occ", choices=RENDER_BACKENDS,
+                        help="occ (OpenGL viewer) or numpy (headless software rasterizer)")
+    parser.add_argument("--timings", metavar="JSONL",
+                        help="Record per-stage wall/CPU time for each file to this JSONL file")
+    parser.add_argument("--slowest", type=int, default=SLOWEST_N,
+                        help="How many of the slowest files to list with --timings")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Renderer processes (default: %(default)s; the numpy backend can use every core)")
+    parser.add_argument("--sink", default="png", choices=("png", "shards"),
+                        help="png: one file per view; shards: WebDataset-style tar shards")
+    parser.add_argument("--shard-size", type=int, default=SHARD_MAX_SAMPLES,
+                        help="Samples per shard (default: %(default)s)")
+    parser.add_argument("--image-format", default="png", choices=IMAGE_FORMATS,
+                        help="Image encoding inside shards (default: %(default)s)")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+
+    output_dir = SHARD_OUTPUT_DIR if args.sink == "shards" else OUTPUT_DIR
+
     print("=" * 60)
     print("Render Valid Claude-Fixed Samples to PNG")
     print("=" * 60)
@@ -76,23 +111,27 @@ def main():
     ]
 
     print(f"Found {len(valid_files)} valid files to render")
-    print(f"View type: {VIEW_TYPE}")
+    print(f"Views: {', '.join(args.views)}")
     print(f"Resolution: {RESOLUTION}x{RESOLUTION}")
     print(f"Remove background: {REMOVE_BG}")
-    print(f"Output directory: {OUTPUT_DIR}")
-    print(f"Workers: {MAX_WORKERS}")
+    print(f"Backend: {args.backend}")
+    print(f"Sink: {args.sink}")
+    print(f"Output directory: {output_dir}")
+    print(f"Workers: {args.workers} (recycled every {MAX_TASKS_PER_CHILD} renders)")
     print()
 
-    # Create output directory
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Encoding and writing happen in the parent on the sink's thread pool
+    if args.sink == "shards":
+        sink = ShardSink(output_dir, max_samples=args.shard_size, image_format=args.image_format)
+    else:
+        sink = PngSink(output_dir)
 
     # Prepare tasks
     tasks = []
     for valid_file in valid_files:
         code_path = valid_file  # Already full path from validation
         base_name = os.path.basename(code_path).replace('.py', '')
-        output_path = os.path.join(OUTPUT_DIR, f"{base_name}.png")
-        tasks.append((code_path, output_path))
+        tasks.append((code_path, base_name))
 
     # Process with progress bar
     results = {
@@ -102,20 +141,52 @@ def main():
         'files': []
     }
 
+    timing_log = TimingLog(args.timings) if args.timings else None
+    worker_startups = []
+    queued = {}  # base_name -> result, for samples handed to the sink
+
     print(f"Processing {len(tasks)} files...\n")
 
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    start_time = time.time()
+
+    # Each worker builds its offscreen viewer once and reuses it across jobs
+    # Workers fork from a server with OCC, cadquery and the renderer preloaded
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=get_context(extra_preload=("PartToImage",)),
+        initializer=init_render_worker,
+        initargs=(args.tessellation_cache, args.backend),
+        max_tasks_per_child=MAX_TASKS_PER_CHILD
+    ) as executor:
         futures = {
-            executor.submit(render_single_file, code_path, output_path): (code_path, output_path)
-            for code_path, output_path in tasks
+            executor.submit(render_single_file, code_path, args.views, args.backend, bool(timing_log)): (code_path, base_name)
+            for code_path, base_name in tasks
         }
 
         with tqdm(total=len(tasks), desc="Rendering") as pbar:
             for future in as_completed(futures):
+                code_path, base_name = futures[future]
                 result = future.result()
+                worker_startups.append(result.pop('worker_startup'))
 
                 if result['success']:
                     results['successful'] += 1
+                    stages = result.pop('timings')
+                    if timing_log:
+                        timing_log.write(make_record(result['file'], stages))
+                    sink.write(
+                        base_name,
+                        result.pop('images'),
+                        source_path=code_path,
+                        step_path=os.path.join(STEP_DIR, f"{base_name}.step"),
+                        metadata={
+                            'file': result['file'],
+                            'views': args.views,
+                            'resolution': RESOLUTION,
+                            'backend': args.backend
+                        }
+                    )
+                    queued[base_name] = result
                 else:
                     results['failed'] += 1
                     error = result.get('error', 'Unknown')
@@ -124,6 +195,24 @@ def main():
                 results['files'].append(result)
                 pbar.update(1)
 
+    # Flush queued encodes before timing stops; a sample only succeeded once written
+    for base_name, error in sink.close().items():
+        result = queued[base_name]
+        result.update(success=False, error=f"write failed: {error}")
+        results['successful'] -= 1
+        results['failed'] += 1
+        print(f"✗ {result['file']}: {result['error']}")
+
+    elapsed = time.time() - start_time
+    results['elapsed_seconds'] = elapsed
+    results['renders_per_second'] = results['total'] / elapsed if elapsed > 0 else 0
+    results['tessellation_cache'] = {
+        status: sum(1 for item in results['files'] if item.get('tessellation_cache') == status)
+        for status in ('hit', 'miss')
+    }
+    results['tessellation_cache']['evicted'] = sum(item.get('tessellation_evictions', 0) for item in results['files'])
+    results['worker_startup'] = startup_summary(worker_startups)
+
     # Summary
     print("\n" + "=" * 60)
     print("Rendering Summary")
@@ -131,14 +220,30 @@ def main():
     print(f"Total files:     {results['total']}")
     print(f"Successful:      {results['successful']}")
     print(f"Failed:          {results['failed']}")
+    print(f"Elapsed:         {elapsed:.1f} seconds")
+    print(f"Throughput:      {results['renders_per_second']:.2f} renders/second")
+    if args.tessellation_cache:
+        print(f"Mesh cache:      {results['tessellation_cache']['hit']} hits, "
+              f"{results['tessellation_cache']['miss']} misses, "
+              f"{results['tessellation_cache']['evicted']} evicted")
+    print(format_startup(results['worker_startup']))
     print("=" * 60)
 
+    if timing_log:
+        timing_log.close()
+        results['stage_timings'] = summarize(timing_log.records, args.slowest)
+        print_summary(results['stage_timings'])
+        print(f"\nTiming records saved to: {args.timings}")
+
     # Save results
     with open('render_results.json', 'w') as f:
         json.dump(results, f, indent=2)
 
     print(f"\nResults saved to: render_results.json")
-    print(f"PNG renders saved to: {OUTPUT_DIR}/")
+    if args.sink == "shards":
+        print(f"Shards saved to: {output_dir}/ ({len(sink.shards)} shards)")
+    else:
+        print(f"PNG renders saved to: {output_dir}/")
 
 
 if __name__ == "__main__":
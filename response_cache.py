@@ -0,0 +1,176 @@
+"""
+Content-addressed cache of LLM responses
+Entries are keyed by (model, prompt hash, input hash, generation params),
+where the input is an image's bytes or the code sent for fixing, and hold
+the response text, raw response, token usage and latency, so an
+interrupted or repeated run never pays for the same request twice
+
+Modes, from PIPELINE_LLM_CACHE:
+  record  serve hits, call the provider on a miss and store the response (default)
+  replay  serve hits only; a miss raises CacheMiss, so runs are offline and deterministic
+  off     always call the provider and store nothing
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+from datetime import datetime
+
+
+CACHE_DIR = "data/llm_response_cache"
+MODES = ("record", "replay", "off")
+
+CACHE_MODE = os.getenv("PIPELINE_LLM_CACHE", "record")
+if CACHE_MODE not in MODES:
+    raise ValueError(f"PIPELINE_LLM_CACHE must be one of {MODES}, got {CACHE_MODE!r}")
+
+
+class CacheMiss(Exception):
+    """A replay-mode request that was never recorded"""
+
+
+def sha256_bytes(data):
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path):
+    """SHA-256 of a file's bytes (images are keyed by bytes, not decoded pixels)"""
+    with open(path, 'rb') as f:
+        return sha256_bytes(f.read())
+
+
+def gemini_entry(response):
+    """Cache entry fields of a google.generativeai response"""
+    usage = response.usage_metadata
+    to_dict = getattr(response, "to_dict", None)
+    return {
+        "text": response.text,
+        "usage": {"input_tokens": usage.prompt_token_count, "output_tokens": usage.candidates_token_count},
+        "raw": to_dict() if to_dict else None,
+    }
+
+
+def claude_entry(message):
+    """Cache entry fields of an anthropic Messages response"""
+    model_dump = getattr(message, "model_dump", None)
+    return {
+        "text": message.content[0].text,
+        "usage": {"input_tokens": message.usage.input_tokens, "output_tokens": message.usage.output_tokens},
+        "raw": model_dump(mode="json") if model_dump else None,
+    }
+
+
+class ResponseCache:
+    """
+    Directory of <key>.json entries, written atomically
+
+    get_or_call/aget_or_call take a request callable (plain or async) that
+    returns entry fields: text, usage, raw and optionally latency_seconds;
+    without one the cache times the request itself. Returned entries carry
+    "cached": True when served from disk.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, mode=CACHE_MODE):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.saved_usage = {"input_tokens": 0, "output_tokens": 0}
+        if mode != "off":
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, model, prompt, input_hash, params=None):
+        payload = json.dumps({
+            "model": model,
+            "prompt": sha256_bytes(prompt),
+            "input": input_hash,
+            "params": params or {},
+        }, sort_keys=True)
+        return sha256_bytes(payload)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def lookup(self, key):
+        """Cached entry for key, or None (always None with mode "off")"""
+        if self.mode == "off":
+            return None
+        try:
+            with open(self.path(key), 'r') as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        self.hits += 1
+        for name in self.saved_usage:
+            self.saved_usage[name] += entry["usage"].get(name) or 0
+        return dict(entry, cached=True)
+
+    def store(self, key, entry):
+        if self.mode != "record":
+            return entry
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(dict(entry, key=key, created=datetime.now().isoformat()), f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        return entry
+
+    def _missed(self, key):
+        self.misses += 1
+        if self.mode == "replay":
+            raise CacheMiss(f"No recorded response for {key} (PIPELINE_LLM_CACHE=replay)")
+
+    def get_or_call(self, model, prompt, input_hash, params, request):
+        key = self.key(model, prompt, input_hash, params)
+        entry = self.lookup(key)
+        if entry is not None:
+            return entry
+        self._missed(key)
+        start = time.perf_counter()
+        entry = request()
+        entry.setdefault("latency_seconds", time.perf_counter() - start)
+        entry.update(model=model, params=params or {})
+        return dict(self.store(key, entry), cached=False)
+
+    async def aget_or_call(self, model, prompt, input_hash, params, request):
+        key = self.key(model, prompt, input_hash, params)
+        entry = self.lookup(key)
+        if entry is not None:
+            return entry
+        self._missed(key)
+        start = time.perf_counter()
+        entry = await request()
+        entry.setdefault("latency_seconds", time.perf_counter() - start)
+        entry.update(model=model, params=params or {})
+        return dict(self.store(key, entry), cached=False)
+
+    def summary(self):
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "saved_usage": dict(self.saved_usage)}
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Per-process cache on CACHE_DIR in CACHE_MODE"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+
+def format_summary(summary):
+    saved = summary["saved_usage"]
+    return (f"Response cache:  {summary['hits']} hits, {summary['misses']} misses ({summary['mode']}), "
+            f"saved {saved['input_tokens']:,}+{saved['output_tokens']:,} tokens")
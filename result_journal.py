@@ -0,0 +1,107 @@
+"""
+Append-only JSONL journal for per-file pipeline results
+Each result is written as soon as it is known, and fsync is batched, so a
+crashed or interrupted run keeps everything finished before it and can be
+resumed. Later records for a file supersede earlier ones.
+"""
+import os
+import json
+import time
+import hashlib
+
+
+FSYNC_EVERY = 64        # records
+FSYNC_INTERVAL = 5.0    # seconds
+
+
+def content_hash(path):
+    """SHA-256 of a file's bytes"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class ResultJournal:
+    """
+    Append records to a JSONL file, fsyncing every fsync_every records or
+    fsync_interval seconds, whichever comes first
+
+    Opened with resume=False the journal is truncated; with resume=True new
+    records are appended after the existing ones, once a torn final line
+    has been cut off so the first new record does not run into it.
+    """
+
+    def __init__(self, path, resume=False, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume:
+            drop_torn_line(path)
+        self.file = open(path, 'a' if resume else 'w')
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def drop_torn_line(path, chunk_size=64 * 1024):
+    """Truncate a journal after its last newline, removing a partly written final record"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(position - chunk_size, 0)
+            f.seek(start)
+            chunk = f.read(position - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            f.truncate(position)
+
+
+def load_journal(path, key="file"):
+    """
+    Latest record per key from a journal
+
+    A torn final line, left by a crash mid-write, is ignored.
+    """
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record[key]] = record
+    return records
@@ -0,0 +1,89 @@
+"""
+Execute generated CadQuery scripts in memory and hand back their geometry
+Used by the renderer and pipeline stages instead of a STEP file round-trip
+"""
+import io
+import os
+import cadquery as cq
+from boolean_batching import BatchingUnsupported, batch_booleans
+from boolean_options import script_options
+
+
+# Opt-in: run loops of booleans as one batched boolean (see boolean_batching)
+BATCH_BOOLEANS = os.getenv("PIPELINE_BATCH_BOOLEANS") == "1"
+
+
+def run_cadquery_script(code, filename="<cadquery>", batch=BATCH_BOOLEANS, booleans=None, cache=None):
+    """
+    Execute CadQuery code in an isolated namespace and return its `result`
+
+    Each call gets a fresh namespace with `cq` pre-imported and a no-op
+    show_object, so scripts cannot see each other's globals and CQ-editor
+    leftovers do not fail. With batch set, loops of booleans run batched,
+    but only for scripts whose rewrite has a recorded verdict in cache
+    (default: the validation cache) that it matches the script as written;
+    benchmark_boolean_batching.py records them. Scripts without a matching
+    verdict, or whose batch cannot reproduce a call, run as written.
+    booleans overrides the OCCT boolean options (see boolean_options) for
+    this script only.
+    """
+    with script_options(booleans):
+        if batch:
+            optimized, rewrites = batch_booleans(code)
+            if rewrites and _batch_verified(code, optimized, cache):
+                try:
+                    return _exec_script(optimized, filename)
+                except BatchingUnsupported:
+                    pass
+        return _exec_script(code, filename)
+
+
+def _batch_verified(code, optimized, cache):
+    """Whether optimized was checked once against code and matched it"""
+    if cache is None:
+        # validation_cache imports this module
+        from validation_cache import default_cache
+        cache = default_cache()
+    verdict = cache.batch_verdict(code, optimized)
+    return bool(verdict and verdict["match"])
+
+
+def _exec_script(code, filename):
+    namespace = {
+        "__name__": "__cadquery__",
+        "cq": cq,
+        "show_object": lambda *args, **kwargs: None,
+    }
+    exec(compile(code, filename, "exec"), namespace)
+
+    if "result" not in namespace:
+        raise NameError("name 'result' is not defined")
+    return namespace["result"]
+
+
+def result_to_shape(result):
+    """
+    Collapse a script's `result` into a single cadquery Shape
+
+    Workplanes with one shape return it unchanged; several shapes are
+    combined into a compound, matching what cq.exporters.export writes.
+    """
+    if isinstance(result, cq.Shape):
+        return result
+    if isinstance(result, cq.Assembly):
+        return result.toCompound()
+    if isinstance(result, cq.Workplane):
+        shapes = [val for val in result.vals() if isinstance(val, cq.Shape)]
+        if not shapes:
+            raise ValueError("result contains no geometry")
+        if len(shapes) == 1:
+            return shapes[0]
+        return cq.Compound.makeCompound(shapes)
+    raise TypeError(f"result must be a Workplane or Shape, got {type(result).__name__}")
+
+
+def shape_to_brep(shape):
+    """Serialize a cadquery Shape to BREP bytes without touching disk"""
+    buffer = io.BytesIO()
+    shape.exportBrep(buffer)
+    return buffer.getvalue()
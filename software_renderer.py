@@ -0,0 +1,266 @@
+"""
+Headless NumPy software renderer for PartToImage
+Tessellates shapes with BRepMesh and rasterizes them with a vectorized
+z-buffer, so renders need no X server, EGL or GPU
+"""
+import numpy as np
+from PIL import Image
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_REVERSED
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopoDS import topods
+from tessellation_cache import mesh_shape
+from stage_timing import timed
+
+
+# Direction towards the eye and up vector for each view, matching what
+# V3d_View::SetProj uses for the View_* calls of the OCC backend
+VIEW_DIRECTIONS = {
+    "iso": ((1.0, -1.0, 1.0), (0.0, 0.0, 1.0)),
+    "front": ((0.0, -1.0, 0.0), (0.0, 0.0, 1.0)),
+    "rear": ((0.0, 1.0, 0.0), (0.0, 0.0, 1.0)),
+    "left": ((-1.0, 0.0, 0.0), (0.0, 0.0, 1.0)),
+    "right": ((1.0, 0.0, 0.0), (0.0, 0.0, 1.0)),
+    "top": ((0.0, 0.0, 1.0), (0.0, 1.0, 0.0)),
+    "bottom": ((0.0, 0.0, -1.0), (0.0, -1.0, 0.0)),
+}
+
+# Same margin the OCC backend passes to FitAll
+FIT_MARGIN = 0.5
+
+# Render at this multiple of the output size and box-filter down
+SUPERSAMPLE = 2
+
+# Silver-like material lit by a headlight
+BASE_COLOR = np.array([0.78, 0.78, 0.80])
+AMBIENT = 0.25
+DIFFUSE = 0.65
+SPECULAR = 0.35
+SHININESS = 32.0
+
+# Upper bound on candidate pixels rasterized per vectorized batch
+MAX_BATCH_PIXELS = 4_000_000
+
+
+def shape_to_mesh(shape):
+    """
+    Collect the face triangulations of a meshed shape
+
+    Returns (vertices, triangles) with vertices an (N, 3) float array and
+    triangles an (M, 3) array of 0-based indices, wound consistently with
+    the face orientation.
+    """
+    vertices = []
+    triangles = []
+    offset = 0
+
+    explorer = TopExp_Explorer(shape, TopAbs_FACE)
+    while explorer.More():
+        face = topods.Face(explorer.Current())
+        explorer.Next()
+
+        location = TopLoc_Location()
+        triangulation = BRep_Tool.Triangulation(face, location)
+        if triangulation is None:
+            continue
+
+        transform = location.Transformation()
+        nodes = np.array([
+            triangulation.Node(index).Transformed(transform).Coord()
+            for index in range(1, triangulation.NbNodes() + 1)
+        ], dtype=np.float64)
+        face_triangles = np.array([
+            triangulation.Triangle(index).Get()
+            for index in range(1, triangulation.NbTriangles() + 1)
+        ], dtype=np.int64) - 1
+
+        if face.Orientation() == TopAbs_REVERSED:
+            face_triangles = face_triangles[:, [0, 2, 1]]
+
+        vertices.append(nodes)
+        triangles.append(face_triangles + offset)
+        offset += len(nodes)
+
+    if not vertices:
+        raise ValueError("Shape has no triangulated faces")
+    return np.concatenate(vertices), np.concatenate(triangles)
+
+
+def vertex_normals(vertices, triangles):
+    """Area-weighted vertex normals; faces do not share nodes, so creases stay sharp"""
+    corners = vertices[triangles]
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+
+    normals = np.zeros_like(vertices)
+    for corner in range(3):
+        np.add.at(normals, triangles[:, corner], face_normals)
+
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(lengths > 0, lengths, 1.0)
+
+
+def view_basis(view_type):
+    """Camera right, up and towards-eye unit vectors for a view"""
+    eye, up = VIEW_DIRECTIONS[view_type]
+    z_axis = np.array(eye) / np.linalg.norm(eye)
+    x_axis = np.cross(up, z_axis)
+    x_axis /= np.linalg.norm(x_axis)
+    y_axis = np.cross(z_axis, x_axis)
+    return np.stack([x_axis, y_axis, z_axis])
+
+
+def rasterize(vertices, triangles, normals, view_type, width, height, margin=FIT_MARGIN):
+    """
+    Rasterize a triangle mesh with an orthographic camera and a z-buffer
+
+    The mesh bounding box is fitted to the frame like V3d_View::FitAll.
+    Returns an (height, width, 4) float RGBA array in [0, 1] with alpha 0
+    wherever no triangle covers the pixel centre.
+    """
+    basis = view_basis(view_type)
+    camera = vertices @ basis.T
+    camera_normals = normals @ basis.T
+
+    # Fit the projected bounding box corners, as FitAll does
+    low, high = vertices.min(axis=0), vertices.max(axis=0)
+    corners = np.array([[x, y, z] for x in (low[0], high[0])
+                        for y in (low[1], high[1]) for z in (low[2], high[2])]) @ basis.T
+    center = (corners.min(axis=0) + corners.max(axis=0)) / 2.0
+    extent_x, extent_y = corners.max(axis=0)[:2] - corners.min(axis=0)[:2]
+    extent = max(extent_x * height / width, extent_y, 1e-9) * (1.0 + margin)
+    scale = height / extent
+
+    screen_x = (camera[:, 0] - center[0]) * scale + width / 2.0
+    screen_y = height / 2.0 - (camera[:, 1] - center[1]) * scale
+    depth = camera[:, 2]
+
+    tx, ty, tz = screen_x[triangles], screen_y[triangles], depth[triangles]
+    area = (tx[:, 1] - tx[:, 0]) * (ty[:, 2] - ty[:, 0]) - (tx[:, 2] - tx[:, 0]) * (ty[:, 1] - ty[:, 0])
+
+    # Pixel-centre bounding box of every triangle, clipped to the frame
+    x_min = np.clip(np.ceil(tx.min(axis=1) - 0.5), 0, width).astype(np.int64)
+    x_max = np.clip(np.floor(tx.max(axis=1) - 0.5), -1, width - 1).astype(np.int64)
+    y_min = np.clip(np.ceil(ty.min(axis=1) - 0.5), 0, height).astype(np.int64)
+    y_max = np.clip(np.floor(ty.max(axis=1) - 0.5), -1, height - 1).astype(np.int64)
+    box_width = x_max - x_min + 1
+    box_height = y_max - y_min + 1
+
+    visible = np.nonzero((np.abs(area) > 1e-12) & (box_width > 0) & (box_height > 0))[0]
+    counts = box_width[visible] * box_height[visible]
+
+    z_buffer = np.full(width * height, -np.inf)
+    normal_buffer = np.zeros((width * height, 3))
+
+    # Vectorize over batches of triangles whose candidate pixels fit in memory
+    cumulative = np.cumsum(counts)
+    start = 0
+    while start < len(visible):
+        limit = (cumulative[start - 1] if start > 0 else 0) + MAX_BATCH_PIXELS
+        end = max(int(np.searchsorted(cumulative, limit, side="right")), start + 1)
+        batch = visible[start:end]
+        batch_counts = counts[start:end]
+        start = end
+
+        tri = np.repeat(batch, batch_counts)
+        local = np.arange(len(tri)) - np.repeat(np.cumsum(batch_counts) - batch_counts, batch_counts)
+        px = x_min[tri] + local % box_width[tri]
+        py = y_min[tri] + local // box_width[tri]
+        sample_x = px + 0.5
+        sample_y = py + 0.5
+
+        x0, x1, x2 = tx[tri, 0], tx[tri, 1], tx[tri, 2]
+        y0, y1, y2 = ty[tri, 0], ty[tri, 1], ty[tri, 2]
+        w0 = ((x2 - x1) * (sample_y - y1) - (y2 - y1) * (sample_x - x1)) / area[tri]
+        w1 = ((x0 - x2) * (sample_y - y2) - (y0 - y2) * (sample_x - x2)) / area[tri]
+        w2 = 1.0 - w0 - w1
+        inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+
+        tri, px, py = tri[inside], px[inside], py[inside]
+        w0, w1, w2 = w0[inside], w1[inside], w2[inside]
+        z = w0 * tz[tri, 0] + w1 * tz[tri, 1] + w2 * tz[tri, 2]
+        pixel = py * width + px
+
+        # Nearest fragment per pixel within the batch, then against the buffer
+        order = np.lexsort((-z, pixel))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = pixel[order][1:] != pixel[order][:-1]
+        winners = order[first]
+        winners = winners[z[winners] > z_buffer[pixel[winners]]]
+
+        corner_normals = camera_normals[triangles[tri[winners]]]
+        weights = np.stack([w0[winners], w1[winners], w2[winners]], axis=1)[:, :, None]
+        z_buffer[pixel[winners]] = z[winners]
+        normal_buffer[pixel[winners]] = (corner_normals * weights).sum(axis=1)
+
+    covered = np.isfinite(z_buffer)
+    lengths = np.linalg.norm(normal_buffer, axis=1)
+    facing = np.abs(normal_buffer[:, 2]) / np.where(lengths > 0, lengths, 1.0)
+
+    # Two-sided Phong with the light at the eye, so the half vector is the view axis
+    shade = (AMBIENT + DIFFUSE * facing)[:, None] * BASE_COLOR + (SPECULAR * facing ** SHININESS)[:, None]
+
+    rgba = np.zeros((width * height, 4))
+    rgba[covered, :3] = np.clip(shade[covered], 0.0, 1.0)
+    rgba[covered, 3] = 1.0
+    return rgba.reshape(height, width, 4)
+
+
+class SoftwareRenderer:
+    """
+    Drop-in replacement for OffscreenRenderer that renders on the CPU
+
+    Face boundary lines are not drawn; backgrounds are written transparent
+    directly, or white when background removal is off.
+    """
+
+    def __init__(self, supersample=SUPERSAMPLE):
+        self.supersample = supersample
+
+    def render_images(
+        self,
+        shape,
+        views,
+        resolution_height=448,
+        resolution_width=448,
+        draw_face_boundaries=True,
+        premeshed=False,
+        remove_bg_flag=False,
+        bg_threshold=None,
+        bg_feather=None
+    ):
+        """Tessellate a shape once and return one PIL image per view"""
+        with timed("mesh"):
+            if not premeshed:
+                mesh_shape(shape)
+            vertices, triangles = shape_to_mesh(shape)
+            normals = vertex_normals(vertices, triangles)
+
+        factor = self.supersample
+        images = []
+        for view_type in views:
+            if view_type not in VIEW_DIRECTIONS:
+                raise Exception("please choose: top, bottom, front, rear, left, right, iso")
+            with timed("rasterize"):
+                rgba = rasterize(
+                    vertices, triangles, normals, view_type,
+                    resolution_width * factor, resolution_height * factor
+                )
+
+            # Box-filter supersamples with premultiplied alpha
+            rgba[..., :3] *= rgba[..., 3:]
+            rgba = rgba.reshape(resolution_height, factor, resolution_width, factor, 4).mean(axis=(1, 3))
+            alpha = rgba[..., 3:]
+            rgba[..., :3] /= np.where(alpha > 0, alpha, 1.0)
+
+            if remove_bg_flag:
+                rgba[..., :3][alpha[..., 0] == 0] = 1.0
+                image = Image.fromarray((rgba * 255.0 + 0.5).astype(np.uint8), "RGBA")
+            else:
+                # Composite onto the same white background the OCC backend uses
+                rgb = rgba[..., :3] * alpha + (1.0 - alpha)
+                image = Image.fromarray((rgb * 255.0 + 0.5).astype(np.uint8), "RGB")
+
+            images.append(image)
+
+        return images
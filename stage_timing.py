@@ -0,0 +1,178 @@
+"""
+Per-stage wall and CPU timing for the render hot path
+Stages are marked with `with timed("name"):` and only cost anything while a
+StageTimer is active; records go to JSONL and are summarized per stage
+
+Usage: python stage_timing.py timings.jsonl [--slowest N]
+"""
+import json
+import time
+import argparse
+from contextlib import contextmanager
+import numpy as np
+
+
+SLOWEST_N = 10
+
+_active_timer = None
+
+
+@contextmanager
+def timed(stage):
+    """Attribute the enclosed block to stage on the active timer, if any"""
+    timer = _active_timer
+    if timer is None:
+        yield
+        return
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        timer.add(stage, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+
+class StageTimer:
+    """
+    Collects time per stage while active
+
+    Use as a context manager; timed() blocks inside it, including ones deep
+    in the loaders and renderers, are accumulated by stage name.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._previous = None
+
+    def add(self, stage, wall, cpu):
+        entry = self.stages.setdefault(stage, {"wall": 0.0, "cpu": 0.0})
+        entry["wall"] += wall
+        entry["cpu"] += cpu
+
+    def as_dict(self):
+        return {stage: dict(entry) for stage, entry in self.stages.items()}
+
+    def __enter__(self):
+        global _active_timer
+        self._previous = _active_timer
+        _active_timer = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active_timer
+        _active_timer = self._previous
+        return False
+
+
+def make_record(file, stages):
+    """Build a JSONL timing record for one file"""
+    return {
+        "file": file,
+        "stages": stages,
+        "total_wall": sum(entry["wall"] for entry in stages.values()),
+        "total_cpu": sum(entry["cpu"] for entry in stages.values()),
+    }
+
+
+class TimingLog:
+    """Append timing records to a JSONL file as they arrive"""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        self.file = open(path, 'a')
+
+    def write(self, record):
+        self.records.append(record)
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def load_records(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records, slowest_n=SLOWEST_N):
+    """p50/p95/max wall and CPU per stage, plus the slowest files overall"""
+    stage_names = sorted({stage for record in records for stage in record["stages"]})
+    stages = {}
+    for stage in stage_names:
+        wall = np.array([r["stages"][stage]["wall"] for r in records if stage in r["stages"]])
+        cpu = np.array([r["stages"][stage]["cpu"] for r in records if stage in r["stages"]])
+        stages[stage] = {
+            "count": len(wall),
+            "total_wall": float(wall.sum()),
+            "p50_wall": float(np.percentile(wall, 50)),
+            "p95_wall": float(np.percentile(wall, 95)),
+            "max_wall": float(wall.max()),
+            "p50_cpu": float(np.percentile(cpu, 50)),
+            "p95_cpu": float(np.percentile(cpu, 95)),
+            "max_cpu": float(cpu.max()),
+        }
+
+    slowest = sorted(records, key=lambda r: r["total_wall"], reverse=True)[:slowest_n]
+    return {
+        "files": len(records),
+        "stages": stages,
+        "slowest": [{"file": r["file"], "total_wall": r["total_wall"]} for r in slowest],
+    }
+
+
+def merge_summaries(summaries, slowest_n=SLOWEST_N):
+    """
+    Combine summarize() outputs, e.g. one per shard, without their records
+
+    Counts, totals and maxima are exact and the slowest lists are merged;
+    percentiles cannot be recovered from summaries, so p50/p95 are
+    count-weighted means of the inputs' and flagged approximate.
+    """
+    stages = {}
+    for stage in sorted({stage for summary in summaries for stage in summary["stages"]}):
+        parts = [summary["stages"][stage] for summary in summaries if stage in summary["stages"]]
+        count = sum(part["count"] for part in parts)
+        merged = {"count": count, "total_wall": sum(part["total_wall"] for part in parts)}
+        for key in ("p50_wall", "p95_wall", "p50_cpu", "p95_cpu"):
+            merged[key] = sum(part[key] * part["count"] for part in parts) / count if count else 0.0
+        for key in ("max_wall", "max_cpu"):
+            merged[key] = max(part[key] for part in parts)
+        stages[stage] = merged
+
+    slowest = sorted((item for summary in summaries for item in summary["slowest"]),
+                     key=lambda item: item["total_wall"], reverse=True)[:slowest_n]
+    return {
+        "files": sum(summary["files"] for summary in summaries),
+        "stages": stages,
+        "slowest": slowest,
+        "approximate_percentiles": len(summaries) > 1,
+    }
+
+
+def print_summary(summary):
+    print(f"\nStage timings over {summary['files']} files (seconds)")
+    print(f"  {'stage':14s} {'p50':>8s} {'p95':>8s} {'max':>8s} {'total':>9s} {'cpu p50':>8s}")
+    for stage, stats in sorted(summary["stages"].items(), key=lambda item: -item[1]["total_wall"]):
+        print(f"  {stage:14s} {stats['p50_wall']:8.3f} {stats['p95_wall']:8.3f} "
+              f"{stats['max_wall']:8.3f} {stats['total_wall']:9.1f} {stats['p50_cpu']:8.3f}")
+    if summary["slowest"]:
+        print(f"\nSlowest {len(summary['slowest'])} files:")
+        for item in summary["slowest"]:
+            print(f"  {item['total_wall']:8.3f}s  {item['file']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize per-stage render timings")
+    parser.add_argument("paths", nargs="+", help="Timing JSONL files (e.g. one per shard)")
+    parser.add_argument("--slowest", type=int, default=SLOWEST_N)
+    args = parser.parse_args()
+
+    records = [record for path in args.paths for record in load_records(path)]
+    print_summary(summarize(records, args.slowest))
+
+
+if __name__ == "__main__":
+    main()
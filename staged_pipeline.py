@@ -0,0 +1,122 @@
+"""
+Overlapped multi-stage pipeline on asyncio
+Each stage has its own bounded input queue and its own number of workers,
+so a slow stage fills its queue and holds back the stages before it
+(backpressure) while every stage keeps working on different items at the
+same time. Handlers are coroutines: network stages await their calls
+directly, CPU stages await an executor (see process_remaining_images).
+"""
+import time
+import asyncio
+
+
+QUEUE_SIZE = 16
+DASHBOARD_INTERVAL = 10.0  # seconds
+
+
+class Stage:
+    """
+    One pipeline stage: handler(item) runs on `workers` concurrent workers
+
+    The handler returns True to pass the item to the next stage, or False
+    when the item is finished (failed, or nothing left to do).
+    """
+
+    def __init__(self, name, handler, workers, queue_size=QUEUE_SIZE):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue = None
+        self.busy = 0
+        self.done = 0
+        self.forwarded = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.started = None
+
+    def stats(self, elapsed):
+        return {
+            "workers": self.workers,
+            "done": self.done,
+            "forwarded": self.forwarded,
+            "errors": self.errors,
+            "items_per_minute": self.done / elapsed * 60 if elapsed > 0 else 0.0,
+            "utilization": self.busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0,
+        }
+
+
+def format_dashboard(stages, elapsed):
+    """One line per stage: throughput, busy workers and queue depth"""
+    lines = [f"[{elapsed:7.1f}s]"]
+    for stage in stages:
+        stats = stage.stats(elapsed)
+        depth = stage.queue.qsize() if stage.queue else 0
+        lines.append(f"  {stage.name:10s} {stats['done']:6d} done  {stats['items_per_minute']:7.1f}/min  "
+                     f"busy {stage.busy:3d}/{stage.workers:<3d}  queue {depth:3d}/{stage.queue_size:<3d}  "
+                     f"util {100 * stats['utilization']:5.1f}%  errors {stats['errors']}")
+    return "\n".join(lines)
+
+
+async def _worker(stage, next_stage, finish):
+    while True:
+        item = await stage.queue.get()
+        stage.busy += 1
+        start = time.perf_counter()
+        try:
+            forward = await stage.handler(item)
+        except Exception as e:
+            stage.errors += 1
+            item.setdefault("errors", []).append(f"{stage.name}: {type(e).__name__}: {e}")
+            forward = False
+        stage.busy_seconds += time.perf_counter() - start
+        stage.busy -= 1
+        stage.done += 1
+        try:
+            if forward and next_stage is not None:
+                stage.forwarded += 1
+                await next_stage.queue.put(item)
+            else:
+                finish(item)
+        finally:
+            stage.queue.task_done()
+
+
+async def run_stages(items, stages, finish, dashboard_interval=DASHBOARD_INTERVAL, write=print):
+    """
+    Stream items through stages, calling finish(item) as each one leaves
+
+    Items are fed in order as the first queue has room. Returns per-stage
+    stats; a dashboard is written every dashboard_interval seconds.
+    """
+    start = time.perf_counter()
+    for stage in stages:
+        stage.queue = asyncio.Queue(maxsize=stage.queue_size)
+
+    workers = [
+        asyncio.create_task(_worker(stage, stages[index + 1] if index + 1 < len(stages) else None, finish))
+        for index, stage in enumerate(stages)
+        for _ in range(stage.workers)
+    ]
+
+    async def dashboard():
+        while True:
+            await asyncio.sleep(dashboard_interval)
+            write(format_dashboard(stages, time.perf_counter() - start))
+
+    monitor = asyncio.create_task(dashboard()) if dashboard_interval else None
+    try:
+        for item in items:
+            await stages[0].queue.put(item)
+        # A stage forwards an item before marking it done, so once each
+        # queue drains in order nothing is left upstream of the next one
+        for stage in stages:
+            await stage.queue.join()
+    finally:
+        for task in workers + ([monitor] if monitor else []):
+            task.cancel()
+        await asyncio.gather(*workers, *([monitor] if monitor else []), return_exceptions=True)
+
+    elapsed = time.perf_counter() - start
+    write(format_dashboard(stages, elapsed))
+    return {stage.name: stage.stats(elapsed) for stage in stages}
@@ -0,0 +1,155 @@
+"""
+Disk-backed tessellation cache for rendered STEP files and CadQuery results
+Stores meshed shapes as binary BRep (with triangulation) keyed by the STEP
+or script BREP content hash and mesh settings, so repeat renders skip
+BRepMesh entirely
+"""
+import os
+import math
+import hashlib
+import tempfile
+from OCC.Core.BinTools import bintools
+from OCC.Core.Bnd import Bnd_Box
+from OCC.Core.BRepBndLib import brepbndlib
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+from OCC.Core.TopoDS import TopoDS_Shape
+from stage_timing import timed
+
+
+CACHE_DIR = "data/tessellation_cache"
+CACHE_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+# Close to the viewer's own meshing: its deviation coefficient of 0.001 is
+# scaled by 4x the largest bounding box side (Prs3d::GetDeflection), so
+# 0.004 of the bounding box diagonal is the same or slightly coarser.
+# Angular deviation is in radians, as the viewer's 20 degree default
+LINEAR_DEFLECTION = 0.004
+ANGULAR_DEFLECTION = math.radians(20)
+
+CACHE_SUFFIX = ".bbrep"
+
+
+def file_sha256(filename):
+    """Hash a file's contents"""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def mesh_shape(shape, linear_deflection=LINEAR_DEFLECTION, angular_deflection=ANGULAR_DEFLECTION):
+    """Triangulate a shape in place with deflection relative to its size"""
+    box = Bnd_Box()
+    brepbndlib.Add(shape, box)
+    xmin, ymin, zmin, xmax, ymax, zmax = box.Get()
+    diagonal = math.sqrt((xmax - xmin) ** 2 + (ymax - ymin) ** 2 + (zmax - zmin) ** 2)
+
+    BRepMesh_IncrementalMesh(
+        shape, max(diagonal * linear_deflection, 1e-6), False, angular_deflection, True
+    )
+    return shape
+
+
+class TessellationCache:
+    """
+    LRU cache of meshed shapes on disk
+
+    Entries are named by a hash of (file content hash, deflection settings).
+    A hit refreshes the entry's mtime; when the directory grows past
+    max_bytes the least recently used entries are removed.
+    """
+
+    def __init__(
+        self,
+        cache_dir=CACHE_DIR,
+        max_bytes=CACHE_MAX_BYTES,
+        linear_deflection=LINEAR_DEFLECTION,
+        angular_deflection=ANGULAR_DEFLECTION
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.linear_deflection = linear_deflection
+        self.angular_deflection = angular_deflection
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_path(self, file_hash):
+        """Cache file for a content hash under the current mesh settings"""
+        key = f"{file_hash}:{self.linear_deflection!r}:{self.angular_deflection!r}"
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, name + CACHE_SUFFIX)
+
+    def load(self, filename, loader):
+        """
+        Return (meshed shape, hit) for filename
+
+        On a miss the shape is read with loader(filename), meshed and stored.
+        """
+        with timed("cache_read"):
+            file_hash = file_sha256(filename)
+        return self.load_hashed(file_hash, lambda: loader(filename))
+
+    def load_hashed(self, content_hash, loader):
+        """
+        Return (meshed shape, hit) for content with the given hash
+
+        On a miss the shape is built with loader(), meshed and stored.
+        """
+        with timed("cache_read"):
+            path = self.entry_path(content_hash)
+
+            if os.path.exists(path):
+                shape = TopoDS_Shape()
+                if bintools.Read(shape, path) and not shape.IsNull():
+                    os.utime(path)
+                    self.hits += 1
+                    return shape, True
+
+        self.misses += 1
+        shape = loader()
+        with timed("mesh"):
+            mesh_shape(shape, self.linear_deflection, self.angular_deflection)
+        with timed("cache_write"):
+            self.store(path, shape)
+        return shape, False
+
+    def store(self, path, shape):
+        """Write an entry atomically so concurrent workers never see partial files"""
+        fd, tmp_path = tempfile.mkstemp(suffix=CACHE_SUFFIX + ".tmp", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            bintools.Write(shape, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
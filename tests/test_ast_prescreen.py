@@ -0,0 +1,133 @@
+import pytest
+
+pytest.importorskip("cadquery")
+
+from ast_prescreen import prescreen, prescreen_entry
+
+
+def errors(code):
+    return [issue["rule"] for issue in prescreen(code) if issue["severity"] == "error"]
+
+
+def warnings(code):
+    return [issue["rule"] for issue in prescreen(code) if issue["severity"] == "warning"]
+
+
+def test_valid_script_passes():
+    code = "import cadquery as cq\nresult = cq.Workplane('XY').box(1, 2, 3).faces('>Z').workplane().hole(0.5)\n"
+    assert prescreen(code) == []
+    assert prescreen_entry(code) is None
+
+
+def test_syntax_error_is_rejected():
+    entry = prescreen_entry("result = (\n")
+    assert entry["status_code"] == 2
+    assert entry["error_class"] == "SyntaxError"
+
+
+def test_missing_result_is_rejected():
+    assert errors("import cadquery as cq\npart = cq.Workplane('XY').box(1, 1, 1)\n") == ["MissingResult"]
+
+
+def test_unknown_method_on_module_workplane_is_rejected():
+    code = "import cadquery as cq\nwp = cq.Workplane('XY')\nresult = wp.box(1, 1, 1).filterBy(lambda f: True)\n"
+    assert errors(code) == ["UnknownMethod"]
+    assert prescreen_entry(code)["error_class"] == "UnknownMethod"
+
+
+def test_unknown_keyword_and_string_for_number():
+    code = "import cadquery as cq\nresult = cq.Workplane('XY').rect(1, 1, mode='a').circle('5')\n"
+    assert sorted(errors(code)) == ["BadArgumentType", "UnknownKeyword"]
+
+
+def test_too_many_positional_arguments():
+    code = "import cadquery as cq\nresult = cq.Workplane('XY').circle(1, True, 3, 4)\n"
+    assert errors(code) == ["TooManyArguments"]
+
+
+def test_rebound_name_is_not_a_workplane():
+    code = ("import cadquery as cq\nwp = cq.Workplane('XY')\nwp = {'a': 1}\n"
+            "result = cq.Workplane('XY').box(1, 1, 1)\nitems = wp.items()\n")
+    assert errors(code) == []
+
+
+def test_loop_and_with_targets_unbind_workplanes():
+    code = ("import cadquery as cq\nwp = cq.Workplane('XY')\nfor wp in [{}]:\n    wp.items()\n"
+            "result = cq.Workplane('XY').box(1, 1, 1)\n")
+    assert errors(code) == []
+
+
+def test_function_parameter_shadowing_is_only_a_warning():
+    code = ("import cadquery as cq\nwp = cq.Workplane('XY')\n"
+            "def size(wp):\n    return wp.items()\n"
+            "result = wp.box(1, 1, 1)\n")
+    assert errors(code) == []
+    assert warnings(code) == ["UnknownMethod"]
+
+
+def test_comprehension_shadowing_is_only_a_warning_and_does_not_leak():
+    code = ("import cadquery as cq\nwp = cq.Workplane('XY')\n"
+            "keys = [wp.keys() for wp in [{}]]\n"
+            "result = wp.box(1, 1, 1).filterBy(None)\n")
+    assert errors(code) == ["UnknownMethod"]
+    assert warnings(code) == ["UnknownMethod"]
+
+
+def test_global_rebinding_makes_name_unprovable():
+    code = ("import cadquery as cq\nwp = cq.Workplane('XY')\n"
+            "def reset():\n    global wp\n    wp = {}\n"
+            "reset()\nitems = wp.items()\nresult = cq.Workplane('XY').box(1, 1, 1)\n")
+    assert errors(code) == []
+
+
+def test_plugin_methods_are_accepted():
+    code = ("import cadquery as cq\ncq.Workplane.custom = lambda self: self\n"
+            "result = cq.Workplane('XY').box(1, 1, 1).custom()\n")
+    assert errors(code) == []
+
+
+def test_show_object_and_missing_import_are_warnings():
+    code = "result = cq.Workplane('XY').box(1, 1, 1)\nshow_object(result)\n"
+    assert errors(code) == []
+    assert sorted(warnings(code)) == ["MissingImport", "ShowObject"]
+
+
+BASE = "import cadquery as cq\nresult = cq.Workplane('XY').box(1, 1, 1)\n"
+
+
+@pytest.mark.parametrize("first, second", [("{}", "cq.Workplane('XY')"), ("cq.Workplane('XY')", "{}")])
+def test_name_is_a_workplane_only_if_every_branch_binds_one(first, second):
+    code = BASE + f"if flag:\n    wp = {first}\nelse:\n    wp = {second}\nkeys = wp.keys()\n"
+    assert errors(code) == []
+
+
+def test_name_bound_to_workplane_in_every_branch_is_checked():
+    code = BASE + "if flag:\n    wp = cq.Workplane('XY')\nelse:\n    wp = cq.Workplane('XZ')\nwp.filterBy(1)\n"
+    assert errors(code) == ["UnknownMethod"]
+
+
+def test_if_without_else_keeps_the_entry_binding_possible():
+    code = BASE + "wp = cq.Workplane('XY')\nif flag:\n    wp = {}\nkeys = wp.keys()\n"
+    assert errors(code) == []
+
+
+def test_later_loop_iterations_see_rebinding():
+    code = BASE + "wp = cq.Workplane('XY')\nfor i in range(3):\n    if i:\n        wp.keys()\n    wp = {}\n"
+    assert errors(code) == []
+
+
+def test_loop_accumulating_workplane_is_checked_once():
+    code = BASE + "for i in range(3):\n    result = result.union(cq.Workplane('XY').box(1, 1, 1))\nresult.filterBy(1)\n"
+    assert errors(code) == ["UnknownMethod"]
+
+
+def test_break_state_reaches_after_the_loop():
+    code = (BASE + "wp = cq.Workplane('XY')\nfor item in items:\n    wp = {}\n    if item:\n        break\n"
+            "    wp = cq.Workplane('XY')\nkeys = wp.keys()\n")
+    assert errors(code) == []
+
+
+def test_handler_sees_bindings_from_anywhere_in_try_body():
+    code = (BASE + "wp = cq.Workplane('XY')\ntry:\n    wp = {}\n    load()\n    wp = cq.Workplane('XY')\n"
+            "except Exception:\n    keys = wp.keys()\n")
+    assert errors(code) == []
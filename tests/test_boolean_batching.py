@@ -0,0 +1,123 @@
+import ast
+import pytest
+
+cq = pytest.importorskip("cadquery")
+
+from boolean_batching import BatchingUnsupported, BooleanBatch, batch_booleans, results_match
+from geometry_checks import geometry_stats
+from script_runner import result_to_shape, run_cadquery_script
+from validation_cache import ValidationCache
+
+
+UNION_LOOP = """
+import cadquery as cq
+result = cq.Workplane("XY").box(10, 10, 2)
+for i in range(4):
+    post = cq.Workplane("XY").center(-3 + 2 * i, 0).circle(0.5).extrude(6)
+    result = result.union(post)
+"""
+
+CUT_LOOP = """
+import cadquery as cq
+result = cq.Workplane("XY").box(20, 20, 5)
+for x in (-6, -2, 2, 6):
+    result = result.faces(">Z").workplane().center(x, 0).rect(1, 1).cutBlind(-2)
+"""
+
+CUT_THRU_LOOP = """
+import cadquery as cq
+result = cq.Workplane("XY").box(20, 20, 5)
+for x in (-6, 0, 6):
+    result = result.faces(">Z").workplane().center(x, 0).rect(2, 2).cutThruAll()
+"""
+
+
+def stats_for(code, batch):
+    return geometry_stats(result_to_shape(run_cadquery_script(code, batch=batch)))
+
+
+@pytest.mark.parametrize("code, kind", [(UNION_LOOP, "fuse"), (CUT_LOOP, "cut"), (CUT_THRU_LOOP, "cut")])
+def test_batched_loop_matches_original(code, kind):
+    optimized, rewrites = batch_booleans(code)
+    assert [rewrite["kind"] for rewrite in rewrites] == [kind]
+    assert "_BooleanBatch" in optimized
+
+    original = stats_for(code, batch=False)
+    batched = geometry_stats(result_to_shape(run_cadquery_script(optimized, batch=False)))
+    assert results_match(batched, original)
+
+
+def test_loop_without_booleans_is_unchanged():
+    code = "result = cq.Workplane('XY').box(1, 1, 1)\nfor i in range(3):\n    x = i\n"
+    assert batch_booleans(code) == (code, [])
+
+
+def test_loop_reading_the_solid_is_not_batched():
+    code = UNION_LOOP.replace("    result = result.union(post)",
+                              "    result = result.union(post)\n    print(result.val().Volume())")
+    assert batch_booleans(code)[1] == []
+
+
+def test_import_follows_docstring_and_future_imports():
+    code = '"""Doc"""\nfrom __future__ import annotations\n' + UNION_LOOP
+    optimized, rewrites = batch_booleans(code)
+    assert rewrites
+    body = ast.parse(optimized).body
+    assert isinstance(body[0], ast.Expr)
+    assert body[1].module == "__future__"
+    assert body[2].module == "boolean_batching"
+    compile(optimized, "<batched>", "exec")
+
+
+def test_union_of_stack_is_unsupported():
+    with pytest.raises(BatchingUnsupported):
+        BooleanBatch("fuse").union(cq.Workplane("XY").box(1, 1, 1))
+
+
+def test_flush_fuses_with_compound_base():
+    base = cq.Compound.makeCompound([cq.Solid.makeBox(1, 1, 1), cq.Solid.makeBox(1, 1, 1, pnt=cq.Vector(3, 0, 0))])
+    wp = cq.Workplane("XY").newObject([base])
+    batch = BooleanBatch("fuse")
+    batch.union(wp, cq.Solid.makeBox(1, 1, 1, pnt=cq.Vector(6, 0, 0)))
+    result = batch.flush(wp).val()
+    assert result.Volume() == pytest.approx(3.0)
+
+
+def recorded_runs(monkeypatch):
+    import script_runner
+
+    runs = []
+    exec_script = script_runner._exec_script
+
+    def recording_exec(code, filename):
+        runs.append(code)
+        return exec_script(code, filename)
+
+    monkeypatch.setattr(script_runner, "_exec_script", recording_exec)
+    return runs
+
+
+@pytest.mark.parametrize("verdict", [None, {"match": False}])
+def test_unverified_batch_runs_original_only(monkeypatch, tmp_path, verdict):
+    cache = ValidationCache(str(tmp_path))
+    if verdict is not None:
+        cache.store_batch_verdict(UNION_LOOP, batch_booleans(UNION_LOOP)[0], verdict)
+    runs = recorded_runs(monkeypatch)
+    run_cadquery_script(UNION_LOOP, batch=True, cache=cache)
+    assert runs == [UNION_LOOP]
+
+
+def test_verified_batch_runs_batched_only(monkeypatch, tmp_path):
+    cache = ValidationCache(str(tmp_path))
+    optimized = batch_booleans(UNION_LOOP)[0]
+    cache.store_batch_verdict(UNION_LOOP, optimized, {"match": True})
+    runs = recorded_runs(monkeypatch)
+    run_cadquery_script(UNION_LOOP, batch=True, cache=cache)
+    assert runs == [optimized]
+
+
+def test_verdict_ignores_the_batching_switch(tmp_path):
+    optimized = batch_booleans(UNION_LOOP)[0]
+    ValidationCache(str(tmp_path), versions={"cadquery": "x"}).store_batch_verdict(UNION_LOOP, optimized, {"match": True})
+    cache = ValidationCache(str(tmp_path), versions={"cadquery": "x", "batch_booleans": True})
+    assert cache.batch_verdict(UNION_LOOP, optimized)["match"]
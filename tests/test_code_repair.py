@@ -0,0 +1,113 @@
+import ast
+from code_repair import repair
+
+
+def rules(applied):
+    return [item["rule"] for item in applied]
+
+
+def test_filter_by_is_removed():
+    code = "import cadquery as cq\nresult = cq.Workplane('XY').box(1, 1, 1).edges().filterBy(lambda e: True).fillet(0.1)\n"
+    repaired, applied = repair(code)
+    assert repaired == "import cadquery as cq\nresult = cq.Workplane('XY').box(1, 1, 1).edges().fillet(0.1)\n"
+    assert rules(applied) == ["filterBy"]
+
+
+def test_rect_center_tuple_becomes_center_call():
+    code = "import cadquery as cq\nresult = cq.Workplane('XY').rect(4, 2, center=(1, 2), mode='a').extrude(1)\n"
+    repaired, applied = repair(code)
+    assert repaired == "import cadquery as cq\nresult = cq.Workplane('XY').center(1, 2).rect(4, 2).extrude(1)\n"
+    assert rules(applied) == ["rect_center"]
+
+
+def test_rect_center_bool_becomes_centered():
+    code = "import cadquery as cq\nresult = cq.Workplane('XY').rect(4, 2, center=False).extrude(1)\n"
+    repaired, _ = repair(code)
+    assert "rect(4, 2, centered=False)" in repaired
+
+
+def test_workplane_on_module_is_capitalized():
+    code = "import cadquery as cad\nresult = cad.workplane('XY').box(1, 1, 1)\n"
+    repaired, applied = repair(code)
+    assert repaired == "import cadquery as cad\nresult = cad.Workplane('XY').box(1, 1, 1)\n"
+    assert rules(applied) == ["workplane_plane"]
+
+
+def test_workplane_with_plane_name_becomes_new_workplane():
+    code = 'import cadquery as cq\nresult = cq.Workplane("XY").box(2, 2, 1)\nresult = result.workplane("XY").circle(1).extrude(1)\n'
+    repaired, applied = repair(code)
+    assert repaired == ('import cadquery as cq\nresult = cq.Workplane("XY").box(2, 2, 1)\n'
+                        'result = cq.Workplane("XY").circle(1).extrude(1)\n')
+    assert rules(applied) == ["workplane_plane"]
+
+
+def test_workplane_with_plane_name_uses_import_alias():
+    code = "import cadquery as cad\nbase = cad.Workplane('XY')\nresult = base.faces('>Z').workplane('XZ', origin=(0, 0, 1)).box(1, 1, 1)\n"
+    repaired, _ = repair(code)
+    assert "result = cad.Workplane('XZ', origin=(0, 0, 1)).box(1, 1, 1)" in repaired
+
+
+def test_workplane_with_offset_or_no_arguments_is_kept():
+    code = ("import cadquery as cq\nbase = cq.Workplane('XY').box(2, 2, 1)\n"
+            "result = base.faces('>Z').workplane().hole(0.5)\ntop = base.faces('>Z').workplane(2.5)\n"
+            "side = base.workplane(offset=1)\n")
+    assert repair(code) == (code, [])
+
+
+def test_workplane_on_rebound_cq_is_kept():
+    code = "cq = make_builder()\nresult = cq.workplane('XY')\n"
+    assert repair(code) == (code, [])
+
+
+def test_move_with_three_arguments_becomes_translate():
+    code = "import cadquery as cq\nresult = cq.Workplane('XY').box(1, 1, 1).move(1, 2, 3)\n"
+    repaired, applied = repair(code)
+    assert repaired.endswith(".box(1, 1, 1).translate((1, 2, 3))\n")
+    assert rules(applied) == ["translate"]
+
+
+def test_two_dimensional_move_is_kept():
+    code = "import cadquery as cq\nresult = cq.Workplane('XY').move(1, 2).box(1, 1, 1)\n"
+    assert repair(code) == (code, [])
+
+
+def test_import_is_added_after_docstring_and_future_imports():
+    code = '"""Part"""\nfrom __future__ import annotations\n# body\nresult = cq.Workplane("XY").box(1, 1, 1)\n'
+    repaired, applied = repair(code)
+    assert repaired == ('"""Part"""\nfrom __future__ import annotations\n# body\n'
+                        'import cadquery as cq\nresult = cq.Workplane("XY").box(1, 1, 1)\n')
+    assert rules(applied) == ["import_cadquery"]
+
+
+def test_import_after_docstring_without_trailing_newline():
+    code = '"""Part"""; result = cq.Workplane("XY").box(1, 1, 1)'
+    repaired, applied = repair(code)
+    assert rules(applied) == ["import_cadquery"]
+    tree = ast.parse(repaired)
+    assert [type(stmt).__name__ for stmt in tree.body] == ["Expr", "Import", "Assign"]
+
+
+def test_import_is_not_added_when_present():
+    code = "import cadquery as cq\nresult = cq.Workplane('XY').box(1, 1, 1)\n"
+    assert repair(code) == (code, [])
+
+
+def test_comments_and_layout_are_kept():
+    code = ("import cadquery as cq\n# base plate\nresult = (\n    cq.Workplane('XY')\n"
+            "    .box(4, 4, 1)  # plate\n    .edges().filterBy(lambda e: True)\n)\n")
+    repaired, applied = repair(code)
+    assert repaired == ("import cadquery as cq\n# base plate\nresult = (\n    cq.Workplane('XY')\n"
+                        "    .box(4, 4, 1)  # plate\n    .edges()\n)\n")
+    assert applied == [{"rule": "filterBy", "line": 6}]
+
+
+def test_unparseable_code_is_returned_unchanged():
+    code = "result = cq.Workplane(\n"
+    assert repair(code) == (code, [])
+
+
+def test_selected_rules_only():
+    code = "result = cq.Workplane('XY').box(1, 1, 1).move(1, 2, 3)\n"
+    repaired, applied = repair(code, rules=["translate"])
+    assert rules(applied) == ["translate"]
+    assert "import cadquery" not in repaired
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+from generation_engine import AIMDLimiter, TokenBucket
+
+
+def test_bucket_serves_burst_without_waiting():
+    async def run():
+        bucket = TokenBucket(per_minute=60, burst_seconds=5)
+        for _ in range(5):
+            await bucket.acquire()
+        return bucket
+    bucket = asyncio.run(run())
+    assert bucket.waited == 0
+    assert bucket.level < 1
+
+
+def test_bucket_waits_for_refill():
+    async def run():
+        bucket = TokenBucket(per_minute=600, burst_seconds=0.1)  # capacity 1, 10/s
+        start = time.monotonic()
+        await bucket.acquire()
+        await bucket.acquire()
+        return bucket, time.monotonic() - start
+    bucket, elapsed = asyncio.run(run())
+    assert bucket.waited > 0
+    assert elapsed >= 0.05
+
+
+def test_bucket_adjust_can_go_negative_and_is_capped():
+    async def run():
+        bucket = TokenBucket(per_minute=60, burst_seconds=1)
+        await bucket.acquire()
+        bucket.adjust(10)
+        negative = bucket.level
+        bucket.adjust(-1000)
+        return bucket, negative
+    bucket, negative = asyncio.run(run())
+    assert negative < 0
+    assert bucket.level == bucket.capacity
+
+
+def test_bucket_clamps_oversized_requests_to_capacity():
+    async def run():
+        bucket = TokenBucket(per_minute=60, burst_seconds=2)
+        await asyncio.wait_for(bucket.acquire(100), timeout=1)
+        return bucket
+    assert asyncio.run(run()).waited == 0
+
+
+def test_limiter_grows_additively():
+    async def run():
+        limiter = AIMDLimiter(initial=2, maximum=10)
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release(latency=1.0)
+        return limiter
+    limiter = asyncio.run(run())
+    assert 3.5 < limiter.limit < 4
+    assert limiter.decreases == 0
+
+
+def test_limiter_halves_on_congestion_once_per_baseline():
+    async def run():
+        limiter = AIMDLimiter(initial=8)
+        await limiter.acquire()
+        await limiter.release(latency=60.0)
+        for _ in range(3):
+            await limiter.acquire()
+            await limiter.release(congested=True)
+        return limiter
+    limiter = asyncio.run(run())
+    # The burst of congestion within one baseline latency counts once
+    assert limiter.decreases == 1
+    assert limiter.limit < 8 * 0.5 + 1
+
+
+def test_limiter_treats_slow_calls_as_congestion():
+    async def run():
+        limiter = AIMDLimiter(initial=8)
+        limiter.last_decrease = float("-inf")
+        await limiter.acquire()
+        await limiter.release(latency=0.001)
+        await limiter.acquire()
+        await limiter.release(latency=1.0)
+        return limiter
+    assert asyncio.run(run()).decreases == 1
+
+
+def test_limiter_respects_minimum_and_maximum():
+    async def run():
+        low = AIMDLimiter(initial=1, minimum=1)
+        low.last_decrease = float("-inf")
+        await low.acquire()
+        await low.release(congested=True)
+        high = AIMDLimiter(initial=3, maximum=3)
+        await high.acquire()
+        await high.release(latency=1.0)
+        return low, high
+    low, high = asyncio.run(run())
+    assert low.limit == 1
+    assert high.limit == 3
+
+
+def test_limiter_blocks_past_the_limit():
+    async def run():
+        limiter = AIMDLimiter(initial=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        blocked = not waiter.done()
+        await limiter.release(latency=1.0)
+        await asyncio.wait_for(waiter, timeout=1)
+        return blocked, limiter.in_flight
+    blocked, in_flight = asyncio.run(run())
+    assert blocked
+    assert in_flight == 1
@@ -0,0 +1,43 @@
+import tarfile
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from render_sinks import PngSink, ShardSink
+
+
+def image():
+    return np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+def test_failed_png_write_is_reported_not_raised(tmp_path):
+    sink = PngSink(str(tmp_path))
+    sink.write("good", {"iso": image()})
+    sink.write("bad", {"iso": np.zeros((4, 4, 7), dtype=np.uint8)})
+    failures = sink.close()
+    assert list(failures) == ["bad"]
+    assert (tmp_path / "good.png").exists()
+
+
+def test_queue_is_bounded(tmp_path):
+    sink = PngSink(str(tmp_path), encode_workers=1, max_pending=2)
+    for index in range(10):
+        sink.write(f"s{index}", {"iso": image()})
+        assert len(sink.pending) <= 2
+    assert sink.close() == {}
+    assert len(list(tmp_path.glob("*.png"))) == 10
+
+
+def test_shard_sink_reports_failures_and_keeps_other_samples(tmp_path):
+    sink = ShardSink(str(tmp_path), max_samples=2, max_pending=2)
+    sink.write("a", {"iso": image()}, metadata={"file": "a.py"})
+    sink.write("b", {"iso": np.zeros((4, 4, 7), dtype=np.uint8)})
+    sink.write("c", {"iso": image()})
+    assert list(sink.close()) == ["b"]
+    names = set()
+    for shard in sink.shards:
+        with tarfile.open(shard) as tar:
+            names.update(tar.getnames())
+    assert names == {"a.iso.png", "a.json", "c.iso.png"}
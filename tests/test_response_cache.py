@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from response_cache import CacheMiss, ResponseCache
+
+
+def entry(text="result = 1"):
+    return {"text": text, "usage": {"input_tokens": 10, "output_tokens": 5}, "raw": None}
+
+
+def test_record_then_replay(tmp_path):
+    calls = []
+
+    def request():
+        calls.append(1)
+        return entry()
+
+    recorder = ResponseCache(str(tmp_path), mode="record")
+    first = recorder.get_or_call("model", "prompt", "input", {"t": 0}, request)
+    second = recorder.get_or_call("model", "prompt", "input", {"t": 0}, request)
+    assert first["cached"] is False and second["cached"] is True
+    assert second["text"] == first["text"]
+    assert len(calls) == 1
+    assert recorder.summary()["hits"] == 1 and recorder.summary()["misses"] == 1
+    assert recorder.summary()["saved_usage"] == {"input_tokens": 10, "output_tokens": 5}
+
+    replayer = ResponseCache(str(tmp_path), mode="replay")
+    replayed = replayer.get_or_call("model", "prompt", "input", {"t": 0}, request)
+    assert replayed["text"] == "result = 1"
+    assert "latency_seconds" in replayed
+    assert len(calls) == 1
+
+
+def test_replay_miss_raises_without_calling(tmp_path):
+    cache = ResponseCache(str(tmp_path), mode="replay")
+    with pytest.raises(CacheMiss):
+        cache.get_or_call("model", "prompt", "input", None, lambda: pytest.fail("called the provider"))
+    assert cache.misses == 1
+
+
+def test_replay_does_not_store(tmp_path):
+    cache = ResponseCache(str(tmp_path), mode="replay")
+    key = cache.key("model", "prompt", "input")
+    cache.store(key, entry())
+    assert cache.lookup(key) is None
+
+
+def test_off_always_calls(tmp_path):
+    calls = []
+    cache = ResponseCache(str(tmp_path / "cache"), mode="off")
+    for _ in range(2):
+        cache.get_or_call("model", "prompt", "input", None, lambda: calls.append(1) or entry())
+    assert len(calls) == 2
+    assert not (tmp_path / "cache").exists()
+
+
+def test_key_depends_on_every_part(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    base = cache.key("model", "prompt", "input", {"t": 0})
+    assert cache.key("model", "prompt", "input", {"t": 0}) == base
+    for other in (cache.key("other", "prompt", "input", {"t": 0}),
+                  cache.key("model", "other", "input", {"t": 0}),
+                  cache.key("model", "prompt", "other", {"t": 0}),
+                  cache.key("model", "prompt", "input", {"t": 1})):
+        assert other != base
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key = cache.key("model", "prompt", "input")
+    cache.store(key, entry())
+    with open(cache.path(key), "w") as f:
+        f.write("{torn")
+    assert cache.lookup(key) is None
+
+
+def test_async_record_then_replay(tmp_path):
+    async def request():
+        return entry("async")
+
+    async def run():
+        recorder = ResponseCache(str(tmp_path), mode="record")
+        await recorder.aget_or_call("model", "prompt", "input", None, request)
+        replayer = ResponseCache(str(tmp_path), mode="replay")
+        return await replayer.aget_or_call("model", "prompt", "input", None, request)
+
+    replayed = asyncio.run(run())
+    assert replayed["cached"] is True
+    assert replayed["text"] == "async"
+
+
+def test_invalid_mode(tmp_path):
+    with pytest.raises(ValueError):
+        ResponseCache(str(tmp_path), mode="sometimes")
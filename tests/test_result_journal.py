@@ -0,0 +1,76 @@
+import json
+from result_journal import ResultJournal, content_hash, drop_torn_line, load_journal
+
+
+def test_later_records_supersede_earlier(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with ResultJournal(str(path)) as journal:
+        journal.write({"file": "a.py", "status_code": 2})
+        journal.write({"file": "b.py", "status_code": 0})
+        journal.write({"file": "a.py", "status_code": 0})
+
+    records = load_journal(str(path))
+    assert records == {"a.py": {"file": "a.py", "status_code": 0}, "b.py": {"file": "b.py", "status_code": 0}}
+
+
+def test_without_resume_the_journal_is_truncated(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with ResultJournal(str(path)) as journal:
+        journal.write({"file": "a.py"})
+    with ResultJournal(str(path)) as journal:
+        journal.write({"file": "b.py"})
+
+    assert list(load_journal(str(path))) == ["b.py"]
+
+
+def test_missing_journal_loads_empty(tmp_path):
+    assert load_journal(str(tmp_path / "missing.jsonl")) == {}
+
+
+def test_resume_after_torn_line_keeps_new_records(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with ResultJournal(str(path)) as journal:
+        journal.write({"file": "a.py", "status_code": 0})
+    # A crash mid-write leaves a partial record with no newline
+    with open(path, 'a') as f:
+        f.write('{"file": "b.py", "sta')
+
+    assert list(load_journal(str(path))) == ["a.py"]
+
+    with ResultJournal(str(path), resume=True) as journal:
+        journal.write({"file": "b.py", "status_code": 0})
+    with ResultJournal(str(path), resume=True) as journal:
+        journal.write({"file": "c.py", "status_code": 0})
+
+    assert sorted(load_journal(str(path))) == ["a.py", "b.py", "c.py"]
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["file"] for line in lines] == ["a.py", "b.py", "c.py"]
+
+
+def test_drop_torn_line_without_any_newline(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"file": "a.py"')
+    drop_torn_line(str(path), chunk_size=4)
+    assert path.read_text() == ""
+
+
+def test_drop_torn_line_across_chunks(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"file": "a.py"}\n' + "x" * 50)
+    drop_torn_line(str(path), chunk_size=8)
+    assert path.read_text() == '{"file": "a.py"}\n'
+
+
+def test_drop_torn_line_leaves_complete_journal(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"file": "a.py"}\n')
+    drop_torn_line(str(path))
+    assert path.read_text() == '{"file": "a.py"}\n'
+
+
+def test_content_hash_changes_with_content(tmp_path):
+    path = tmp_path / "script.py"
+    path.write_text("result = 1\n")
+    first = content_hash(str(path))
+    path.write_text("result = 2\n")
+    assert content_hash(str(path)) != first
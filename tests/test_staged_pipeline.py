@@ -0,0 +1,82 @@
+import asyncio
+
+from staged_pipeline import Stage, run_stages
+
+
+def run(items, stages):
+    finished = []
+    stats = asyncio.run(run_stages(items, stages, finished.append, dashboard_interval=None, write=lambda line: None))
+    return finished, stats
+
+
+def test_items_pass_through_every_stage():
+    def mark(name):
+        async def handler(item):
+            item.setdefault("seen", []).append(name)
+            return True
+        return handler
+
+    finished, stats = run([{"id": i} for i in range(20)],
+                          [Stage("a", mark("a"), workers=2), Stage("b", mark("b"), workers=3)])
+    assert sorted(item["id"] for item in finished) == list(range(20))
+    assert all(item["seen"] == ["a", "b"] for item in finished)
+    assert stats["a"]["done"] == stats["a"]["forwarded"] == 20
+    assert stats["b"]["done"] == 20 and stats["b"]["forwarded"] == 0
+
+
+def test_handler_error_finishes_the_item_and_keeps_going():
+    async def flaky(item):
+        if item["id"] % 3 == 0:
+            raise ValueError("bad item")
+        return True
+
+    async def second(item):
+        item["second"] = True
+        return True
+
+    finished, stats = run([{"id": i} for i in range(9)],
+                          [Stage("first", flaky, workers=2), Stage("second", second, workers=1)])
+    assert len(finished) == 9
+    failed = [item for item in finished if "errors" in item]
+    assert sorted(item["id"] for item in failed) == [0, 3, 6]
+    assert failed[0]["errors"] == ["first: ValueError: bad item"]
+    assert not any("second" in item for item in failed)
+    assert stats["first"]["errors"] == 3 and stats["first"]["forwarded"] == 6
+    assert stats["second"]["done"] == 6
+
+
+def test_false_stops_an_item_early():
+    async def keep_even(item):
+        return item["id"] % 2 == 0
+
+    async def never(item):
+        raise AssertionError("odd items must not reach this stage")
+
+    async def after(item):
+        assert item["id"] % 2 == 0
+        return True
+
+    finished, stats = run([{"id": i} for i in range(6)],
+                          [Stage("filter", keep_even, workers=1), Stage("after", after, workers=1)])
+    assert len(finished) == 6
+    assert stats["filter"]["forwarded"] == 3
+    assert stats["after"]["done"] == 3 and stats["after"]["errors"] == 0
+
+
+def test_slow_stage_bounds_the_queue():
+    depths = []
+
+    async def fast(item):
+        return True
+
+    stages = [Stage("fast", fast, workers=4), None]
+
+    async def slow(item):
+        depths.append(stages[1].queue.qsize())
+        await asyncio.sleep(0.001)
+        return True
+
+    stages[1] = Stage("slow", slow, workers=1, queue_size=2)
+    finished, _ = run([{"id": i} for i in range(20)], stages)
+    assert len(finished) == 20
+    assert max(depths) <= 2
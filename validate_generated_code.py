@@ -1,20 +1,25 @@
 """
-Validate generated CadQuery code by executing it and exporting to STEP format
+Validate generated CadQuery code by executing it and checking the resulting
+geometry in memory (valid, closed solids with positive volume)
 """
-import os
-import sys
-import tempfile
+import argparse
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, TimeoutError
-import multiprocessing
 import json
 from datetime import datetime
+from result_journal import ResultJournal, content_hash, load_journal
+from ast_prescreen import prescreen_entry
+from validation_cache import ValidationCache, classify_error, validate_source, worker_failure_entry
+from worker_launch import format_startup
+from worker_pool import MAX_TASKS_PER_WORKER, MAX_WORKER_RSS_MB, WarmPool
 
 
 GENERATED_CODE_DIR = "data/generated_code"
 VALIDATION_RESULTS_FILE = "data/validation_results.json"
+VALIDATION_JOURNAL_FILE = "data/validation_results.jsonl"
 NUM_WORKERS = 64
 TIMEOUT_SECONDS = 15
+MAX_TASKS_PER_CHILD = MAX_TASKS_PER_WORKER
+MAX_CHILD_RSS_MB = MAX_WORKER_RSS_MB
 
 ERROR_CODES = {
     0: "Success",
@@ -29,66 +34,75 @@ ERROR_CODES = {
 
 def validate_single_code(code_path):
     """
-    Validate a single CadQuery Python file
-    Returns: (code_path, status_code, error_message)
+    Validate a single CadQuery Python file, executing it only on a cache miss
+
+    The result is checked in memory (solids, BRepCheck validity, closed
+    shells, volume, bounding box); no STEP file is written.
+    Returns: (code_path, entry) with status_code, error, error_class and stats
     """
     try:
-        with tempfile.NamedTemporaryFile(suffix='.step', delete=False) as tmp:
-            step_file = tmp.name
-
         with open(code_path, 'r') as f:
             code = f.read()
+        entry, _ = validate_source(code, str(code_path))
+        return (str(code_path), entry)
+    except Exception as e:
+        status_code, error_msg = classify_error(e)
+        return (str(code_path), {"status_code": status_code, "error": error_msg,
+                                 "error_class": type(e).__name__})
 
-        template = f"""
-import cadquery as cq
 
-{code}
+def pool_result_to_entry(code_path, outcome, value):
+    """Map a WarmPool outcome to (code_path, entry)"""
+    if outcome == "done":
+        return value
+    return (str(code_path), worker_failure_entry(outcome, value))
 
-cq.exporters.export(result, '{step_file}')
-"""
 
-        namespace = {}
-        exec(template, namespace)
+def build_summary(records, file_names):
+    """Summary JSON for file_names from their latest journal records"""
+    results = {
+        "total": len(file_names),
+        "valid": 0,
+        "invalid": 0,
+        "missing": 0,
+        "errors_by_code": {code: 0 for code in ERROR_CODES.keys()},
+        "files": {},
+        "timestamp": datetime.now().isoformat()
+    }
 
-        if os.path.exists(step_file) and os.path.getsize(step_file) > 0:
-            os.unlink(step_file)
-            return (str(code_path), 0, None)
+    for file_name in file_names:
+        record = records.get(file_name)
+        if record is None:
+            results["missing"] += 1
+            continue
+        results["files"][file_name] = {
+            "status_code": record["status_code"],
+            "error": record["error"],
+            "error_class": record.get("error_class"),
+            "valid": record["valid"],
+            "geometry": record.get("geometry")
+        }
+        results["errors_by_code"][record["status_code"]] += 1
+        if record["valid"]:
+            results["valid"] += 1
         else:
-            os.unlink(step_file) if os.path.exists(step_file) else None
-            return (str(code_path), 5, "No geometry created")
+            results["invalid"] += 1
+    return results
 
-    except SyntaxError as e:
-        return (str(code_path), 2, f"Syntax error: {str(e)}")
-    except NameError as e:
-        return (str(code_path), 2, f"Name error: {str(e)}")
-    except Exception as e:
-        error_msg = str(e)
-        if "OCC" in error_msg or "opencascade" in error_msg.lower():
-            return (str(code_path), 3, f"OCC error: {error_msg}")
-        else:
-            return (str(code_path), 2, f"Runtime error: {error_msg}")
-    finally:
-        if 'step_file' in locals() and os.path.exists(step_file):
-            try:
-                os.unlink(step_file)
-            except:
-                pass
 
-
-def validate_with_timeout(code_path, timeout):
-    """Wrapper to validate with timeout"""
-    try:
-        with ProcessPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(validate_single_code, code_path)
-            return future.result(timeout=timeout)
-    except TimeoutError:
-        return (str(code_path), 4, f"Timeout after {timeout} seconds")
-    except Exception as e:
-        return (str(code_path), 6, f"Multiprocessing error: {str(e)}")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Validate generated CadQuery code")
+    parser.add_argument("--journal", default=VALIDATION_JOURNAL_FILE,
+                        help="Append-only JSONL of per-file results (default: %(default)s)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip files whose journal entry matches their current content hash")
+    return parser.parse_args()
 
 
 def main():
     """Main validation process"""
+    args = parse_args()
+
     print("=" * 60)
     print("CadQuery Code Validation")
     print("=" * 60)
@@ -100,44 +114,94 @@ def main():
 
     py_files = sorted(code_dir.glob("*.py"))
     total_files = len(py_files)
+    hashes = {py_file.name: content_hash(py_file) for py_file in py_files}
+
+    previous = load_journal(args.journal) if args.resume else {}
+    to_validate = [
+        py_file for py_file in py_files
+        if previous.get(py_file.name, {}).get("sha256") != hashes[py_file.name]
+    ]
 
     print(f"\nFound {total_files} Python files to validate")
+    if args.resume:
+        print(f"Resuming: {total_files - len(to_validate)} unchanged files already in {args.journal}")
     print(f"Workers: {NUM_WORKERS}")
-    print(f"Timeout: {TIMEOUT_SECONDS} seconds per file\n")
-
-    results = {
-        "total": total_files,
-        "valid": 0,
-        "invalid": 0,
-        "errors_by_code": {code: 0 for code in ERROR_CODES.keys()},
-        "files": {},
-        "timestamp": datetime.now().isoformat()
-    }
+    print(f"Timeout: {TIMEOUT_SECONDS} seconds per file")
+    print(f"Workers recycled after {MAX_TASKS_PER_CHILD} files or {MAX_CHILD_RSS_MB} MB RSS\n")
+
+    # Scripts the AST pre-screen rejects, and scripts already validated under
+    # this cadquery/OCCT build by this or any other stage, never reach a worker
+    cache = ValidationCache()
+    prescreened = {}
+    cached = {}
+    for py_file in to_validate:
+        with open(py_file, 'r') as f:
+            code = f.read()
+        entry = prescreen_entry(code, str(py_file))
+        if entry is not None:
+            prescreened[py_file.name] = entry
+            continue
+        entry = cache.lookup(code, timeout=TIMEOUT_SECONDS)
+        if entry is not None:
+            cached[py_file.name] = entry
+    to_execute = [py_file for py_file in to_validate
+                  if py_file.name not in cached and py_file.name not in prescreened]
+    print(f"Pre-screen rejected: {len(prescreened)}")
+    print(f"Validation cache: {len(cached)} hits, {len(to_execute)} to execute\n")
 
     print("Validating...")
-    with ProcessPoolExecutor(max_workers=NUM_WORKERS) as executor:
-        futures = {executor.submit(validate_with_timeout, py_file, TIMEOUT_SECONDS): py_file
-                   for py_file in py_files}
-
-        completed = 0
-        for future in futures:
-            file_path, status_code, error_msg = future.result()
+    # Workers import cadquery once and validate many files each; a file that
+    # hangs only costs the worker running it. Results arrive in completion
+    # order and are journaled immediately, so an interrupted run can resume.
+    pool = WarmPool(
+        validate_single_code,
+        workers=NUM_WORKERS,
+        timeout=TIMEOUT_SECONDS,
+        max_tasks_per_worker=MAX_TASKS_PER_CHILD,
+        max_rss_mb=MAX_CHILD_RSS_MB
+    )
+
+    def journal_record(file_name, entry, source):
+        return {
+            "file": file_name,
+            "sha256": hashes[file_name],
+            "status_code": entry["status_code"],
+            "error": entry["error"],
+            "error_class": entry.get("error_class"),
+            "valid": entry["status_code"] == 0,
+            "geometry": entry.get("stats"),
+            "source": source,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    completed = 0
+    with ResultJournal(args.journal, resume=args.resume) as journal:
+        for file_name, entry in prescreened.items():
+            journal.write(journal_record(file_name, entry, "prescreen"))
+        for file_name, entry in cached.items():
+            journal.write(journal_record(file_name, entry, "cache"))
+
+        for (py_file,), outcome, value in pool.run([(py_file,) for py_file in to_execute]):
+            file_path, entry = pool_result_to_entry(py_file, outcome, value)
+            status_code = entry["status_code"]
             completed += 1
+            if outcome == "timeout":
+                with open(py_file, 'r') as f:
+                    cache.store_timeout(f.read(), TIMEOUT_SECONDS)
 
             file_name = Path(file_path).name
-            results["files"][file_name] = {
-                "status_code": status_code,
-                "error": error_msg,
-                "valid": status_code == 0
-            }
+            journal.write(journal_record(file_name, entry, "executed"))
 
-            results["errors_by_code"][status_code] += 1
             if status_code == 0:
-                results["valid"] += 1
-                print(f"[{completed}/{total_files}] ✓ {file_name}")
+                print(f"[{completed}/{len(to_execute)}] ✓ {file_name}")
             else:
-                results["invalid"] += 1
-                print(f"[{completed}/{total_files}] ✗ {file_name} - {ERROR_CODES.get(status_code, 'Unknown')}")
+                print(f"[{completed}/{len(to_execute)}] ✗ {file_name} - {ERROR_CODES.get(status_code, 'Unknown')}")
+
+    results = build_summary(load_journal(args.journal), [py_file.name for py_file in py_files])
+    results["validated_this_run"] = len(to_validate)
+    results["validation_cache_hits"] = len(cached)
+    results["prescreen_rejected"] = len(prescreened)
+    results["workers"] = dict(pool.stats, startup=pool.startup_summary())
 
     # Save results
     with open(VALIDATION_RESULTS_FILE, 'w') as f:
@@ -148,16 +212,23 @@ def main():
     print("Validation Complete")
     print("=" * 60)
     print(f"Total files:    {results['total']}")
-    print(f"Valid:          {results['valid']} ({results['valid']/results['total']*100:.1f}%)")
-    print(f"Invalid:        {results['invalid']} ({results['invalid']/results['total']*100:.1f}%)")
+    if results['total']:
+        print(f"Valid:          {results['valid']} ({results['valid']/results['total']*100:.1f}%)")
+        print(f"Invalid:        {results['invalid']} ({results['invalid']/results['total']*100:.1f}%)")
+    print(f"Validated now:  {len(to_validate)} ({len(prescreened)} rejected by pre-screen, "
+          f"{len(cached)} from cache)")
     print("\nError breakdown:")
     for code, count in sorted(results["errors_by_code"].items()):
         if count > 0:
             print(f"  {ERROR_CODES[code]}: {count}")
-    print(f"\nResults saved to: {VALIDATION_RESULTS_FILE}")
+    print(f"\nWorkers started: {pool.stats['started']} "
+          f"({pool.stats['recycled']} recycled, {pool.stats['timeouts']} killed on timeout, "
+          f"{pool.stats['crashes']} crashed)")
+    print(format_startup(pool.startup_summary()))
+    print(f"\nJournal:        {args.journal}")
+    print(f"Results saved to: {VALIDATION_RESULTS_FILE}")
     print("=" * 60)
 
 
 if __name__ == "__main__":
-    multiprocessing.set_start_method('spawn', force=True)
     main()
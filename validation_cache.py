@@ -0,0 +1,297 @@
+"""
+Persistent content-hash cache of CadQuery script validation results
+Entries are keyed by (normalized source hash, cadquery version, OCCT version)
+and hold the validation status, error class, BREP (and, for exports, STEP)
+blobs and geometry stats, so validate, export, the pipeline and the renderer
+only ever execute a given script once
+"""
+import io
+import os
+import ast
+import json
+import hashlib
+import tempfile
+from datetime import datetime
+import cadquery as cq
+import OCP
+from script_runner import BATCH_BOOLEANS, run_cadquery_script, result_to_shape, shape_to_brep
+from geometry_checks import CHECKS_VERSION, geometry_problem, geometry_stats
+from boolean_options import result_affecting_options
+from ast_prescreen import prescreen_entry
+
+
+CACHE_DIR = "data/validation_cache"
+
+VERSIONS = {
+    "cadquery": cq.__version__,
+    "occt": OCP.__version__,
+    "checks": CHECKS_VERSION,
+}
+if BATCH_BOOLEANS:
+    # Batched results match within tolerance, not bit for bit
+    VERSIONS["batch_booleans"] = True
+VERSIONS.update(result_affecting_options())
+
+
+def normalized_source_hash(code):
+    """
+    Hash of a script that ignores comments and formatting
+
+    Scripts that parse are hashed by their AST; ones that do not are hashed
+    by their text with line endings and trailing whitespace normalized.
+    """
+    try:
+        normalized = ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError):
+        lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        normalized = "\n".join(line.rstrip() for line in lines).strip("\n")
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def classify_error(error):
+    """Map an exception from running a script to (status_code, message)"""
+    if isinstance(error, SyntaxError):
+        return 2, f"Syntax error: {error}"
+    if isinstance(error, NameError):
+        return 2, f"Name error: {error}"
+    message = str(error)
+    if "OCC" in message or "opencascade" in message.lower():
+        return 3, f"OCC error: {message}"
+    return 2, f"Runtime error: {message}"
+
+
+def worker_failure_entry(outcome, message):
+    """Entry for a script whose worker ran past its timeout ("timeout") or died (any other outcome)"""
+    if outcome == "timeout":
+        return {"status_code": 4, "error": message, "error_class": "Timeout"}
+    return {"status_code": 6, "error": f"Multiprocessing error: {message}", "error_class": "WorkerCrash"}
+
+
+class ValidationCache:
+    """
+    Directory of <key>.json entries with optional <key>.step and <key>.brep blobs,
+    plus <key>.batch.json verdicts on batched rewrites (see boolean_batching)
+
+    The JSON entry is written last and atomically, so a present entry always
+    has its blobs. Timeouts are cached with the limit that was exceeded and
+    only answer lookups with the same or a shorter limit; worker crashes are
+    never cached.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, versions=VERSIONS):
+        self.cache_dir = cache_dir
+        self.versions = dict(versions)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, code):
+        payload = json.dumps({"source": normalized_source_hash(code), **self.versions}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key, suffix):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def lookup(self, code, timeout=None):
+        """Cached entry for code, or None; timeout is the caller's time limit"""
+        path = self.path(self.key(code), ".json")
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            entry = None
+        if entry is not None and entry["status_code"] == 4 and timeout and timeout > entry["timeout"]:
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, code, entry, step=None, brep=None):
+        """Save an entry and its blobs; returns the stored entry"""
+        key = self.key(code)
+        entry = dict(
+            entry,
+            key=key,
+            versions=self.versions,
+            has_step=step is not None,
+            has_brep=brep is not None,
+            created=datetime.now().isoformat()
+        )
+        for suffix, data in ((".step", step), (".brep", brep)):
+            if data is not None:
+                self._write(self.path(key, suffix), data)
+        self._write(self.path(key, ".json"), json.dumps(entry).encode())
+        return entry
+
+    def store_timeout(self, code, timeout):
+        """Record that code ran past timeout seconds"""
+        return self.store(code, {
+            "status_code": 4,
+            "error": f"Timeout after {timeout} seconds",
+            "error_class": "Timeout",
+            "timeout": timeout
+        })
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def batch_key(self, code, optimized):
+        """
+        Key of a batching verdict: the source and its batched rewrite, under
+        every version except the batching switch itself
+        """
+        versions = {name: value for name, value in self.versions.items() if name != "batch_booleans"}
+        payload = json.dumps({
+            "source": normalized_source_hash(code),
+            "batched": hashlib.sha256(optimized.encode()).hexdigest(),
+            **versions
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def batch_verdict(self, code, optimized):
+        """Recorded verdict on whether optimized reproduces code, or None"""
+        try:
+            with open(self.path(self.batch_key(code, optimized), ".batch.json"), 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def store_batch_verdict(self, code, optimized, verdict):
+        """Record whether the batched rewrite optimized matches code (verdict["match"])"""
+        verdict = dict(verdict, versions=self.versions, created=datetime.now().isoformat())
+        self._write(self.path(self.batch_key(code, optimized), ".batch.json"), json.dumps(verdict).encode())
+        return verdict
+
+    def brep_bytes(self, entry):
+        """An entry's BREP blob, or None if it has none (or it was removed)"""
+        if not entry.get("has_brep"):
+            return None
+        try:
+            with open(self.path(entry["key"], ".brep"), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write_step(self, entry, step_path):
+        """Write an entry's geometry to step_path without re-running its script"""
+        if entry["has_step"]:
+            with open(self.path(entry["key"], ".step"), 'rb') as src, open(step_path, 'wb') as dst:
+                dst.write(src.read())
+        else:
+            shape = cq.Shape.importBrep(io.BytesIO(self.brep_bytes(entry)))
+            cq.exporters.export(shape, step_path)
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Per-process cache on CACHE_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ValidationCache()
+    return _default_cache
+
+
+def execute_shape(code, filename="<cadquery>"):
+    """
+    Run a script and check its result in memory
+
+    The result must be valid solid geometry (see geometry_checks) for the
+    entry to pass. Returns (entry, shape); shape is the live cadquery Shape
+    the script produced, also when it failed the geometry checks, or None
+    when the script raised or produced no geometry.
+    """
+    try:
+        result = run_cadquery_script(code, filename)
+
+        try:
+            shape = result_to_shape(result)
+        except ValueError:
+            return {"status_code": 5, "error": "No geometry created", "error_class": "NoGeometry"}, None
+
+        stats = geometry_stats(shape)
+        problem = geometry_problem(stats)
+        if problem:
+            error_class, message = problem
+            entry = {"status_code": 5, "error": f"Non-solid geometry: {message}",
+                     "error_class": error_class, "stats": stats}
+            return entry, shape
+
+        return {"status_code": 0, "error": None, "error_class": None, "stats": stats}, shape
+
+    except Exception as e:
+        status_code, message = classify_error(e)
+        return {"status_code": status_code, "error": message, "error_class": type(e).__name__}, None
+
+
+def execute_source(code, filename="<cadquery>", export_step=False):
+    """
+    Run a script and check its result in memory
+
+    STEP is only written when export_step is set. Returns (entry,
+    step_bytes, brep_bytes); the blobs are None when the script produced
+    no shape, and are kept for shapes that fail the geometry checks.
+    """
+    entry, shape = execute_shape(code, filename)
+    if shape is None:
+        return entry, None, None
+
+    try:
+        step = None
+        if export_step:
+            with tempfile.NamedTemporaryFile(suffix='.step', delete=False) as tmp:
+                step_file = tmp.name
+            try:
+                cq.exporters.export(shape, step_file)
+                with open(step_file, 'rb') as f:
+                    step = f.read()
+            finally:
+                os.unlink(step_file)
+        return entry, step, shape_to_brep(shape)
+
+    except Exception as e:
+        status_code, message = classify_error(e)
+        return {"status_code": status_code, "error": message, "error_class": type(e).__name__}, None, None
+
+
+def execute_and_store(code, filename="<cadquery>", cache=None, export_step=False):
+    """Execute code regardless of any cached entry and cache the outcome; returns (entry, brep_bytes)"""
+    cache = cache or default_cache()
+    entry, step, brep = execute_source(code, filename, export_step)
+    return cache.store(code, entry, step=step, brep=brep), brep
+
+
+def validate_source(code, filename="<cadquery>", cache=None, export_step=False):
+    """
+    Validation entry for code, executing it only on a cache miss
+
+    Scripts the AST pre-screen rejects are never executed (nor cached, as
+    the pre-screen is cheaper than a lookup). Returns (entry, hit). Entries
+    have status_code (see ERROR_CODES in validate_generated_code.py), error,
+    error_class and, once the script produced a shape, geometry stats. export_step keeps a STEP blob on a miss;
+    write_step converts from BREP for entries without one.
+    """
+    rejected = prescreen_entry(code, filename)
+    if rejected:
+        return rejected, False
+
+    cache = cache or default_cache()
+    entry = cache.lookup(code)
+    if entry is not None:
+        return entry, True
+
+    entry, _ = execute_and_store(code, filename, cache, export_step)
+    return entry, False
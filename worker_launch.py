@@ -0,0 +1,151 @@
+"""
+Shared worker launch layer for the pipeline's process pools
+Children fork from a forkserver that has already imported CadQuery, OCC, PIL
+and trimesh, so a new worker starts in milliseconds instead of paying the
+imports again. Workers report how long they took to become ready.
+
+Set PIPELINE_START_METHOD=spawn to compare against fresh interpreters.
+"""
+import os
+import time
+import threading
+import multiprocessing
+import numpy as np
+
+
+START_METHOD = os.getenv("PIPELINE_START_METHOD", "forkserver")
+
+# Imported once in the forkserver; every child inherits them
+PRELOAD_MODULES = (
+    "worker_launch",
+    "numpy",
+    "PIL.Image",
+    "trimesh",
+    "cadquery",
+    "OCC.Core.BinTools",
+    "OCC.Core.BRep",
+    "OCC.Core.BRepBndLib",
+    "OCC.Core.BRepMesh",
+    "OCC.Core.BRepTools",
+    "OCC.Core.IFSelect",
+    "OCC.Core.Poly",
+    "OCC.Core.STEPControl",
+    "OCC.Core.TopExp",
+    "OCC.Core.TopoDS",
+)
+
+_forked_at = None
+# Startup reports are per thread, as run_in_child may run on several
+_reports = threading.local()
+
+
+def _mark_fork():
+    global _forked_at
+    _forked_at = time.monotonic()
+
+
+# Runs in every child forked after this module is imported, including
+# children of the forkserver, which preloads it
+os.register_at_fork(after_in_child=_mark_fork)
+
+
+def get_context(start_method=None, extra_preload=()):
+    """
+    Multiprocessing context for a pipeline pool
+
+    With the forkserver start method the server preloads PRELOAD_MODULES plus
+    extra_preload (e.g. "PartToImage" for render pools). The preload list is
+    per parent process and must be set before the first pool starts.
+    """
+    start_method = start_method or START_METHOD
+    context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        context.set_forkserver_preload(list(PRELOAD_MODULES) + list(extra_preload))
+    return context
+
+
+def startup_seconds():
+    """Seconds since this process was created, or None where unknown"""
+    if _forked_at is not None:
+        return time.monotonic() - _forked_at
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime, in clock ticks since boot), counted after the "(comm)" field
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def mark_worker_ready():
+    """Record this worker's startup cost; call at the end of a pool initializer"""
+    _reports.startup_seconds = startup_seconds()
+
+
+def take_startup_report():
+    """Startup seconds recorded by mark_worker_ready or run_in_child, returned once"""
+    seconds = getattr(_reports, "startup_seconds", None)
+    _reports.startup_seconds = None
+    return seconds
+
+
+def startup_summary(samples, start_method=None):
+    """Aggregate per-child startup seconds for results JSON"""
+    samples = [seconds for seconds in samples if seconds is not None]
+    summary = {"start_method": start_method or START_METHOD, "children": len(samples)}
+    if samples:
+        summary.update({
+            "mean_ms": float(np.mean(samples) * 1000),
+            "p50_ms": float(np.percentile(samples, 50) * 1000),
+            "max_ms": float(np.max(samples) * 1000),
+        })
+    return summary
+
+
+def format_startup(summary):
+    if not summary["children"]:
+        return f"Worker startup:  no children reported ({summary['start_method']})"
+    return (f"Worker startup:  {summary['mean_ms']:.0f} ms mean, {summary['max_ms']:.0f} ms max "
+            f"over {summary['children']} children ({summary['start_method']})")
+
+
+def _child_main(conn, func, args):
+    started = startup_seconds()
+    try:
+        outcome, value = "done", func(*args)
+    except Exception as e:
+        outcome, value = "error", f"{type(e).__name__}: {e}"
+    conn.send((outcome, value, started))
+    conn.close()
+
+
+def run_in_child(func, args, timeout, context=None):
+    """
+    Run func(*args) in a fresh child process and return (outcome, value)
+
+    outcome is "done", "error", "timeout" (the child was killed) or "crashed",
+    as for WarmPool.run. Use where every call should get its own process.
+    The child's startup cost is available from take_startup_report() on
+    the calling thread.
+    """
+    context = context or get_context()
+    conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_child_main, args=(child_conn, func, args), daemon=True)
+    process.start()
+    child_conn.close()
+    try:
+        if conn.poll(timeout):
+            try:
+                outcome, value, _reports.startup_seconds = conn.recv()
+                return outcome, value
+            except EOFError:
+                pass
+            process.join()
+            return "crashed", f"Worker exited with code {process.exitcode}"
+        process.kill()
+        return "timeout", f"Timeout after {timeout} seconds"
+    finally:
+        process.join()
+        conn.close()
@@ -0,0 +1,228 @@
+"""
+Pool of long-lived worker processes for running CadQuery scripts
+Workers import the heavy modules once and then run many tasks each. A task
+that overruns its timeout kills and replaces only the worker running it, and
+workers are recycled after a number of tasks or once their RSS grows too large
+Workers are launched through worker_launch, so by default they fork from a
+forkserver that has the heavy modules preloaded
+"""
+import time
+import resource
+import importlib
+from collections import deque
+from multiprocessing.connection import wait
+from worker_launch import get_context, startup_seconds, startup_summary
+
+
+MAX_TASKS_PER_WORKER = 200
+MAX_WORKER_RSS_MB = 2048
+PRELOAD_MODULES = ("cadquery",)  # Imported by each worker before it reports ready
+
+# Seconds a new worker may take to import its preload modules and report ready
+STARTUP_TIMEOUT = 300
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current RSS, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker_main(conn, func, preload):
+    """Import preload modules once, then run tasks from conn until told to stop"""
+    # Already imported when forked from a preloading forkserver
+    for name in preload:
+        importlib.import_module(name)
+    conn.send(("ready", current_rss_mb(), startup_seconds()))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        task_id, args = task
+        try:
+            outcome, value = "done", func(*args)
+        except Exception as e:
+            outcome, value = "error", f"{type(e).__name__}: {e}"
+        conn.send((task_id, outcome, value, current_rss_mb()))
+
+    conn.close()
+
+
+class _Worker:
+    """Parent-side handle for one worker process"""
+
+    def __init__(self, context, func, preload):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, func, preload), daemon=True
+        )
+        self.launched_at = time.perf_counter()
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.tasks_done = 0
+        self.rss_mb = 0.0
+        self.task = None
+        self.deadline = None
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WarmPool:
+    """
+    Run func(*args) for each task on warm worker processes
+
+    run() yields (task, outcome, value) as tasks finish, in completion order:
+      "done"    value is func's return value
+      "error"   func raised; value is "ExceptionType: message"
+      "timeout" the task ran past timeout seconds and its worker was killed
+      "crashed" the worker died mid-task; value describes the exit code
+    func must be importable from a module so it pickles to the workers.
+    """
+
+    def __init__(
+        self,
+        func,
+        workers,
+        timeout,
+        max_tasks_per_worker=MAX_TASKS_PER_WORKER,
+        max_rss_mb=MAX_WORKER_RSS_MB,
+        preload=PRELOAD_MODULES,
+        start_method=None
+    ):
+        self.func = func
+        self.num_workers = workers
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.preload = tuple(preload)
+        self.context = get_context(start_method, extra_preload=self.preload)
+        self.start_method = self.context.get_start_method()
+        self.stats = {"started": 0, "recycled": 0, "timeouts": 0, "crashes": 0}
+        self.startup_seconds = []
+
+    def _start_worker(self):
+        self.stats["started"] += 1
+        return _Worker(self.context, self.func, self.preload)
+
+    def startup_summary(self):
+        """Per-child startup cost over every worker this pool has launched"""
+        return startup_summary(self.startup_seconds, self.start_method)
+
+    def _needs_recycle(self, worker):
+        return (worker.tasks_done >= self.max_tasks_per_worker
+                or (self.max_rss_mb and worker.rss_mb > self.max_rss_mb))
+
+    def run(self, tasks):
+        """Yield (task, outcome, value) for every task; tasks are tuples of args"""
+        pending = deque(enumerate(tasks))
+        task_args = dict(pending)
+        workers = [self._start_worker() for _ in range(min(self.num_workers, len(pending)))]
+
+        try:
+            while pending or any(worker.task is not None for worker in workers):
+                # Hand queued tasks to ready, idle workers
+                for worker in workers:
+                    if pending and worker.ready and worker.task is None:
+                        task_id, args = pending.popleft()
+                        worker.conn.send((task_id, args))
+                        worker.task = task_id
+                        worker.deadline = time.perf_counter() + self.timeout
+
+                now = time.perf_counter()
+                deadlines = [worker.deadline for worker in workers if worker.task is not None]
+                deadlines += [worker.launched_at + STARTUP_TIMEOUT for worker in workers if not worker.ready]
+                wait_for = max(min(deadlines) - now, 0) if deadlines else None
+                ready_conns = wait([worker.conn for worker in workers], timeout=wait_for)
+
+                for index, worker in enumerate(workers):
+                    if worker.conn in ready_conns:
+                        retired, result = self._receive(worker)
+                    else:
+                        retired, result = self._check_deadline(worker)
+                    if result is not None:
+                        task_id, outcome, value = result
+                        yield task_args.pop(task_id), outcome, value
+
+                    # Replace retired workers while there is work left for them,
+                    # and stop idle ones once the queue has drained
+                    if retired:
+                        workers[index] = self._start_worker() if pending else None
+                    elif not pending and worker.ready and worker.task is None:
+                        worker.stop()
+                        workers[index] = None
+                workers = [worker for worker in workers if worker is not None]
+        finally:
+            for worker in workers:
+                if worker is not None:
+                    worker.kill()
+
+    def _receive(self, worker):
+        """Handle a message from worker; returns (worker retired, result or None)"""
+        try:
+            message = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.process.join()
+            if not worker.ready:
+                raise RuntimeError(
+                    f"Worker exited with code {worker.process.exitcode} while importing {self.preload}"
+                )
+            self.stats["crashes"] += 1
+            result = None
+            if worker.task is not None:
+                result = (worker.task, "crashed", f"Worker exited with code {worker.process.exitcode}")
+            worker.conn.close()
+            return True, result
+
+        if message[0] == "ready":
+            worker.ready = True
+            worker.rss_mb = message[1]
+            self.startup_seconds.append(message[2])
+            return False, None
+
+        task_id, outcome, value, worker.rss_mb = message
+        worker.task = None
+        worker.deadline = None
+        worker.tasks_done += 1
+        if self._needs_recycle(worker):
+            self.stats["recycled"] += 1
+            worker.stop()
+            return True, (task_id, outcome, value)
+        return False, (task_id, outcome, value)
+
+    def _check_deadline(self, worker):
+        """Kill a worker whose task or startup has overrun"""
+        now = time.perf_counter()
+        if worker.task is not None and now >= worker.deadline:
+            self.stats["timeouts"] += 1
+            task_id = worker.task
+            worker.kill()
+            return True, (task_id, "timeout", f"Timeout after {self.timeout} seconds")
+        if not worker.ready and now >= worker.launched_at + STARTUP_TIMEOUT:
+            worker.kill()
+            raise RuntimeError(f"Worker did not start within {STARTUP_TIMEOUT} seconds")
+        return False, None